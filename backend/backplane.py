@@ -0,0 +1,292 @@
+"""
+Pluggable Socket.IO backplane.
+
+A backplane is two things: the python-socketio client manager that carries
+emits and room joins between worker processes, and a shared room state
+(membership counts, which rooms a socket is in) that the event handlers
+read. SOCKETIO_BACKPLANE selects the implementation:
+
+    memory                 (default) single process, nothing shared
+    unix:///path/to.sock   local broker over a Unix socket; every worker
+                           on the box shares rooms, counts and emits
+
+The unix backplane needs no outside service. The first worker to grab
+`<path>.lock` hosts the broker inside its event loop and the others connect
+to it; if that worker dies another one takes over and the workers re-send
+their room memberships. The broker can also run on its own with
+`python -m backplane /path/to.sock`.
+"""
+import asyncio
+import fcntl
+import itertools
+import os
+import pickle
+import sys
+from typing import List
+
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+from logging_setup import get_logger
+from room_registry import RoomRegistry
+
+BACKPLANE_URL = os.getenv("SOCKETIO_BACKPLANE", "memory")
+# Drop a broker client whose unread output grows past this many bytes
+MAX_CLIENT_BUFFER = 8 * 1024 * 1024
+
+log = get_logger(__name__)
+
+
+# ======== ROOM STATE ========
+class LocalRoomState:
+    """Room state for a single process."""
+
+    def __init__(self):
+        self._rooms = RoomRegistry()
+
+    async def add(self, room: str, sid: str) -> int:
+        return self._rooms.add(room, sid)
+
+    async def remove(self, room: str, sid: str) -> int:
+        return self._rooms.remove(room, sid)
+
+    async def count(self, room: str) -> int:
+        return self._rooms.count(room)
+
+    async def rooms_of(self, sid: str) -> List[str]:
+        return self._rooms.rooms_of(sid)
+
+    async def discard_sid(self, sid: str) -> List[str]:
+        return self._rooms.discard_sid(sid)
+
+    async def stats(self) -> dict:
+        return self._rooms.stats()
+
+
+# ======== UNIX SOCKET BROKER ========
+def _acquire_broker_lock(path: str):
+    """Take `<path>.lock` without blocking; returns the open file or None."""
+    lock_file = open(path + ".lock", "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+async def _read_frame(reader):
+    header = await reader.readexactly(4)
+    return pickle.loads(await reader.readexactly(int.from_bytes(header, "big")))
+
+
+def _write_frame(writer, obj):
+    payload = pickle.dumps(obj)
+    writer.write(len(payload).to_bytes(4, "big") + payload)
+
+
+class UnixSocketBroker:
+    """Relays published messages to every worker and owns the shared rooms."""
+
+    ROOM_OPS = {"add", "remove", "count", "rooms_of", "discard_sid", "stats"}
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rooms = RoomRegistry()
+        self._clients = set()
+        self._server = None
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # stale socket; the caller holds the lock
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        os.chmod(self.path, 0o600)
+        log.info("backplane.broker_start", "Socket.IO backplane broker listening", path=self.path)
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _handle(self, reader, writer):
+        self._clients.add(writer)
+        owned = set()  # sids registered through this connection
+        try:
+            while True:
+                frame = await _read_frame(reader)
+                op = frame["op"]
+                if op == "publish":
+                    message = {"op": "message", "data": frame["data"]}
+                    for client in list(self._clients):
+                        if client.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+                            log.warning("backplane.slow_client", "Backplane client too slow, dropping it")
+                            client.close()
+                            self._clients.discard(client)
+                            continue
+                        _write_frame(client, message)
+                elif op in self.ROOM_OPS:
+                    args = frame["args"]
+                    if op == "add":
+                        owned.add(args[1])
+                    elif op == "discard_sid":
+                        owned.discard(args[0])
+                    result = getattr(self.rooms, op)(*args)
+                    _write_frame(writer, {"op": "reply", "id": frame["id"], "result": result})
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            return  # broker shutting down
+        self._clients.discard(writer)
+        for sid in owned:
+            self.rooms.discard_sid(sid)
+        writer.close()
+
+
+class UnixSocketClient:
+    """One worker's connection to the broker, hosting it if nobody else is."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._reader = None
+        self._writer = None
+        self._connect_lock = None
+        self._messages = None
+        self._pending = {}
+        self._ids = itertools.count()
+        self._memberships = set()  # (room, sid) this worker registered
+        self._broker = None
+        self._lock_file = None
+
+    async def _ensure_connected(self):
+        if self._writer is not None:
+            return
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+            self._messages = asyncio.Queue()
+        async with self._connect_lock:
+            while self._writer is None:
+                try:
+                    self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+                except (FileNotFoundError, ConnectionRefusedError):
+                    if not await self._try_host_broker():
+                        await asyncio.sleep(0.1)
+                    continue
+                asyncio.create_task(self._read_loop(self._reader))
+                # A new broker knows nothing about us yet
+                for room, sid in self._memberships:
+                    _write_frame(self._writer, {"op": "add", "id": next(self._ids), "args": (room, sid)})
+
+    async def _try_host_broker(self) -> bool:
+        if self._broker is not None:
+            return False
+        lock_file = _acquire_broker_lock(self.path)
+        if lock_file is None:
+            return False
+        self._lock_file = lock_file  # held for the life of this process
+        self._broker = UnixSocketBroker(self.path)
+        await self._broker.start()
+        return True
+
+    async def _read_loop(self, reader):
+        try:
+            while True:
+                frame = await _read_frame(reader)
+                if frame["op"] == "message":
+                    self._messages.put_nowait(frame["data"])
+                elif frame["op"] == "reply":
+                    future = self._pending.pop(frame["id"], None)
+                    if future and not future.done():
+                        future.set_result(frame["result"])
+        except (asyncio.IncompleteReadError, ConnectionError):
+            log.warning("backplane.disconnected", "Lost connection to Socket.IO backplane broker, reconnecting")
+        except asyncio.CancelledError:
+            return  # worker shutting down
+        if self._reader is reader:
+            self._reader = self._writer = None
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Backplane broker went away"))
+            self._pending.clear()
+            asyncio.create_task(self._ensure_connected())
+
+    async def publish(self, data: bytes):
+        await self._ensure_connected()
+        _write_frame(self._writer, {"op": "publish", "data": data})
+        await self._writer.drain()
+
+    async def next_message(self) -> bytes:
+        await self._ensure_connected()
+        return await self._messages.get()
+
+    async def request(self, op: str, *args):
+        await self._ensure_connected()
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        _write_frame(self._writer, {"op": op, "id": request_id, "args": args})
+        return await future
+
+
+class UnixSocketManager(AsyncPubSubManager):
+    """python-socketio client manager that publishes through the broker."""
+    name = "unix"
+
+    def __init__(self, client: UnixSocketClient, channel="socketio", write_only=False, logger=None):
+        self.client = client
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+    async def _publish(self, data):
+        await self.client.publish(pickle.dumps(data))
+
+    async def _listen(self):
+        while True:
+            yield await self.client.next_message()
+
+
+class BrokerRoomState:
+    """Room state kept by the broker, shared by every worker."""
+
+    def __init__(self, client: UnixSocketClient):
+        self.client = client
+
+    async def add(self, room: str, sid: str) -> int:
+        self.client._memberships.add((room, sid))
+        return await self.client.request("add", room, sid)
+
+    async def remove(self, room: str, sid: str) -> int:
+        self.client._memberships.discard((room, sid))
+        return await self.client.request("remove", room, sid)
+
+    async def count(self, room: str) -> int:
+        return await self.client.request("count", room)
+
+    async def rooms_of(self, sid: str) -> List[str]:
+        return await self.client.request("rooms_of", sid)
+
+    async def discard_sid(self, sid: str) -> List[str]:
+        self.client._memberships = {(r, s) for r, s in self.client._memberships if s != sid}
+        return await self.client.request("discard_sid", sid)
+
+    async def stats(self) -> dict:
+        return await self.client.request("stats")
+
+
+# ======== FACTORY ========
+def create_backplane(url: str = BACKPLANE_URL):
+    """Return `(client_manager, room_state)` for a backplane URL."""
+    if url in ("", "memory"):
+        return None, LocalRoomState()
+    if url.startswith("unix://"):
+        client = UnixSocketClient(url[len("unix://"):])
+        return UnixSocketManager(client), BrokerRoomState(client)
+    raise ValueError(f"❌ Unsupported SOCKETIO_BACKPLANE: {url}")
+
+
+client_manager, room_state = create_backplane()
+
+
+if __name__ == "__main__":
+    broker_path = sys.argv[1] if len(sys.argv) > 1 else "/tmp/gamehub-socketio.sock"
+    broker_lock = _acquire_broker_lock(broker_path)
+    if broker_lock is None:
+        sys.exit(f"❌ Another broker already holds {broker_path}.lock")
+    asyncio.run(UnixSocketBroker(broker_path).serve_forever())
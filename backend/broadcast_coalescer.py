@@ -0,0 +1,110 @@
+"""
+Per-room coalescing of chat broadcasts.
+
+With SOCKETIO_BATCH_BROADCAST on, a message to a room that has been quiet
+for SOCKETIO_BATCH_WINDOW_MS goes out straight away as a normal
+`message-received` event. Messages that follow it within the window are
+buffered and emitted together as one `message-batch` event; every
+buffered message pushes the flush back by one window, but never past
+SOCKETIO_BATCH_MAX_MS after the first one was buffered. Quiet rooms keep
+their latency and busy rooms send one packet per window instead of one
+per message.
+"""
+import asyncio
+import os
+import time
+
+BATCH_ENABLED = os.getenv("SOCKETIO_BATCH_BROADCAST", "false").lower() in ("1", "true", "yes")
+BATCH_WINDOW_MS = float(os.getenv("SOCKETIO_BATCH_WINDOW_MS", 5))
+BATCH_MAX_MS = float(os.getenv("SOCKETIO_BATCH_MAX_MS", 25))
+BATCH_MAX_SIZE = int(os.getenv("SOCKETIO_BATCH_MAX_SIZE", 100))
+MAX_TRACKED_ROOMS = 10000
+
+
+class _PendingBatch:
+    __slots__ = ("messages", "queued_at", "first_at", "deadline")
+
+    def __init__(self, now: float):
+        self.messages = []
+        self.queued_at = []
+        self.first_at = now
+        self.deadline = now
+
+
+class BroadcastCoalescer:
+    def __init__(self, emit, window_ms=BATCH_WINDOW_MS, max_ms=BATCH_MAX_MS, max_size=BATCH_MAX_SIZE):
+        self.emit = emit  # sio.emit
+        self.window = window_ms / 1000
+        self.max_delay = max_ms / 1000
+        self.max_size = max_size
+        self._pending = {}  # room -> _PendingBatch
+        self._last_sent = {}  # room -> monotonic time of the last immediate send
+
+        self.immediate = 0
+        self.batches = 0
+        self.batched_messages = 0
+        self.max_batch = 0
+        self._total_delay = 0.0
+        self.max_delay_seen = 0.0
+
+    async def publish(self, room: str, message: dict):
+        now = time.monotonic()
+        batch = self._pending.get(room)
+        if batch is None:
+            last = self._last_sent.get(room)
+            if last is None or now - last >= self.window:
+                if len(self._last_sent) >= MAX_TRACKED_ROOMS:
+                    self._prune(now)
+                self._last_sent[room] = now
+                self.immediate += 1
+                await self.emit("message-received", message, room=room)
+                return
+            batch = self._pending[room] = _PendingBatch(now)
+            asyncio.create_task(self._flush_later(room, batch))
+
+        batch.messages.append(message)
+        batch.queued_at.append(now)
+        batch.deadline = min(now + self.window, batch.first_at + self.max_delay)
+        if len(batch.messages) >= self.max_size:
+            await self._flush(room, batch)
+
+    async def _flush_later(self, room: str, batch: _PendingBatch):
+        while self._pending.get(room) is batch:
+            delay = batch.deadline - time.monotonic()
+            if delay <= 0:
+                await self._flush(room, batch)
+                return
+            await asyncio.sleep(delay)
+
+    async def _flush(self, room: str, batch: _PendingBatch):
+        if self._pending.get(room) is not batch:
+            return
+        del self._pending[room]
+        now = time.monotonic()
+        self._last_sent[room] = now
+        for queued in batch.queued_at:
+            self._total_delay += now - queued
+        self.max_delay_seen = max(self.max_delay_seen, now - batch.first_at)
+        self.batches += 1
+        self.batched_messages += len(batch.messages)
+        self.max_batch = max(self.max_batch, len(batch.messages))
+        await self.emit("message-batch", {"messages": batch.messages}, room=room)
+
+    def _prune(self, now: float):
+        # A room quiet for a full window is treated the same as an unknown one
+        self._last_sent = {room: t for room, t in self._last_sent.items() if now - t < self.window}
+
+    def stats(self) -> dict:
+        return {
+            "enabled": True,
+            "window_ms": self.window * 1000,
+            "max_ms": self.max_delay * 1000,
+            "immediate": self.immediate,
+            "batches": self.batches,
+            "batched_messages": self.batched_messages,
+            "avg_batch_size": round(self.batched_messages / self.batches, 2) if self.batches else 0,
+            "max_batch_size": self.max_batch,
+            "avg_added_delay_ms": round(self._total_delay / self.batched_messages * 1000, 2) if self.batched_messages else 0,
+            "max_added_delay_ms": round(self.max_delay_seen * 1000, 2),
+            "pending_rooms": len(self._pending),
+        }
@@ -0,0 +1,94 @@
+"""
+Read-through cache of game catalog responses.
+
+The catalog only changes when it is seeded, so pages, single games and
+filter totals are kept in memory keyed by the catalog generation, a
+counter stored in Neo4j that the seeding path bumps (`bump()`). Each
+process re-reads the generation at most every CATALOG_GENERATION_CHECK
+seconds; once it moves, older entries are never looked up again and age
+out of the LRU (CATALOG_CACHE_SIZE entries, CATALOG_CACHE_TTL seconds).
+
+Responses are cached already serialized, with a strong ETag over the
+body. A request whose If-None-Match carries that ETag gets a 304 without
+a body.
+"""
+import hashlib
+import json
+import os
+import time
+
+from fastapi import Request, Response
+
+from repositories import games as games_repo
+from ttl_cache import TTLCache
+
+CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", 2000))
+CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", 3600))
+GENERATION_CHECK = float(os.getenv("CATALOG_GENERATION_CHECK", 5))
+
+_cache = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+_generation = None
+_checked_at = 0.0
+_not_modified = 0
+
+
+class Entry:
+    __slots__ = ("value", "body", "etag")
+
+    def __init__(self, value):
+        self.value = value
+        self.body = json.dumps(value, separators=(",", ":")).encode()
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+
+
+async def generation() -> int:
+    global _generation, _checked_at
+    now = time.monotonic()
+    if _generation is None or now - _checked_at >= GENERATION_CHECK:
+        _generation = await games_repo.generation()
+        _checked_at = now
+    return _generation
+
+
+async def bump():
+    """Call after the catalog changes; other processes notice within GENERATION_CHECK."""
+    global _generation, _checked_at
+    _generation = await games_repo.bump_generation()
+    _checked_at = time.monotonic()
+
+
+async def lookup(key: tuple, load):
+    """Cached Entry for `key`, filled from `await load()`; None (uncached) if load returns None."""
+    full_key = (await generation(), *key)
+    entry = _cache.get(full_key)
+    if entry is None:
+        value = await load()
+        if value is None:
+            return None
+        entry = Entry(value)
+        _cache.set(full_key, entry)
+    return entry
+
+
+async def total(source=None, playable=None) -> int:
+    entry = await lookup(("total", source, playable), lambda: games_repo.count(source, playable))
+    return entry.value
+
+
+def respond(request: Request, entry: Entry) -> Response:
+    """200 with the cached body, or 304 if the client already has it."""
+    global _not_modified
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if entry.etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*":
+        _not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+def stats() -> dict:
+    return {
+        "generation": _generation,
+        "entries": _cache.stats(),
+        "not_modified": _not_modified,
+    }
@@ -6,6 +6,9 @@ import os
 import cloudinary
 import cloudinary.uploader
 import cloudinary.api
+from logging_setup import get_logger
+
+log = get_logger(__name__)
 
 # Check if Cloudinary credentials are set
 CLOUDINARY_ENABLED = all([
@@ -22,9 +25,9 @@ if CLOUDINARY_ENABLED:
         api_secret=os.getenv("CLOUDINARY_API_SECRET"),
         secure=True
     )
-    print("✅ Cloudinary configured successfully")
+    log.info("cloudinary.config", "Cloudinary configured successfully")
 else:
-    print("⚠️ Cloudinary credentials not set - profile pictures will use local storage")
+    log.warning("cloudinary.config", "Cloudinary credentials not set - profile pictures will use local storage")
 
 def upload_image(file_bytes, public_id=None, folder="gamehub/profile_pictures"):
     """
@@ -59,7 +62,7 @@ def upload_image(file_bytes, public_id=None, folder="gamehub/profile_pictures"):
             'public_id': upload_result.get('public_id')
         }
     except Exception as e:
-        print(f"❌ Cloudinary upload error: {e}")
+        log.error("cloudinary.upload_failed", "Cloudinary upload error", error=str(e))
         raise
 
 
@@ -74,14 +77,14 @@ def delete_image(public_id):
         dict: Deletion result
     """
     if not CLOUDINARY_ENABLED:
-        print("⚠️ Cloudinary not configured, skipping delete")
+        log.warning("cloudinary.delete_skipped", "Cloudinary not configured, skipping delete")
         return {"result": "not_configured"}
     
     try:
         result = cloudinary.uploader.destroy(public_id)
         return result
     except Exception as e:
-        print(f"❌ Cloudinary delete error: {e}")
+        log.error("cloudinary.delete_failed", "Cloudinary delete error", error=str(e))
         raise
 
 
@@ -111,6 +114,6 @@ def extract_public_id_from_url(url):
                 public_id = public_id.rsplit('.', 1)[0]
                 return public_id
     except Exception as e:
-        print(f"⚠️ Could not extract public_id from URL: {e}")
+        log.warning("cloudinary.bad_url", "Could not extract public_id from URL", error=str(e))
     
     return None
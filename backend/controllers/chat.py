@@ -1,7 +1,15 @@
 # controllers/chat_controller.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from models import Channel, Message, User, Server
-from typing import List
+from typing import List, Optional
+from datetime import datetime, timezone
+from repositories import messages as messages_repo, servers as servers_repo
+from controllers.server import store_message, cached_row, check_name
+from write_behind import new_message_row
+from message_cache import message_cache, channel_key
+from neomodel import db
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from rate_limit import enforce
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
@@ -23,6 +31,7 @@ def channel_to_dict(c: Channel):
 # Create channel
 @router.post("/channel")
 def create_channel(name: str, server_name: str):
+    check_name(name, "Channel")
     if Channel.nodes.get_or_none(name=name):
         raise HTTPException(status_code=400, detail="Channel already exists")
     server = Server.nodes.get_or_none(name=server_name)
@@ -38,31 +47,89 @@ def list_channels():
     channels = Channel.nodes.all()
     return [channel_to_dict(c) for c in channels]
 
+async def resolve_server(channel_name: str, server_name: Optional[str]) -> Optional[str]:
+    """The server of a channel named without one; 409 if several servers have such a channel.
+
+    Channel names are only unique within a server, so these legacy routes
+    never pick one of several channels on their own.
+    """
+    if server_name:
+        return server_name
+    servers = await servers_repo.channel_servers(channel_name)
+    if len(servers) > 1:
+        names = ", ".join(sorted(s or "(no server)" for s in servers))
+        raise HTTPException(
+            status_code=409,
+            detail=f"Several channels are named '{channel_name}' (servers: {names}); pass server_name",
+        )
+    return servers[0] if servers else None
+
 # Create message
 @router.post("/message")
-def create_message(content: str, sender_username: str, channel_name: str):
-    sender = User.nodes.get_or_none(username=sender_username)
-    channel = Channel.nodes.get_or_none(name=channel_name)
-    if not sender or not channel:
+async def create_message(content: str, sender_username: str, channel_name: str, server_name: Optional[str] = None):
+    enforce("rest.message", sender_username)
+    server_name = await resolve_server(channel_name, server_name)
+    context = await servers_repo.channel_context(channel_name, sender_username, server_name)
+    if not context["username"] or not context["channel_id"]:
         raise HTTPException(status_code=404, detail="Sender or channel not found")
-    message = Message(content=content).save()
-    message.sender.connect(sender)
-    message.channel.connect(channel)
-    return message_to_dict(message)
+    key = channel_key(context["server"], channel_name)
+    row = new_message_row(context["channel_id"], sender_username, content, cache_key=key)
+    await store_message(row)
+    message_cache.append(key, cached_row(row, context, channel_name, context["server"]))
+    return {
+        "id": row["uid"],
+        "content": row["content"],
+        "timestamp": datetime.fromtimestamp(row["timestamp"], tz=timezone.utc).isoformat(),
+        "sender": sender_username,
+        "channel": channel_name,
+    }
 
 # List messages in channel
 @router.get("/messages/{channel_name}")
-def list_messages(channel_name: str):
-    channel = Channel.nodes.get_or_none(name=channel_name)
-    if not channel:
+async def list_messages(
+    channel_name: str,
+    server_name: Optional[str] = None,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    server_name = await resolve_server(channel_name, server_name)
+    page = await messages_repo.channel_page(channel_name, server_name, before=before, after=after, limit=limit)
+    if page is None:
         raise HTTPException(status_code=404, detail="Channel not found")
-    return [message_to_dict(m) for m in channel.messages]
+    rows, next_cursor = page
+    messages = [
+        {
+            "id": r["id"],
+            "content": r["content"],
+            "timestamp": datetime.fromtimestamp(r["timestamp"], tz=timezone.utc).isoformat(),
+            "sender": r["sender"],
+            "channel": r["channel"],
+        }
+        for r in rows
+    ]
+    return {"messages": messages, "next_cursor": next_cursor}
 
 # Delete message
 @router.delete("/message/{message_id}")
 def delete_message(message_id: str):
-    message = Message.nodes.get_or_none(id=message_id)
-    if not message:
+    results, _ = db.cypher_query(
+        """
+        CALL {
+            MATCH (m:Message {uid: $id}) RETURN m
+            UNION
+            MATCH (m:Message) WHERE elementId(m) = $id RETURN m
+        }
+        OPTIONAL MATCH (s:Server)-[:HAS_CHANNEL]->(c:Channel)-[:HAS_MESSAGE]->(m)
+        WITH m, s.name AS server, c.name AS channel LIMIT 1
+        DETACH DELETE m
+        RETURN server, channel
+        """,
+        {"id": message_id},
+    )
+    if not results:
         raise HTTPException(status_code=404, detail="Message not found")
-    message.delete()
+    server_name, channel_name = results[0]
+    if server_name and channel_name:
+        message_cache.invalidate(channel_key(server_name, channel_name))
     return {"detail": "Message deleted"}
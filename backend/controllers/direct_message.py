@@ -1,80 +1,93 @@
 from fastapi import HTTPException
-from models import User, DirectMessage
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Optional
+import time
+import uuid
+
+from pagination import DEFAULT_PAGE_SIZE
+from repositories import direct_messages as dm_repo
+from user_events import user_events
+from logging_setup import get_logger
+
+log = get_logger(__name__)
 
 # Send Direct Message
-def send_direct_message_logic(sender_username: str, receiver_username: str, content: str):
+async def send_direct_message_logic(sender_username: str, receiver_username: str, content: str):
     try:
-        sender = User.nodes.get_or_none(username=sender_username)
-        receiver = User.nodes.get_or_none(username=receiver_username)
-        
-        if not sender or not receiver:
+        row = {"uid": uuid.uuid4().hex, "content": content, "timestamp": time.time()}
+        result = await dm_repo.send(sender_username, receiver_username, row)
+
+        if not result["sender_found"] or not result["receiver_found"]:
             raise HTTPException(status_code=404, detail="User not found")
-        
-        # Check if they are friends
-        friends_usernames = [f.username for f in sender.friends]
-        if receiver.username not in friends_usernames:
+
+        # Only friends can message each other
+        if not result["friends"]:
             raise HTTPException(status_code=403, detail="You can only message friends")
-        
-        # Create and save the direct message
-        dm = DirectMessage(content=content).save()
-        sender.sent_dms.connect(dm)
-        receiver.received_dms.connect(dm)
-        
-        return {
-            "id": dm.element_id,
+
+        message = {
+            "id": row["uid"],
             "sender": sender_username,
             "receiver": receiver_username,
             "content": content,
-            "timestamp": dm.timestamp.isoformat(),
-            "sender_profile_picture": getattr(sender, 'profile_picture', None),
+            "timestamp": datetime.fromtimestamp(row["timestamp"], tz=timezone.utc).isoformat(),
+            "sender_profile_picture": result["sender_profile_picture"],
         }
+        # Push to both users (the sender may have other tabs open)
+        await user_events.publish(receiver_username, "direct-message", message)
+        await user_events.publish(sender_username, "direct-message", message)
+        return message
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error sending direct message: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.error("dm.send_failed", "Error sending direct message", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to send message: {str(e)}")
 
-# Get Direct Messages between two users
-def get_direct_messages_logic(user1: str, user2: str):
+# Get Direct Messages between two users (newest first, keyset paginated)
+async def get_direct_messages_logic(
+    user1: str,
+    user2: str,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+):
     try:
-        user1_obj = User.nodes.get_or_none(username=user1)
-        user2_obj = User.nodes.get_or_none(username=user2)
-        
-        if not user1_obj or not user2_obj:
-            return []
-        
-        messages = []
-        
-        # Get messages sent by user1 to user2
-        for dm in user1_obj.sent_dms:
-            if user2_obj in dm.receiver:
-                messages.append({
-                    "id": dm.element_id,
-                    "sender": user1,
-                    "content": dm.content,
-                    "timestamp": dm.timestamp.isoformat(),
-                    "sender_profile_picture": getattr(user1_obj, 'profile_picture', None),
-                })
-        
-        # Get messages sent by user2 to user1
-        for dm in user2_obj.sent_dms:
-            if user1_obj in dm.receiver:
-                messages.append({
-                    "id": dm.element_id,
-                    "sender": user2,
-                    "content": dm.content,
-                    "timestamp": dm.timestamp.isoformat(),
-                    "sender_profile_picture": getattr(user2_obj, 'profile_picture', None),
-                })
-        
-        # Sort by timestamp
-        messages.sort(key=lambda x: x['timestamp'])
-        return messages
-    except Exception as e:
-        print(f"❌ Error fetching messages: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return []
+        rows, next_cursor = await dm_repo.history(user1, user2, before, after, limit)
+        messages = [
+            {
+                "id": r["id"],
+                "sender": r["sender"],
+                "content": r["content"],
+                "timestamp": datetime.fromtimestamp(r["timestamp"], tz=timezone.utc).isoformat(),
+                "sender_profile_picture": r["sender_profile_picture"],
+            }
+            for r in rows
+        ]
+        return {"messages": messages, "next_cursor": next_cursor}
+    except HTTPException:
+        raise
+    except Exception:
+        log.error("dm.history_failed", "Error fetching messages", exc_info=True)
+        return {"messages": [], "next_cursor": None}
+
+# Inbox: one row per conversation from the stored summaries
+async def get_inbox_logic(username: str, before: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE):
+    rows, next_cursor = await dm_repo.inbox(username, before, limit)
+    conversations = [
+        {
+            "username": r["username"],
+            "profile_picture": r["profile_picture"],
+            "last_message": r["last_message"],
+            "last_sender": r["last_sender"],
+            "last_timestamp": datetime.fromtimestamp(r["last_timestamp"], tz=timezone.utc).isoformat()
+            if r["last_timestamp"] is not None else None,
+            "unread": r["unread"],
+        }
+        for r in rows
+    ]
+    return {"conversations": conversations, "next_cursor": next_cursor}
+
+# Mark a conversation as read
+async def mark_read_logic(username: str, friend_username: str):
+    if not await dm_repo.mark_read(username, friend_username):
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return {"detail": "Marked as read", "unread": 0}
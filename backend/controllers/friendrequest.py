@@ -1,132 +1,150 @@
+from typing import List, Optional
+
 from fastapi import HTTPException
-from models import User
-from datetime import datetime
+
+import suggestion_cache
+from pagination import encode_cursor, decode_cursor, DEFAULT_PAGE_SIZE
+from repositories import friends as friends_repo
+from repositories import users as users_repo
+from user_events import user_events
+from logging_setup import get_logger
+
+log = get_logger(__name__)
 
 # Send Request
-def send_friend_request_logic(sender_username: str, receiver_username: str):
+async def send_friend_request_logic(sender_username: str, receiver_username: str):
     try:
         if sender_username == receiver_username:
             raise HTTPException(status_code=400, detail="You can't add yourself")
 
-        sender = User.nodes.get_or_none(username=sender_username)
-        receiver = User.nodes.get_or_none(username=receiver_username)
-        
-        if not sender or not receiver:
+        # Existence checks and the write happen in one transaction
+        outcome = await friends_repo.send_request(sender_username, receiver_username)
+        if outcome == friends_repo.NOT_FOUND:
             raise HTTPException(status_code=404, detail="User not found")
-
-        # Check existing friendship
-        friends_usernames = [f.username for f in sender.friends]
-        if receiver.username in friends_usernames:
+        if outcome == friends_repo.ALREADY_FRIENDS:
             raise HTTPException(status_code=400, detail="Already friends")
-
-        # Check existing pending request
-        sent_usernames = [u.username for u in sender.sent_requests]
-        received_usernames = [u.username for u in receiver.sent_requests]
-        if receiver.username in sent_usernames or sender.username in received_usernames:
+        if outcome == friends_repo.REQUEST_EXISTS:
             raise HTTPException(status_code=400, detail="Request already exists")
 
-        # Connect without properties (simplified)
-        sender.sent_requests.connect(receiver)
+        suggestion_cache.invalidate(sender_username, receiver_username)
+        await user_events.publish(receiver_username, "friend-request", {"sender": sender_username})
         return {"message": "Friend request sent"}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error in send_friend_request_logic: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.error("friend.request_failed", "Error in send_friend_request_logic", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to send friend request: {str(e)}")
 
 
 # Accept Request
-def accept_friend_request_logic(receiver_username: str, sender_username: str):
-    sender = User.nodes.get_or_none(username=sender_username)
-    receiver = User.nodes.get_or_none(username=receiver_username)
-    
-    if not sender or not receiver:
+async def accept_friend_request_logic(receiver_username: str, sender_username: str):
+    # Delete the request and create the friendship, if the request exists
+    outcome = await friends_repo.accept_request(sender_username, receiver_username)
+    if outcome == friends_repo.NOT_FOUND:
         raise HTTPException(status_code=404, detail="User not found")
-
-    # Ensure there's a pending request
-    sent_usernames = [u.username for u in sender.sent_requests]
-    if receiver.username not in sent_usernames:
+    if outcome == friends_repo.NO_REQUEST:
         raise HTTPException(status_code=404, detail="No pending request found")
 
-    # Delete request and create friendship
-    sender.sent_requests.disconnect(receiver)
-    sender.friends.connect(receiver)
-    receiver.friends.connect(sender)
-
+    suggestion_cache.invalidate(sender_username, receiver_username)
+    await user_events.publish(sender_username, "friend-request-accepted", {"username": receiver_username})
     return {"message": "Friend request accepted"}
 
 
 # Reject Request
-def reject_friend_request_logic(receiver_username: str, sender_username: str):
-    sender = User.nodes.get_or_none(username=sender_username)
-    receiver = User.nodes.get_or_none(username=receiver_username)
-    
-    if not sender or not receiver:
+async def reject_friend_request_logic(receiver_username: str, sender_username: str):
+    outcome = await friends_repo.delete_request(sender_username, receiver_username)
+    if outcome == friends_repo.NOT_FOUND:
         raise HTTPException(status_code=404, detail="User not found")
-
-    sent_usernames = [u.username for u in sender.sent_requests]
-    if receiver.username not in sent_usernames:
+    if outcome == friends_repo.NO_REQUEST:
         raise HTTPException(status_code=404, detail="No pending request found")
 
-    sender.sent_requests.disconnect(receiver)
+    suggestion_cache.invalidate(sender_username, receiver_username)
     return {"message": "Friend request rejected"}
 
 
-# Get Pending Requests
-def get_pending_requests_logic(username: str):
-    user = User.nodes.get_or_none(username=username)
-    if not user:
+def _bulk_senders(receiver_username: str, sender_usernames: List[str]) -> List[str]:
+    senders = list(dict.fromkeys(s for s in sender_usernames if s != receiver_username))
+    if not senders:
+        raise HTTPException(status_code=400, detail="No senders given")
+    if len(senders) > friends_repo.BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {friends_repo.BULK_MAX} requests at a time")
+    return senders
+
+
+# Accept many requests at once
+async def accept_friend_requests_logic(receiver_username: str, sender_usernames: List[str]):
+    senders = _bulk_senders(receiver_username, sender_usernames)
+    accepted = await friends_repo.accept_requests(receiver_username, senders)
+    if accepted is None:
         raise HTTPException(status_code=404, detail="User not found")
 
-    pending_requests = []
-    for sender in user.received_requests:
-        pending_requests.append({
-            "username": sender.username,
-            "profile_picture": getattr(sender, 'profile_picture', None),
-        })
+    suggestion_cache.invalidate(receiver_username, *accepted)
+    for sender in accepted:
+        await user_events.publish(sender, "friend-request-accepted", {"username": receiver_username})
+    accepted_set = set(accepted)
+    return {"accepted": accepted, "not_found": [s for s in senders if s not in accepted_set]}
 
+
+# Reject many requests at once
+async def reject_friend_requests_logic(receiver_username: str, sender_usernames: List[str]):
+    senders = _bulk_senders(receiver_username, sender_usernames)
+    rejected = await friends_repo.reject_requests(receiver_username, senders)
+    if rejected is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    suggestion_cache.invalidate(receiver_username, *rejected)
+    rejected_set = set(rejected)
+    return {"rejected": rejected, "not_found": [s for s in senders if s not in rejected_set]}
+
+
+# Unfriend
+async def unfriend_logic(username: str, friend_username: str):
+    removed = await friends_repo.remove_friend(username, friend_username)
+    if not removed:
+        raise HTTPException(status_code=404, detail="Not friends")
+
+    suggestion_cache.invalidate(username, friend_username)
+    await user_events.publish(friend_username, "friend-removed", {"username": username})
+    return {"message": "Friend removed"}
+
+
+# Get Pending Requests
+async def get_pending_requests_logic(username: str):
+    pending_requests = await friends_repo.pending(username)
+    if pending_requests is None:
+        raise HTTPException(status_code=404, detail="User not found")
     return pending_requests
 
 
 # Get Friends List
-def get_friends_logic(username: str):
-    user = User.nodes.get_or_none(username=username)
-    if not user:
+async def get_friends_logic(username: str):
+    friends = await friends_repo.friends(username)
+    if friends is None:
         raise HTTPException(status_code=404, detail="User not found")
+    return friends
 
-    return [{"username": f.username, "profile_picture": getattr(f, 'profile_picture', None), "bio": getattr(f, 'bio', None)} for f in user.friends]
+# Get Friend Suggestions
+async def get_suggestions_logic(username: str, limit: int):
+    suggestions = await suggestion_cache.suggestions(username, limit)
+    if suggestions is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return suggestions
 
 # Get All Users (for sending friend requests)
-def get_all_users_logic(current_username: str):
-    current_user = User.nodes.get_or_none(username=current_username)
-    if not current_user:
-        return []
-    
-    all_users = User.nodes.all()
-    friends = [f.username for f in current_user.friends]
-    sent_requests = [u.username for u in current_user.sent_requests]
-    received_requests = [u.username for u in current_user.received_requests]
-    
-    users_list = []
-    for user in all_users:
-        if user.username == current_username:
-            continue
-        
-        status = "none"
-        if user.username in friends:
-            status = "friends"
-        elif user.username in sent_requests:
-            status = "pending_sent"
-        elif user.username in received_requests:
-            status = "pending_received"
-        
-        users_list.append({
-            "username": user.username,
-            "profile_picture": getattr(user, 'profile_picture', None),
-            "bio": getattr(user, 'bio', None),
-            "status": status
-        })
-    
-    return users_list
+async def get_all_users_logic(
+    current_username: str,
+    prefix: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+):
+    """One page of the user directory with each user's status relative to the viewer."""
+    after_username = decode_cursor(after, 1)[0] if after else None
+    users = await users_repo.directory_page(current_username, prefix, after_username, limit + 1)
+    if users is None:
+        return {"users": [], "next_cursor": None}
+
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = encode_cursor(users[-1]["username"])
+    return {"users": users, "next_cursor": next_cursor}
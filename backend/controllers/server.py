@@ -1,12 +1,21 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from models import Server, User, Channel, Message
-from typing import List
+from fastapi import APIRouter, HTTPException, UploadFile, File, Query
+from models import Server, Channel
+from typing import List, Optional
 from fastapi import Body
 from pydantic import BaseModel
+from datetime import datetime, timezone
 import os
 from fastapi import Form
+from pagination import encode_cursor, decode_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from write_behind import message_writer, new_message_row, QueueFull
+from message_cache import message_cache, channel_key, slice_page
+from repositories import servers as servers_repo, messages as messages_repo
+import membership_cache
+from logging_setup import get_logger
+from rate_limit import enforce
 
 router = APIRouter(prefix="/servers", tags=["Servers"])
+log = get_logger(__name__)
 
 # -------------------- Pydantic models --------------------
 class ServerCreate(BaseModel):
@@ -18,112 +27,161 @@ class ChannelCreate(BaseModel):
     type: str = "text"
 
 # -------------------- Helper --------------------
-def server_to_dict(s: Server):
+def check_name(name: str, kind: str):
+    """Reject names with ':', which joins server and channel names in room and cache keys."""
+    if ":" in name:
+        raise HTTPException(status_code=400, detail=f"{kind} name can't contain ':'")
+
+async def get_server_summary(name: str, members_limit: int = 0):
+    summaries = await servers_repo.summaries(name, members_limit)
+    if not summaries:
+        raise HTTPException(status_code=404, detail="Server not found")
+    return summaries[0]
+
+def cached_row(row: dict, sender: dict, channel_name: str, server_name: str):
+    """Shape a freshly written message row like a `messages_repo.channel_page` row."""
     return {
-        "name": s.name,
-        "description": s.description,
-        "members": [m.username for m in s.members],
-        "channels": [
-            {"name": c.name, "type": getattr(c, "type", "text")}
-            for c in s.channels
-        ],
+        "id": row["uid"],
+        "content": row["content"],
+        "type": row["type"],
+        "timestamp": row["timestamp"],
+        "sender": sender["username"],
+        "profile_picture": sender["profile_picture"],
+        "channel": channel_name,
+        "server": server_name,
     }
 
+async def first_page_cached(server_name: str, channel_name: str, limit: int):
+    """Newest page of a channel, from the recent-message cache when possible."""
+    key = channel_key(server_name, channel_name)
+    page = message_cache.get_page(key, limit)
+    if page is not None:
+        return page
+
+    version = message_cache.version()
+    page = await messages_repo.channel_page(channel_name, server_name, limit=max(limit, message_cache.per_channel))
+    if page is None:
+        return None
+    rows, next_cursor = page
+    message_cache.fill(key, rows, next_cursor is None, version)
+    return slice_page(rows, limit, next_cursor is not None)
+
+async def resolve_sender(server_name: str, channel_name: str, sender_username: str, action: str):
+    """Check that a message can be posted and return (channel_id, sender)."""
+    context = await servers_repo.message_context(server_name, channel_name, sender_username)
+    if context is None:
+        raise HTTPException(status_code=404, detail=f"Server '{server_name}' not found")
+    if not context["channel_id"]:
+        raise HTTPException(status_code=404, detail=f"Channel '{channel_name}' not found in server '{server_name}'")
+    if not context["username"]:
+        raise HTTPException(status_code=404, detail=f"User '{sender_username}' not found")
+
+    # ✅ Check if user is a member of the server
+    if not await membership_cache.is_member(server_name, sender_username):
+        raise HTTPException(status_code=403, detail=f"You must join this server to send {action}")
+    return context["channel_id"], context
+
+async def store_message(row: dict):
+    """Queue a message for write-behind, or write it now when that is off."""
+    if message_writer:
+        try:
+            await message_writer.submit(row)
+        except QueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e))
+    else:
+        await messages_repo.insert_messages([row])
+
 # -------------------- Server Routes --------------------
 @router.post("/")
-def create_server(server_data: ServerCreate):
-    if Server.nodes.get_or_none(name=server_data.name):
+async def create_server(server_data: ServerCreate):
+    check_name(server_data.name, "Server")
+    if not await servers_repo.create(server_data.name, server_data.description):
         raise HTTPException(status_code=400, detail="Server already exists")
-    server = Server(name=server_data.name, description=server_data.description).save()
-    return server_to_dict(server)
+    return await get_server_summary(server_data.name)
 
 @router.get("/", response_model=List[dict])
-def list_servers():
-    servers = Server.nodes.all()
-    return [server_to_dict(s) for s in servers]
+async def list_servers(members_limit: int = Query(0, ge=0, le=MAX_PAGE_SIZE)):
+    return await servers_repo.summaries(members_limit=members_limit)
 
 @router.get("/{name}")
-def get_server(name: str):
+async def get_server(name: str, members_limit: int = Query(0, ge=0, le=MAX_PAGE_SIZE)):
     try:
-        server = Server.nodes.get_or_none(name=name)
-        if not server:
-            raise HTTPException(status_code=404, detail="Server not found")
-        return server_to_dict(server)
+        return await get_server_summary(name, members_limit)
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error fetching server '{name}': {str(e)}")
+        log.error("server.fetch_failed", "Error fetching server", server=name, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 @router.put("/{name}")
-def update_server(name: str, description: str = None):
-    server = Server.nodes.get_or_none(name=name)
-    if not server:
-        raise HTTPException(status_code=404, detail="Server not found")
+async def update_server(name: str, description: str = None):
     if description:
-        server.description = description
-        server.save()
-    return server_to_dict(server)
+        if not await servers_repo.update_description(name, description):
+            raise HTTPException(status_code=404, detail="Server not found")
+    return await get_server_summary(name)
 
 @router.delete("/{name}")
-def delete_server(name: str):
-    server = Server.nodes.get_or_none(name=name)
-    if not server:
+async def delete_server(name: str):
+    if not await servers_repo.delete(name):
         raise HTTPException(status_code=404, detail="Server not found")
-    server.delete()
+    message_cache.invalidate_server(name)
+    membership_cache.invalidate_server(name)
     return {"detail": f"Server {name} deleted"}
 
 # -------------------- Membership Routes --------------------
+@router.get("/{name}/members")
+async def list_members(
+    name: str,
+    after: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Page through a server's members alphabetically by username."""
+    after_username = decode_cursor(after, 1)[0] if after else None
+    members = await servers_repo.members_page(name, after_username, limit + 1)
+    if members is None:
+        raise HTTPException(status_code=404, detail="Server not found")
+
+    next_cursor = None
+    if len(members) > limit:
+        members = members[:limit]
+        next_cursor = encode_cursor(members[-1]["username"])
+    return {"members": members, "next_cursor": next_cursor}
+
 @router.post("/{server_name}/join")
-def join_server(server_name: str, username: str):
+async def join_server(server_name: str, username: str):
     """User joins a server to become a member"""
-    server = Server.nodes.get_or_none(name=server_name)
-    if not server:
+    server_found, user_found, already = await servers_repo.join(server_name, username)
+    if not server_found:
         raise HTTPException(status_code=404, detail="Server not found")
-    
-    user = User.nodes.get_or_none(username=username)
-    if not user:
+    if not user_found:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    # Check if already a member
-    if user in server.members:
+
+    membership_cache.invalidate(server_name, username)
+    if already:
         return {"detail": "Already a member", "is_member": True}
-    
-    # Add user as member
-    user.servers.connect(server)
-    
     return {"detail": f"Successfully joined {server_name}", "is_member": True}
 
 @router.post("/{server_name}/leave")
-def leave_server(server_name: str, username: str):
+async def leave_server(server_name: str, username: str):
     """User leaves a server"""
-    server = Server.nodes.get_or_none(name=server_name)
-    if not server:
+    server_found, user_found, was_member = await servers_repo.leave(server_name, username)
+    if not server_found:
         raise HTTPException(status_code=404, detail="Server not found")
-    
-    user = User.nodes.get_or_none(username=username)
-    if not user:
+    if not user_found:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    # Remove membership
-    if user in server.members:
-        user.servers.disconnect(server)
+
+    membership_cache.invalidate(server_name, username)
+    if was_member:
         return {"detail": f"Left {server_name}", "is_member": False}
-    
     return {"detail": "Not a member", "is_member": False}
 
 @router.get("/{server_name}/is_member/{username}")
-def check_membership(server_name: str, username: str):
+async def check_membership(server_name: str, username: str):
     """Check if user is a member of the server"""
-    server = Server.nodes.get_or_none(name=server_name)
-    if not server:
+    if not await servers_repo.exists(server_name):
         raise HTTPException(status_code=404, detail="Server not found")
-    
-    user = User.nodes.get_or_none(username=username)
-    if not user:
-        return {"is_member": False}
-    
-    is_member = user in server.members
+
+    is_member = await servers_repo.is_member(server_name, username)
     return {"is_member": is_member, "username": username, "server": server_name}
 
 # -------------------- Channel Routes --------------------
@@ -134,6 +192,7 @@ def create_channel(server_name: str, channel: ChannelCreate = Body(...)):
         raise HTTPException(status_code=404, detail="Server not found")
     if channel.type not in ["text", "voice", "video"]:
         raise HTTPException(status_code=400, detail="Invalid channel type")
+    check_name(channel.name, "Channel")
 
     new_channel = Channel(name=channel.name, type=channel.type).save()
     server.channels.connect(new_channel)
@@ -141,15 +200,15 @@ def create_channel(server_name: str, channel: ChannelCreate = Body(...)):
     return {"name": new_channel.name, "type": new_channel.type}
 
 @router.get("/{server_name}/channels")
-def list_channels(server_name: str):
-    server = Server.nodes.get_or_none(name=server_name)
-    if not server:
+async def list_channels(server_name: str):
+    channels = await servers_repo.channels(server_name)
+    if channels is None:
         raise HTTPException(status_code=404, detail="Server not found")
-    return [{"name": c.name, "type": getattr(c, "type", "text")} for c in server.channels]
+    return channels
 
 # -------------------- Message Routes (server + channel) --------------------
 @router.post("/{server_name}/channels/{channel_name}/messages")
-def create_message(
+async def create_message(
     server_name: str,
     channel_name: str,
     data: dict = Body(...),
@@ -157,59 +216,64 @@ def create_message(
     sender_username = data.get("sender_username")
     content = data.get("content")
     type = data.get("type", "text")
+    enforce("rest.message", sender_username)
 
-    server = Server.nodes.get_or_none(name=server_name)
-    if not server:
-        raise HTTPException(status_code=404, detail="Server not found")
-    channel = next((c for c in server.channels if c.name == channel_name), None)
-    if not channel:
-        raise HTTPException(status_code=404, detail="Channel not found")
-    sender = User.nodes.get_or_none(username=sender_username)
-    if not sender:
-        raise HTTPException(status_code=404, detail="Sender not found")
-    
-    # ✅ Check if user is a member of the server
-    if sender not in server.members:
-        raise HTTPException(status_code=403, detail="You must join this server to send messages")
+    channel_id, sender = await resolve_sender(server_name, channel_name, sender_username, "messages")
 
-    message = Message(content=content, type=type).save()
-    channel.messages.connect(message)
-    sender.messages.connect(message)
+    key = channel_key(server_name, channel_name)
+    row = new_message_row(channel_id, sender_username, content, type, key)
+    await store_message(row)
+    message_cache.append(key, cached_row(row, sender, channel_name, server_name))
 
     return {
-        "content": message.content,
-        "type": message.type,
-        "timestamp": message.timestamp,
-        "sender": sender.username,
-        "profile_picture": sender.profile_picture,
-        "channel": channel.name,
-        "server": server.name,
+        "id": row["uid"],
+        "content": row["content"],
+        "type": row["type"],
+        "timestamp": datetime.fromtimestamp(row["timestamp"], tz=timezone.utc),
+        "sender": sender_username,
+        "profile_picture": sender["profile_picture"],
+        "channel": channel_name,
+        "server": server_name,
     }
 
 @router.get("/{server_name}/channels/{channel_name}/messages")
-def list_messages(server_name: str, channel_name: str):
+async def list_messages(
+    server_name: str,
+    channel_name: str,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Newest-first page of channel history. Pass `next_cursor` back as
+    `before` to page further into the past (or as `after` when paging
+    forward from an `after` request)."""
     try:
-        server = Server.nodes.get_or_none(name=server_name)
-        if not server:
-            raise HTTPException(status_code=404, detail=f"Server '{server_name}' not found")
-        channel = next((c for c in server.channels if c.name == channel_name), None)
-        if not channel:
-            raise HTTPException(status_code=404, detail=f"Channel '{channel_name}' not found in server '{server_name}'")
-        messages = []
-        for m in channel.messages:
-            sender_user = [u for u in m.sender][0] if m.sender else None
-            messages.append({
-                "content": m.content,
-                "type": m.type,
-                "timestamp": m.timestamp,
-                "sender": sender_user.username if sender_user else None,
-                "profile_picture": sender_user.profile_picture if sender_user else None
-            })
-        return messages
+        if before or after:
+            page = await messages_repo.channel_page(channel_name, server_name, before=before, after=after, limit=limit)
+        else:
+            page = await first_page_cached(server_name, channel_name, limit)
+        if page is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Channel '{channel_name}' not found in server '{server_name}'",
+            )
+        rows, next_cursor = page
+        messages = [
+            {
+                "id": r["id"],
+                "content": r["content"],
+                "type": r["type"],
+                "timestamp": datetime.fromtimestamp(r["timestamp"], tz=timezone.utc),
+                "sender": r["sender"],
+                "profile_picture": r["profile_picture"],
+            }
+            for r in rows
+        ]
+        return {"messages": messages, "next_cursor": next_cursor}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error fetching messages for {server_name}/{channel_name}: {str(e)}")
+        log.error("chat.history_failed", "Error fetching messages", server=server_name, channel=channel_name, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 # -------------------- Voice Message Upload --------------------
@@ -220,26 +284,13 @@ async def upload_voice_message(
     sender_username: str = Form(...),  # ✅ must use Form
     audio: UploadFile = File(...)
 ):
+    enforce("rest.message", sender_username)
     try:
         uploads_dir = "uploads"
         os.makedirs(uploads_dir, exist_ok=True)
 
         # verify relationships BEFORE saving file
-        server = Server.nodes.get_or_none(name=server_name)
-        if not server:
-            raise HTTPException(status_code=404, detail=f"Server '{server_name}' not found")
-        
-        channel = next((c for c in server.channels if c.name == channel_name), None)
-        if not channel:
-            raise HTTPException(status_code=404, detail=f"Channel '{channel_name}' not found in server '{server_name}'")
-        
-        sender = User.nodes.get_or_none(username=sender_username)
-        if not sender:
-            raise HTTPException(status_code=404, detail=f"User '{sender_username}' not found")
-        
-        # ✅ Check if user is a member of the server
-        if sender not in server.members:
-            raise HTTPException(status_code=403, detail="You must join this server to send voice messages")
+        channel_id, sender = await resolve_sender(server_name, channel_name, sender_username, "voice messages")
 
         # save file
         file_path = os.path.join(uploads_dir, audio.filename)
@@ -248,20 +299,22 @@ async def upload_voice_message(
 
         # create message node linked to file
         file_url = f"/uploads/{audio.filename}"
-        message = Message(content=file_url, type="voice").save()
-        channel.messages.connect(message)
-        sender.messages.connect(message)
+        key = channel_key(server_name, channel_name)
+        row = new_message_row(channel_id, sender_username, file_url, "voice", key)
+        await store_message(row)
+        message_cache.append(key, cached_row(row, sender, channel_name, server_name))
 
         return {
             "message": "Voice message uploaded",
+            "id": row["uid"],
             "file_url": file_url,
-            "sender": sender.username,
-            "profile_picture": sender.profile_picture,
+            "sender": sender_username,
+            "profile_picture": sender["profile_picture"],
             "channel": channel_name,
             "server": server_name,
         }
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error in voice upload: {str(e)}")
+        log.error("chat.voice_upload_failed", "Error in voice upload", server=server_name, channel=channel_name, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
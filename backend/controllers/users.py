@@ -1,18 +1,24 @@
 # controllers/user_controller.py
 import os
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Query
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional
-from datetime import datetime, timedelta
+from typing import Optional
+from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import uuid
 
 from models import User
+import membership_cache
+from pagination import encode_cursor, decode_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from repositories import users as users_repo
 from cloudinary_config import upload_image, delete_image, extract_public_id_from_url, CLOUDINARY_ENABLED
+from logging_setup import get_logger
 
 router = APIRouter(tags=["Users"])
+log = get_logger(__name__)
 
 # ===============================
 # Security setup
@@ -121,10 +127,37 @@ def login(user: UserLogin):
     }
 
 # Get all users (protected)
-@router.get("/", response_model=List[dict])
-def list_users(current_user: User = Depends(get_current_user)):
-    users = User.nodes.all()
-    return [user_to_dict(u) for u in users]
+@router.get("/")
+async def list_users(
+    prefix: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_user),
+):
+    """Users alphabetically with their servers; pass `next_cursor` back as `after`."""
+    after_username = decode_cursor(after, 1)[0] if after else None
+    rows = await users_repo.list_page(prefix, after_username, limit + 1)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["username"])
+    for row in rows:
+        # created_at is stored as epoch seconds by neomodel
+        if row["created_at"] is not None:
+            row["created_at"] = datetime.fromtimestamp(row["created_at"], tz=timezone.utc).isoformat()
+    return {"users": rows, "next_cursor": next_cursor}
+
+# Search users by username / bio (protected); declared before /{username}
+@router.get("/search")
+async def search_users(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=50),
+    current_user: User = Depends(get_current_user),
+):
+    """Ranked matches: exact username, then username prefix, then typos and bio words."""
+    users = await users_repo.search(q, current_user.username, limit)
+    return {"users": users}
 
 # Get single user (protected)
 @router.get("/{username}")
@@ -149,11 +182,12 @@ def update_user(username: str, user_update: UserUpdate, current_user: User = Dep
 
 # Delete user (protected)
 @router.delete("/{username}")
-def delete_user(username: str, current_user: User = Depends(get_current_user)):
-    user = User.nodes.get_or_none(username=username)
-    if not user:
+async def delete_user(username: str, current_user: User = Depends(get_current_user)):
+    deleted = await users_repo.delete(username)
+    if deleted is None:
         raise HTTPException(status_code=404, detail="User not found")
-    user.delete()
+    log.info("user.deleted", "User deleted", user=username, **deleted)
+    membership_cache.invalidate_user(username)
     return {"detail": f"User {username} deleted"}
 
 # Current logged-in user profile
@@ -172,6 +206,8 @@ def update_profile(profile_update: ProfileUpdate, current_user: User = Depends(g
             existing_user = User.nodes.get_or_none(username=profile_update.username)
             if existing_user:
                 raise HTTPException(status_code=400, detail="Username already taken")
+            membership_cache.invalidate_user(current_user.username)
+            membership_cache.invalidate_user(profile_update.username)
             current_user.username = profile_update.username
         
         # Update email if provided
@@ -200,7 +236,7 @@ async def upload_profile_picture(
     current_user: User = Depends(get_current_user)
 ):
     """Upload a profile picture for the current user to Cloudinary"""
-    print(f"📸 Profile picture upload request from: {current_user.username}")
+    log.info("user.avatar_upload", "Profile picture upload request", user=current_user.username)
     
     # Check if Cloudinary is configured
     if not CLOUDINARY_ENABLED:
@@ -223,21 +259,22 @@ async def upload_profile_picture(
             try:
                 old_public_id = extract_public_id_from_url(current_user.profile_picture)
                 if old_public_id:
-                    delete_image(old_public_id)
-                    print(f"🗑️ Deleted old profile picture: {old_public_id}")
+                    await run_in_threadpool(delete_image, old_public_id)
+                    log.info("user.avatar_deleted", "Deleted old profile picture", public_id=old_public_id)
             except Exception as e:
-                print(f"⚠️ Could not delete old image: {e}")
+                log.warning("user.avatar_delete_failed", "Could not delete old image", error=str(e))
         
         # Upload to Cloudinary
         public_id = f"{current_user.username}_{uuid.uuid4().hex[:8]}"
-        upload_result = upload_image(file_bytes, public_id=public_id)
+        # The Cloudinary SDK is synchronous; keep it off the event loop
+        upload_result = await run_in_threadpool(upload_image, file_bytes, public_id=public_id)
         
         # Update user's profile picture URL
         profile_picture_url = upload_result['url']
         current_user.profile_picture = profile_picture_url
-        current_user.save()
+        await run_in_threadpool(current_user.save)
         
-        print(f"✅ Profile picture uploaded to Cloudinary: {profile_picture_url}")
+        log.info("user.avatar_uploaded", "Profile picture uploaded to Cloudinary", user=current_user.username, url=profile_picture_url)
         
         return {
             "detail": "Profile picture uploaded successfully",
@@ -246,9 +283,7 @@ async def upload_profile_picture(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error uploading profile picture: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.error("user.avatar_upload_failed", "Error uploading profile picture", user=current_user.username, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to upload profile picture: {str(e)}")
 
 # Delete profile picture
@@ -265,9 +300,9 @@ def delete_profile_picture(current_user: User = Depends(get_current_user)):
                 public_id = extract_public_id_from_url(current_user.profile_picture)
                 if public_id:
                     delete_image(public_id)
-                    print(f"🗑️ Deleted profile picture from Cloudinary: {public_id}")
+                    log.info("user.avatar_deleted", "Deleted profile picture from Cloudinary", public_id=public_id)
             except Exception as e:
-                print(f"⚠️ Could not delete from Cloudinary: {e}")
+                log.warning("user.avatar_delete_failed", "Could not delete from Cloudinary", error=str(e))
         
         # Remove from database
         current_user.profile_picture = None
@@ -0,0 +1,274 @@
+"""
+Background GamePix catalog ingestion.
+
+`POST /games/seed_gamepix` starts an IngestJob and returns right away;
+`GET /games/seed/status` reports its progress. The job pages through
+GAMEPIX_API_URL with GAMEPIX_PAGE_SIZE games per request, keeping up to
+GAMEPIX_CONCURRENCY requests in flight on one shared, pooled aiohttp
+session. Each page is upserted (utils.upsert_games) as soon as it
+arrives, so memory stays at a few pages however large the catalog is.
+Paging stops at the first empty page, or at the requested limit; a short
+page alone doesn't end it, since GamePix may cap a page below the size asked for.
+
+Failed requests (connection errors, timeouts, 429 and 5xx) are retried
+GAMEPIX_RETRIES times with exponential backoff and jitter. A page that
+still fails stops the job.
+
+Progress is checkpointed to GAMEPIX_CHECKPOINT_FILE after every page. It
+records the offset below which every page is done, plus the pages done
+above it. A job started with the same offset and limit as an unfinished
+checkpoint (left by a crash, a failure or a shutdown) picks up from there
+instead of refetching. Different parameters, or `resume=false`, discard
+the checkpoint and start over.
+"""
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Optional
+
+import aiohttp
+
+import catalog_cache
+from logging_setup import get_logger
+from utils import gamepix_games, game_row, upsert_games
+
+GAMEPIX_API = os.getenv("GAMEPIX_API_URL", "https://games.gamepix.com/games")
+PAGE_SIZE = int(os.getenv("GAMEPIX_PAGE_SIZE", 100))
+CONCURRENCY = int(os.getenv("GAMEPIX_CONCURRENCY", 4))
+RETRIES = int(os.getenv("GAMEPIX_RETRIES", 5))
+BACKOFF = float(os.getenv("GAMEPIX_BACKOFF", 0.5))  # first retry delay, doubled each time
+BACKOFF_MAX = 30.0
+REQUEST_TIMEOUT = float(os.getenv("GAMEPIX_TIMEOUT", 30))
+CHECKPOINT_FILE = os.getenv("GAMEPIX_CHECKPOINT_FILE", "gamepix_checkpoint.json")
+
+log = get_logger(__name__)
+
+_session: Optional[aiohttp.ClientSession] = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    """The shared GamePix session; its connector pools connections across pages and jobs."""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=CONCURRENCY * 2),
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+        )
+    return _session
+
+
+async def close_session():
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
+class RetryableError(Exception):
+    """A response worth retrying (429 / 5xx)."""
+
+
+async def fetch_page(offset: int, limit: int, retries: int = RETRIES, backoff: float = BACKOFF):
+    """One page of GamePix games, retrying transient failures with backoff."""
+    params = {"sid": "", "limit": limit, "offset": offset}
+    for attempt in range(retries + 1):
+        try:
+            async with get_session().get(GAMEPIX_API, params=params) as resp:
+                if resp.status == 429 or resp.status >= 500:
+                    raise RetryableError(f"GamePix answered {resp.status}")
+                resp.raise_for_status()
+                return await resp.json(content_type=None)
+        except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError, RetryableError) as e:
+            if attempt == retries:
+                raise
+            delay = min(BACKOFF_MAX, backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+            log.warning("ingest.retry", "GamePix request failed, retrying", offset=offset, attempt=attempt + 1, delay=round(delay, 2), error=str(e))
+            await asyncio.sleep(delay)
+
+
+class Checkpoint:
+    """Which pages of a run are done, persisted to a JSON file after every page."""
+
+    def __init__(self, path: str, page_size: int, start: int, limit: Optional[int]):
+        self.path = path
+        self.page_size = page_size
+        self.start = start
+        self.limit = limit
+        self.watermark = start  # every page below this offset is done
+        self.done = set()  # offsets of done pages at or above the watermark
+        self.counts = {"created": 0, "updated": 0, "unchanged": 0}
+        self.finished = False
+
+    @classmethod
+    def load(cls, path: str):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        checkpoint = cls(path, data["page_size"], data["start"], data["limit"])
+        checkpoint.watermark = data["watermark"]
+        checkpoint.done = set(data["done"])
+        checkpoint.counts = data["counts"]
+        checkpoint.finished = data["finished"]
+        return checkpoint
+
+    def mark_done(self, offset: int, counts: dict):
+        self.done.add(offset)
+        while self.watermark in self.done:
+            self.done.remove(self.watermark)
+            self.watermark += self.page_size
+        for key in self.counts:
+            self.counts[key] += counts[key]
+
+    def save(self):
+        data = {
+            "page_size": self.page_size,
+            "start": self.start,
+            "limit": self.limit,
+            "watermark": self.watermark,
+            "done": sorted(self.done),
+            "counts": self.counts,
+            "finished": self.finished,
+        }
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)  # atomic, so a crash never leaves half a checkpoint
+
+
+class IngestJob:
+    def __init__(self, page_size=PAGE_SIZE, concurrency=CONCURRENCY, checkpoint_file=CHECKPOINT_FILE):
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self.checkpoint_file = checkpoint_file
+        self._task = None
+        self._checkpoint = None
+        self._next_offset = 0
+        self._end = None  # first offset past the catalog (or the limit)
+
+        self.state = "idle"
+        self.started_at = None
+        self.finished_at = None
+        self.resumed = False
+        self.pages = 0
+        self.games = 0
+        self.error = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, offset: int = 0, limit: Optional[int] = None, resume: bool = True):
+        """Start ingesting in the background; returns False if a job is already running."""
+        if self.running:
+            return False
+        checkpoint = Checkpoint.load(self.checkpoint_file) if resume else None
+        self.resumed = bool(
+            checkpoint
+            and not checkpoint.finished
+            and (checkpoint.page_size, checkpoint.start, checkpoint.limit) == (self.page_size, offset, limit)
+        )
+        if checkpoint and not checkpoint.finished and not self.resumed:
+            log.info(
+                "ingest.checkpoint_discarded", "Unfinished checkpoint was for other parameters, starting over",
+                checkpoint_offset=checkpoint.start, checkpoint_limit=checkpoint.limit, offset=offset, limit=limit,
+            )
+        if not self.resumed:
+            checkpoint = Checkpoint(self.checkpoint_file, self.page_size, offset, limit)
+        self._checkpoint = checkpoint
+        self._next_offset = checkpoint.watermark
+        self._end = checkpoint.start + checkpoint.limit if checkpoint.limit else None
+
+        self.state = "running"
+        self.started_at = time.time()
+        self.finished_at = None
+        self.pages = 0
+        self.games = 0
+        self.error = None
+        self._task = asyncio.create_task(self._run())
+        log.info("ingest.start", "GamePix ingestion started", offset=self._next_offset, limit=limit, resumed=self.resumed)
+        return True
+
+    async def stop(self):
+        """Cancel a running job; its checkpoint stays, so the next start resumes."""
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def _claim_offset(self) -> Optional[int]:
+        while self._end is None or self._next_offset < self._end:
+            offset = self._next_offset
+            self._next_offset += self.page_size
+            if offset not in self._checkpoint.done:
+                return offset
+        return None
+
+    async def _worker(self):
+        while (offset := self._claim_offset()) is not None:
+            size = self.page_size if self._end is None else min(self.page_size, self._end - offset)
+            data = await fetch_page(offset, size)
+            games = gamepix_games(data)
+            if not games:
+                # past the end of the catalog: nothing further needs claiming
+                self._end = offset if self._end is None else min(self._end, offset)
+            rows = [game_row(g) for g in games if g.get("id") is not None]
+            counts = await upsert_games(rows)
+            self._checkpoint.mark_done(offset, counts)
+            self._checkpoint.save()
+            self.pages += 1
+            self.games += len(games)
+
+    async def _run(self):
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+            self._checkpoint.finished = True
+            self._checkpoint.save()
+            self.state = "completed"
+            log.info("ingest.done", "GamePix ingestion finished", pages=self.pages, games=self.games, **self._checkpoint.counts)
+        except asyncio.CancelledError:
+            self.state = "stopped"
+            log.info("ingest.stopped", "GamePix ingestion stopped, will resume from checkpoint", pages=self.pages)
+            raise
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            log.error("ingest.failed", "GamePix ingestion failed, will resume from checkpoint", error=str(e), exc_info=True)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.finished_at = time.time()
+            counts = self._checkpoint.counts
+            if counts["created"] or counts["updated"]:
+                try:
+                    await catalog_cache.bump()
+                except Exception:
+                    log.warning("ingest.bump_failed", "Could not bump catalog generation", exc_info=True)
+
+    def status(self) -> dict:
+        checkpoint = self._checkpoint
+        elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0
+        return {
+            "state": self.state,
+            "resumed": self.resumed,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_s": round(elapsed, 1),
+            "pages": self.pages,
+            "games": self.games,
+            "games_per_s": round(self.games / elapsed, 1) if elapsed else 0,
+            "next_offset": min(checkpoint.watermark, self._end or checkpoint.watermark) if checkpoint else None,
+            "limit": checkpoint.limit if checkpoint else None,
+            "counts": dict(checkpoint.counts) if checkpoint else None,
+            "error": self.error,
+        }
+
+
+ingest_job = IngestJob()
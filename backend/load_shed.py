@@ -0,0 +1,50 @@
+"""
+Global load shedding.
+
+When the process is already behind, taking on more work only makes every
+request slower. `overload_reason()` reports why new work should be
+refused right now, or None:
+
+    event_loop    loop lag (loop_monitor) above LOAD_SHED_LAG_MS
+    database      Neo4j queries in flight above LOAD_SHED_DB_IN_FLIGHT
+    write_queue   message write-behind queue deeper than LOAD_SHED_QUEUE_DEPTH
+
+REST requests are answered with 503 and Socket.IO events that start new
+work get an `overloaded` event; /metrics stays reachable.
+"""
+import os
+from typing import Optional
+
+from loop_monitor import loop_monitor
+from repositories import driver
+from write_behind import message_writer, QUEUE_MAX
+
+SHED_LAG_MS = float(os.getenv("LOAD_SHED_LAG_MS", 500))
+SHED_DB_IN_FLIGHT = int(os.getenv("LOAD_SHED_DB_IN_FLIGHT", driver.POOL_SIZE * 2))
+SHED_QUEUE_DEPTH = int(os.getenv("LOAD_SHED_QUEUE_DEPTH", QUEUE_MAX * 0.9))
+RETRY_AFTER = 1  # seconds suggested to rejected clients
+
+_shed = {}
+
+
+def overload_reason() -> Optional[str]:
+    reason = None
+    if loop_monitor.current_lag_ms > SHED_LAG_MS:
+        reason = "event_loop"
+    elif driver.in_flight() > SHED_DB_IN_FLIGHT:
+        reason = "database"
+    elif message_writer and message_writer.queue_depth > SHED_QUEUE_DEPTH:
+        reason = "write_queue"
+    if reason:
+        _shed[reason] = _shed.get(reason, 0) + 1
+    return reason
+
+
+def stats() -> dict:
+    return {
+        "lag_threshold_ms": SHED_LAG_MS,
+        "db_in_flight": driver.in_flight(),
+        "db_in_flight_threshold": SHED_DB_IN_FLIGHT,
+        "queue_depth_threshold": SHED_QUEUE_DEPTH,
+        "shed": dict(_shed),
+    }
@@ -0,0 +1,207 @@
+"""
+Structured, non-blocking logging.
+
+Call sites log named events through `get_logger(__name__)`:
+
+    log.info("signal.offer", "Forwarding offer", sid=sid, to=to)
+
+Records go onto an in-memory queue (QueueHandler) and a background
+QueueListener thread formats them and writes to stdout, so a request or
+socket handler never blocks on a terminal or pipe. Output is one JSON
+object per line (LOG_FORMAT=text for local development).
+
+Configuration:
+
+    LOG_LEVEL           root level (INFO)
+    LOG_EVENT_LEVELS    per-event overrides, e.g. "signal=INFO,game.upsert.chunk=INFO"
+    LOG_SAMPLE_RATES    fraction of records kept per event, e.g. "signal.ice=0.01"
+    SOCKETIO_LOGGER     python-socketio's own logging: off, or a level name
+    ENGINEIO_LOGGER     same for engine.io
+
+Event names are dotted and overrides apply to every event under a prefix,
+so "signal=INFO" covers signal.offer, signal.answer and signal.ice.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+
+# High-frequency events start out quieter than everything else
+DEFAULT_EVENT_LEVELS = {
+    "signal.offer": "DEBUG",
+    "signal.answer": "DEBUG",
+    "signal.ice": "DEBUG",
+    "chat.broadcast": "DEBUG",
+    "game.upsert.chunk": "DEBUG",
+}
+DEFAULT_SAMPLE_RATES = {
+    "signal.ice": 0.1,
+}
+
+_RESERVED = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+
+def _parse_pairs(raw: str) -> dict:
+    pairs = {}
+    for item in raw.split(","):
+        if "=" in item:
+            key, value = item.split("=", 1)
+            pairs[key.strip()] = value.strip()
+    return pairs
+
+
+EVENT_LEVELS = {
+    event: logging.getLevelName(level.upper())
+    for event, level in {**DEFAULT_EVENT_LEVELS, **_parse_pairs(os.getenv("LOG_EVENT_LEVELS", ""))}.items()
+}
+SAMPLE_RATES = {
+    event: float(rate)
+    for event, rate in {**DEFAULT_SAMPLE_RATES, **_parse_pairs(os.getenv("LOG_SAMPLE_RATES", ""))}.items()
+}
+
+
+def _lookup(table: dict, event: str, cache: dict):
+    """Most specific entry for `event` in `table`, walking up the dotted prefixes."""
+    try:
+        return cache[event]
+    except KeyError:
+        pass
+    name = event
+    value = None
+    while name:
+        if name in table:
+            value = table[name]
+            break
+        name = name.rpartition(".")[0]
+    cache[event] = value
+    return value
+
+
+_level_cache = {}
+_rate_cache = {}
+
+
+# ======== FORMATTERS ========
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": getattr(record, "event", None),
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and key != "event":
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        fields = " ".join(
+            f"{key}={value}" for key, value in record.__dict__.items()
+            if key not in _RESERVED and key != "event"
+        )
+        line = f"{self.formatTime(record)} {record.levelname:<7} {getattr(record, 'event', None) or record.name}: {record.getMessage()}"
+        if fields:
+            line += f" [{fields}]"
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+# ======== EVENT LOGGER ========
+class EventLogger:
+    """Thin wrapper around a stdlib logger that tags records with an event name."""
+    __slots__ = ("logger",)
+
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+
+    def log(self, level: int, event: str, message: str, exc_info=False, **fields):
+        override = _lookup(EVENT_LEVELS, event, _level_cache)
+        if override is not None:
+            level = override
+        if not self.logger.isEnabledFor(level):
+            return
+        rate = _lookup(SAMPLE_RATES, event, _rate_cache)
+        if rate is not None and random.random() >= rate:
+            return
+        fields["event"] = event
+        self.logger.log(level, message, exc_info=exc_info, extra=fields)
+
+    def debug(self, event: str, message: str, **fields):
+        self.log(logging.DEBUG, event, message, **fields)
+
+    def info(self, event: str, message: str, **fields):
+        self.log(logging.INFO, event, message, **fields)
+
+    def warning(self, event: str, message: str, **fields):
+        self.log(logging.WARNING, event, message, **fields)
+
+    def error(self, event: str, message: str, **fields):
+        self.log(logging.ERROR, event, message, **fields)
+
+
+def get_logger(name: str) -> EventLogger:
+    return EventLogger(logging.getLogger(name))
+
+
+# ======== SETUP ========
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Render the message and traceback on the caller's thread (the
+        # arguments may change later) but leave formatting to the listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_exception_formatter = logging.Formatter()
+_listener = None
+
+
+def configure_logging():
+    """Route the root logger through a queue to a background writer thread."""
+    global _listener
+    if _listener is not None:
+        return
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.handlers = [_QueueHandler(log_queue)]
+    root.setLevel(LOG_LEVEL)
+
+
+def library_logger(env_var: str, name: str):
+    """Logger setting for python-socketio/engine.io: False, or a configured logger."""
+    setting = os.getenv(env_var, "off").upper()
+    if setting in ("", "0", "OFF", "FALSE", "NO"):
+        return False
+    logger = logging.getLogger(name)
+    logger.setLevel("INFO" if setting in ("1", "ON", "TRUE", "YES") else setting)
+    return logger
+
+
+configure_logging()
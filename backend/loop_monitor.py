@@ -0,0 +1,122 @@
+"""
+Event-loop lag monitor.
+
+A background task sleeps for a fixed interval and records how late it wakes
+up; that delay is the time other callbacks held the loop. With
+LOOP_MONITOR_DEBUG on, a watchdog thread also notices when the loop has
+not ticked for longer than LOOP_BLOCK_THRESHOLD_MS and captures the loop
+thread's stack at that moment, which points straight at the blocking call.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from logging_setup import get_logger
+
+INTERVAL_MS = int(os.getenv("LOOP_MONITOR_INTERVAL_MS", 100))
+SAMPLES = int(os.getenv("LOOP_MONITOR_SAMPLES", 600))
+DEBUG = os.getenv("LOOP_MONITOR_DEBUG", "false").lower() in ("1", "true", "yes")
+BLOCK_THRESHOLD_MS = int(os.getenv("LOOP_BLOCK_THRESHOLD_MS", 100))
+MAX_REPORTS = 20
+
+log = get_logger(__name__)
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class LoopMonitor:
+    def __init__(self, interval_ms=INTERVAL_MS, samples=SAMPLES, debug=DEBUG, block_threshold_ms=BLOCK_THRESHOLD_MS):
+        self.interval = interval_ms / 1000
+        self.debug = debug
+        self.block_threshold = block_threshold_ms / 1000
+        self._lags = deque(maxlen=samples)  # seconds
+        self._task = None
+        self._watchdog = None
+        self._stopped = threading.Event()
+        self._loop_thread_id = None
+        self._beat = time.perf_counter()
+        self.blocked_reports = deque(maxlen=MAX_REPORTS)
+        self.blocked_count = 0
+
+    @property
+    def current_lag_ms(self) -> float:
+        """Lag of the latest tick, or of the ongoing stall if the loop is stuck."""
+        last = self._lags[-1] if self._lags else 0.0
+        overdue = time.perf_counter() - self._beat - self.interval
+        return max(last, overdue, 0.0) * 1000
+
+    async def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.perf_counter()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._run())
+        if self.debug:
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+        log.info("loop.monitor_start", "Event-loop monitor started", interval_ms=self.interval * 1000, debug=self.debug)
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            self._lags.append(max(0.0, now - expected))
+            self._beat = now
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stopped.wait(self.block_threshold / 4):
+            beat = self._beat
+            stalled = time.perf_counter() - beat - self.interval
+            if stalled < self.block_threshold or beat == reported_beat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            reported_beat = beat
+            stack = traceback.format_stack(frame)
+            self.blocked_count += 1
+            self.blocked_reports.append({
+                "at": time.time(),
+                "blocked_ms": round(stalled * 1000, 1),
+                "stack": stack,
+            })
+            log.warning("loop.blocked", "Event loop blocked", blocked_ms=round(stalled * 1000), stack="".join(stack[-6:]))
+
+    def stats(self) -> dict:
+        lags = sorted(self._lags)
+        stats = {
+            "interval_ms": self.interval * 1000,
+            "samples": len(lags),
+            "current_ms": round(self.current_lag_ms, 2),
+            "p50_ms": round(_percentile(lags, 50) * 1000, 2),
+            "p90_ms": round(_percentile(lags, 90) * 1000, 2),
+            "p99_ms": round(_percentile(lags, 99) * 1000, 2),
+            "max_ms": round((lags[-1] if lags else 0) * 1000, 2),
+            "debug": self.debug,
+        }
+        if self.debug:
+            stats["blocked_count"] = self.blocked_count
+            stats["blocked_reports"] = list(self.blocked_reports)
+        return stats
+
+
+loop_monitor = LoopMonitor()
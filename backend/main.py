@@ -3,18 +3,51 @@ import time
 import threading
 import config  # sets neomodel_config.DATABASE_URL BEFORE any db use
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from routers import users, friends, games, servers, chat, direct_messages
 from neomodel import db, config as neoconfig
 from neo4j.exceptions import ServiceUnavailable, AuthError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from socketio_server import create_socketio_app
+from socketio_server import create_socketio_app, message_broadcaster, ice_batcher
+from user_events import user_events
+from write_behind import message_writer
+from message_cache import message_cache
+import membership_cache
+import suggestion_cache
+import catalog_cache
+import gamepix_ingest
+import load_shed
+from rate_limit import rate_limiter
+from repositories.driver import close_driver
+from repositories.schema import ensure_schema
+from loop_monitor import loop_monitor
+from backplane import room_state
+from logging_setup import get_logger
+
+log = get_logger(__name__)
 
 
 # Create the FastAPI instance first
 fastapi_app = FastAPI(title="🎮 GameHub Backend")
 
+# ✅ Refuse new requests while overloaded (registered before CORS so
+# the 503 still carries CORS headers)
+SHED_EXEMPT_PATHS = ("/metrics", "/socket.io/test")
+
+@fastapi_app.middleware("http")
+async def shed_load(request: Request, call_next):
+    if request.url.path not in SHED_EXEMPT_PATHS:
+        reason = load_shed.overload_reason()
+        if reason:
+            return JSONResponse(
+                status_code=503,
+                content={"detail": f"Server overloaded ({reason}), try again shortly"},
+                headers={"Retry-After": str(load_shed.RETRY_AFTER)},
+            )
+    return await call_next(request)
+
 # ✅ CORS setup
 fastapi_app.add_middleware(
     CORSMiddleware,
@@ -53,46 +86,92 @@ def keep_neo4j_alive():
     while True:
         try:
             db.cypher_query("RETURN 1")
-            print("🩵 Neo4j heartbeat OK")
+            log.debug("db.heartbeat", "Neo4j heartbeat OK")
         except Exception as e:
-            print(f"⚠️ Lost connection to Neo4j Aura: {type(e).__name__}")
+            log.warning("db.heartbeat_failed", "Lost connection to Neo4j Aura", error=type(e).__name__)
             try:
                 db.close_connection()
                 time.sleep(2)
                 connection_url = os.getenv("NEO4J_URI") or neoconfig.DATABASE_URL
                 db.set_connection(connection_url)
                 db.cypher_query("RETURN 1")
-                print("✅ Reconnected to Neo4j Aura!")
+                log.info("db.reconnected", "Reconnected to Neo4j Aura")
             except Exception as err:
-                print(f"💀 Reconnect failed: {type(err).__name__} - {err}")
+                log.error("db.reconnect_failed", "Reconnect failed", error=f"{type(err).__name__} - {err}")
         time.sleep(90)
 
 
 # ✅ Neo4j startup check (safe on Render)
 @fastapi_app.on_event("startup")
 def on_startup():
-    print("\n🕹️ GameHub backend starting up…")
+    log.info("app.startup", "GameHub backend starting up")
 
     try:
         db.cypher_query("RETURN 1")
-        print("[✅] Connected to Neo4j database.")
+        log.info("db.connected", "Connected to Neo4j database")
     except (ServiceUnavailable, AuthError, ValueError, Exception) as e:
-        print("[⚠️] Neo4j connection not available yet — continuing startup.")
-        print(f"    Reason: {e}")
+        log.warning("db.unavailable", "Neo4j connection not available yet, continuing startup", error=str(e))
 
     if os.path.exists(UPLOADS_DIR):
-        print(f"[📁] Uploads directory ready at: {os.path.abspath(UPLOADS_DIR)}")
+        log.info("app.uploads", "Uploads directory ready", path=os.path.abspath(UPLOADS_DIR))
     else:
-        print("[⚠️] Uploads directory missing!")
+        log.warning("app.uploads", "Uploads directory missing")
 
     threading.Thread(target=keep_neo4j_alive, daemon=True).start()
 
 
+# ✅ Background workers that live on the event loop
+@fastapi_app.on_event("startup")
+async def start_background_workers():
+    await loop_monitor.start()
+    if message_writer:
+        await message_writer.start()
+
+
+# ✅ Constraints/indexes used by the Cypher repositories
+@fastapi_app.on_event("startup")
+async def apply_db_schema():
+    try:
+        await ensure_schema()
+        log.info("db.schema", "Database constraints and indexes in place")
+    except Exception as e:
+        log.warning("db.schema_failed", "Could not apply database schema, continuing startup", error=str(e))
+
+
+@fastapi_app.on_event("shutdown")
+async def stop_background_workers():
+    await gamepix_ingest.ingest_job.stop()
+    await gamepix_ingest.close_session()
+    if message_writer:
+        await message_writer.stop()
+    await close_driver()
+    await loop_monitor.stop()
+
+
 # ✅ Root endpoint
 @fastapi_app.get("/")
 def root():
     return {"message": "GameHub backend running 🎮"}
 
+# ✅ Runtime metrics for the in-process subsystems
+@fastapi_app.get("/metrics")
+async def metrics():
+    return {
+        "event_loop": loop_monitor.stats(),
+        "message_write_behind": message_writer.stats() if message_writer else {"enabled": False},
+        "message_cache": message_cache.stats(),
+        "membership_cache": membership_cache.stats(),
+        "suggestion_cache": suggestion_cache.stats(),
+        "catalog_cache": catalog_cache.stats(),
+        "gamepix_ingest": gamepix_ingest.ingest_job.status(),
+        "socketio_rooms": await room_state.stats(),
+        "socketio_batching": message_broadcaster.stats() if message_broadcaster else {"enabled": False},
+        "signaling": ice_batcher.stats(),
+        "user_events": user_events.stats(),
+        "rate_limits": rate_limiter.stats(),
+        "load_shedding": load_shed.stats(),
+    }
+
 # ✅ Add a simple Socket.IO test endpoint
 @fastapi_app.get("/socket.io/test")
 def socketio_test():
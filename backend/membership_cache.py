@@ -0,0 +1,43 @@
+"""
+Cache of (server, username) -> is-member answers.
+
+Chat sends check membership on every message; this keeps that check in
+memory. Entries expire after MEMBERSHIP_CACHE_TTL seconds and are dropped
+explicitly when a user joins or leaves a server, or a server or user is
+deleted, so the TTL only bounds staleness across worker processes.
+"""
+import os
+
+from repositories import servers as servers_repo
+from ttl_cache import TTLCache
+
+MEMBERSHIP_TTL = float(os.getenv("MEMBERSHIP_CACHE_TTL", 60))
+MEMBERSHIP_MAX = int(os.getenv("MEMBERSHIP_CACHE_SIZE", 100000))
+
+_cache = TTLCache(maxsize=MEMBERSHIP_MAX, ttl=MEMBERSHIP_TTL)
+
+
+async def is_member(server_name: str, username: str) -> bool:
+    key = (server_name, username)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+    member = await servers_repo.is_member(server_name, username)
+    _cache.set(key, member)
+    return member
+
+
+def invalidate(server_name: str, username: str):
+    _cache.pop((server_name, username))
+
+
+def invalidate_server(server_name: str):
+    _cache.pop_where(lambda key: key[0] == server_name)
+
+
+def invalidate_user(username: str):
+    _cache.pop_where(lambda key: key[1] == username)
+
+
+def stats() -> dict:
+    return _cache.stats()
@@ -0,0 +1,182 @@
+"""
+Per-process cache of the newest messages in each channel.
+
+Page-one history reads (no cursor) are served from here once a channel has
+been loaded; new messages are appended as they are accepted so the cached
+page never goes stale within this process. Other workers' writes and
+deletes are not seen, so a channel is reloaded from the database
+MESSAGE_CACHE_TTL seconds after it was filled, which bounds how stale a page
+served by one worker can be. Channels are evicted LRU-first once the
+estimated size of all cached messages passes MESSAGE_CACHE_MAX_BYTES.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from pagination import encode_cursor
+
+PER_CHANNEL = int(os.getenv("MESSAGE_CACHE_PER_CHANNEL", 100))
+MAX_BYTES = int(os.getenv("MESSAGE_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+TTL = float(os.getenv("MESSAGE_CACHE_TTL", 5))
+# Channels whose last write sequence is remembered (see RecentMessageCache._seq)
+MAX_TRACKED = 10000
+
+# Rough per-row overhead of the dict, floats and short strings
+ROW_OVERHEAD = 400
+
+
+def channel_key(server_name: str, channel_name: str) -> str:
+    return f"{server_name}:{channel_name}"
+
+
+def estimate_size(row: dict) -> int:
+    return ROW_OVERHEAD + sum(len(v) for v in row.values() if isinstance(v, str))
+
+
+def slice_page(rows: list, limit: int, has_more: bool):
+    """Cut a newest-first list of rows down to one page plus its cursor."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        has_more = True
+    next_cursor = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"]) if has_more and rows else None
+    return rows, next_cursor
+
+
+class _ChannelEntry:
+    __slots__ = ("messages", "complete", "size", "expires")
+
+    def __init__(self, per_channel: int, ttl: float):
+        self.messages = deque(maxlen=per_channel)  # newest first
+        self.complete = False  # True while the deque holds the whole channel
+        self.size = 0
+        self.expires = time.monotonic() + ttl
+
+
+class RecentMessageCache:
+    def __init__(self, per_channel: int = PER_CHANNEL, max_bytes: int = MAX_BYTES, ttl: float = TTL):
+        self.per_channel = per_channel
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Write sequence per channel, so a database read that raced with an
+        # append or delete is not cached over the newer state. Only the most
+        # recently changed MAX_TRACKED channels are remembered; a forgotten
+        # channel counts as changed at `_forgotten_seq`.
+        self._seq = 0
+        self._changed_at = {}
+        self._forgotten_seq = -1
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_page(self, key: str, limit: int):
+        """Return `(rows, next_cursor)` for the newest page, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None or (len(entry.messages) <= limit and not entry.complete):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            rows, complete = list(entry.messages), entry.complete
+        return slice_page(rows, limit, not complete)
+
+    def version(self) -> int:
+        """Token to pass to `fill` for a database read started now."""
+        with self._lock:
+            return self._seq
+
+    def fill(self, key: str, rows: list, complete: bool, version: int):
+        """Seed a channel from a newest-first page read from the database."""
+        entry = _ChannelEntry(self.per_channel, self.ttl)
+        for row in rows[:self.per_channel]:
+            entry.messages.append(row)
+            entry.size += estimate_size(row)
+        entry.complete = complete and len(rows) <= self.per_channel
+        with self._lock:
+            if self._changed_at.get(key, self._forgotten_seq) >= version:
+                return
+            self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self._evict()
+
+    def append(self, key: str, row: dict):
+        """Add a freshly accepted message to a channel that is already cached."""
+        with self._lock:
+            self._touch(key)
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            if len(entry.messages) == entry.messages.maxlen:
+                dropped = entry.messages.pop()
+                entry.size -= estimate_size(dropped)
+                self._bytes -= estimate_size(dropped)
+                entry.complete = False
+            entry.messages.appendleft(row)
+            size = estimate_size(row)
+            entry.size += size
+            self._bytes += size
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._touch(key)
+            self._remove(key)
+
+    def invalidate_server(self, server_name: str):
+        prefix = f"{server_name}:"
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                self._touch(key)
+                self._remove(key)
+
+    def _touch(self, key: str):
+        self._changed_at.pop(key, None)  # re-insert, so the dict stays oldest-change first
+        self._changed_at[key] = self._seq
+        self._seq += 1
+        while len(self._changed_at) > MAX_TRACKED:
+            self._forget(next(iter(self._changed_at)))
+
+    def _forget(self, key: str):
+        seq = self._changed_at.pop(key, None)
+        if seq is not None:
+            self._forgotten_seq = max(self._forgotten_seq, seq)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            key, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self._forget(key)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "channels": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "tracked_channels": len(self._changed_at),
+        }
+
+
+message_cache = RecentMessageCache()
@@ -3,6 +3,7 @@ from neomodel import (
     RelationshipTo, RelationshipFrom, Relationship
 )
 from datetime import datetime
+import uuid
 
 # Game model
 class Game(StructuredNode):
@@ -23,6 +24,7 @@ class Server(StructuredNode):
 
 # User model
 class User(StructuredNode):
+    uid = StringProperty(unique_index=True, default=lambda: uuid.uuid4().hex)  # never reused, unlike elementId
     username = StringProperty(unique_index=True, required=True)
     email = StringProperty(unique_index=True)
     password_hash = StringProperty()
@@ -36,6 +38,7 @@ class User(StructuredNode):
     messages = RelationshipTo('Message', 'SENT')
     sent_dms = RelationshipTo('DirectMessage', 'SENT_DM')
     received_dms = RelationshipTo('DirectMessage', 'RECEIVED_DM')
+    conversations = RelationshipTo('Conversation', 'IN_CONVERSATION')
 
 # Channel model
 class Channel(StructuredNode):
@@ -49,6 +52,7 @@ class Channel(StructuredNode):
 
 # Message model
 class Message(StructuredNode):
+    uid = StringProperty(unique_index=True)  # server-assigned id, see write_behind.py
     content = StringProperty(required=True)
     type = StringProperty(
         choices={'text': 'text', 'voice': 'voice', 'video': 'video'},
@@ -60,7 +64,15 @@ class Message(StructuredNode):
 
 # Direct Message model
 class DirectMessage(StructuredNode):
+    uid = StringProperty(unique_index=True)
     content = StringProperty(required=True)
     timestamp = DateTimeProperty(default_now=True)
     sender = RelationshipFrom('User', 'SENT_DM')
     receiver = RelationshipFrom('User', 'RECEIVED_DM')
+    conversation = RelationshipFrom('Conversation', 'HAS_DM')
+
+# Conversation model (one per user pair, see repositories/direct_messages.py)
+class Conversation(StructuredNode):
+    key = StringProperty(unique_index=True, required=True)
+    participants = RelationshipFrom('User', 'IN_CONVERSATION')
+    messages = RelationshipTo('DirectMessage', 'HAS_DM')
@@ -0,0 +1,32 @@
+"""
+Opaque keyset cursors shared by the paginated endpoints.
+
+A cursor is the url-safe base64 of the sort key of the last row a client
+has seen (e.g. a message's timestamp + id), so the next page can start
+right after it with a single indexed comparison instead of SKIP.
+"""
+import base64
+import json
+
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(*parts) -> str:
+    """Pack the sort key of a row into an opaque cursor string."""
+    raw = json.dumps(list(parts), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """Unpack a cursor produced by `encode_cursor`, or raise a 400."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        parts = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(parts, list) or len(parts) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return parts
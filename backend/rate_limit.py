@@ -0,0 +1,131 @@
+"""
+In-memory token-bucket rate limits.
+
+Every limited action has a bucket per key; Socket.IO events are keyed by
+socket id and, when the sender is known, by username as well, and REST
+routes by username. A bucket holds up to `burst` tokens and refills at
+`rate` per second; an action that finds less than one token is rejected
+with the time until one is available.
+
+Limits come from DEFAULT_LIMITS and can be overridden with RATE_LIMITS,
+a comma-separated list of `action=rate/burst` (or `action=off`):
+
+    RATE_LIMITS="new_message=2/5,ice_candidate=off"
+"""
+import math
+import os
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+
+DEFAULT_LIMITS = {
+    # Socket.IO events
+    "new_message": (5, 10),
+    "join_room": (2, 5),
+    "join_channel": (5, 20),
+    "offer": (10, 40),
+    "answer": (10, 40),
+    "ice_candidate": (100, 400),
+    "resume_events": (1, 5),
+    # REST routes
+    "rest.message": (5, 10),
+    "rest.direct_message": (5, 10),
+    "rest.friend": (2, 10),
+}
+MAX_BUCKETS = int(os.getenv("RATE_LIMIT_MAX_BUCKETS", 100000))
+
+
+def _parse_limits(raw: str) -> dict:
+    limits = dict(DEFAULT_LIMITS)
+    for item in raw.split(","):
+        if "=" not in item:
+            continue
+        action, spec = (part.strip() for part in item.split("=", 1))
+        if spec.lower() == "off":
+            limits[action] = None
+        else:
+            rate, _, burst = spec.partition("/")
+            limits[action] = (float(rate), float(burst or rate))
+    return limits
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+
+
+class RateLimiter:
+    def __init__(self, limits: dict, max_buckets: int = MAX_BUCKETS):
+        self.limits = limits
+        self.max_buckets = max_buckets
+        self._buckets = {}  # (action, key) -> _Bucket
+        self.allowed = {}
+        self.limited = {}
+
+    def check(self, action: str, *keys: Optional[str]) -> float:
+        """Take a token from every key's bucket; returns 0 if allowed, else seconds to wait."""
+        limit = self.limits.get(action)
+        if limit is None:
+            return 0.0
+        rate, burst = limit
+        now = time.monotonic()
+        buckets = []
+        wait = 0.0
+        for key in keys:
+            if key is None:
+                continue
+            bucket = self._buckets.get((action, key))
+            if bucket is None:
+                if len(self._buckets) >= self.max_buckets:
+                    self._prune(now)
+                bucket = self._buckets[(action, key)] = _Bucket(burst, now)
+            else:
+                bucket.tokens = min(burst, bucket.tokens + (now - bucket.updated) * rate)
+                bucket.updated = now
+            if bucket.tokens < 1:
+                wait = max(wait, (1 - bucket.tokens) / rate)
+            buckets.append(bucket)
+
+        if wait:
+            self.limited[action] = self.limited.get(action, 0) + 1
+            return wait
+        for bucket in buckets:
+            bucket.tokens -= 1
+        self.allowed[action] = self.allowed.get(action, 0) + 1
+        return 0.0
+
+    def _prune(self, now: float):
+        # A bucket that has refilled completely is the same as no bucket
+        full = [
+            key for key, bucket in self._buckets.items()
+            if self.limits.get(key[0]) is None
+            or bucket.tokens + (now - bucket.updated) * self.limits[key[0]][0] >= self.limits[key[0]][1]
+        ]
+        for key in full:
+            del self._buckets[key]
+
+    def stats(self) -> dict:
+        return {
+            "buckets": len(self._buckets),
+            "allowed": dict(self.allowed),
+            "limited": dict(self.limited),
+            "limits": {action: list(limit) if limit else "off" for action, limit in self.limits.items()},
+        }
+
+
+rate_limiter = RateLimiter(_parse_limits(os.getenv("RATE_LIMITS", "")))
+
+
+def enforce(action: str, username: Optional[str]):
+    """Raise 429 when `username` is over the limit for a REST action."""
+    wait = rate_limiter.check(action, f"user:{username}" if username else None)
+    if wait:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, slow down",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
@@ -0,0 +1,294 @@
+"""
+Direct message queries.
+
+DMs between two users hang off a (:Conversation {key}) node, where the key
+is the two users' uids sorted and joined with "|" (stable across username
+changes and unique-constrained, see repositories/schema.py). Unlike
+elementIds, uids are never reused, so a deleted user's conversations can't
+be picked up by whoever gets their node id next:
+
+    (u:User)-[:IN_CONVERSATION]->(c:Conversation)-[:HAS_DM]->(dm:DirectMessage)
+
+The SENT_DM / RECEIVED_DM relationships are kept as well, so a thread's
+history is one indexed lookup plus a walk over that conversation only.
+
+Each send also updates the inbox summary in the same transaction: the
+conversation keeps the last message preview, timestamp and sender, and
+each user's IN_CONVERSATION relationship keeps their unread count, so the
+inbox never touches the messages themselves.
+"""
+from typing import Optional
+
+from fastapi import HTTPException
+
+from pagination import encode_cursor, decode_cursor, DEFAULT_PAGE_SIZE
+from repositories.driver import read, write
+
+PREVIEW_LENGTH = 120
+
+
+NEW_UID = "replace(randomUUID(), '-', '')"  # same shape as models.User.uid
+
+
+def conversation_key(a: str, b: str) -> str:
+    """Cypher expression for the conversation key of user nodes `a` and `b`."""
+    return (
+        f"CASE WHEN {a}.uid < {b}.uid "
+        f"THEN {a}.uid + '|' + {b}.uid "
+        f"ELSE {b}.uid + '|' + {a}.uid END"
+    )
+
+
+async def send(sender: str, receiver: str, row: dict):
+    """Create a DM between friends in one transaction.
+
+    Returns (sender_found, receiver_found, friends); the DM is only written
+    when all three are true.
+    """
+    records = await write(
+        f"""
+        OPTIONAL MATCH (s:User {{username: $sender}})
+        OPTIONAL MATCH (r:User {{username: $receiver}})
+        WITH s, r,
+             CASE WHEN s IS NULL OR r IS NULL THEN false
+                  ELSE EXISTS {{ (s)-[:FRIEND_WITH]-(r) }} END AS friends
+        CALL {{
+            WITH s, r, friends
+            WITH s, r WHERE friends
+            SET s.uid = coalesce(s.uid, {NEW_UID}), r.uid = coalesce(r.uid, {NEW_UID})
+            WITH s, r
+            MERGE (c:Conversation {{key: {conversation_key("s", "r")}}})
+            MERGE (s)-[sent:IN_CONVERSATION]->(c)
+            MERGE (r)-[received:IN_CONVERSATION]->(c)
+            CREATE (s)-[:SENT_DM]->(dm:DirectMessage {{uid: $row.uid, content: $row.content, timestamp: $row.timestamp}})<-[:RECEIVED_DM]-(r)
+            CREATE (c)-[:HAS_DM]->(dm)
+            SET c.last_preview = left($row.content, $preview_length),
+                c.last_timestamp = $row.timestamp,
+                c.last_sender_id = s.uid,
+                sent.unread = 0,
+                sent.last_read = $row.timestamp,
+                received.unread = coalesce(received.unread, 0) + 1
+            RETURN count(dm) AS created
+        }}
+        RETURN s IS NOT NULL AS sender_found, r IS NOT NULL AS receiver_found, friends,
+               s.profile_picture AS sender_profile_picture
+        """,
+        sender=sender,
+        receiver=receiver,
+        row=row,
+        preview_length=PREVIEW_LENGTH,
+    )
+    return records[0]
+
+
+async def inbox(username: str, before: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE):
+    """A user's conversations, most recently active first, from the stored summaries.
+
+    Returns `(rows, next_cursor)`; `next_cursor` is None on the last page.
+    """
+    params = {"username": username, "limit": limit + 1}
+    where = ""
+    if before:
+        params["ts"], params["key"] = decode_cursor(before, 2)
+        where = "WHERE c.last_timestamp < $ts OR (c.last_timestamp = $ts AND c.key < $key)"
+
+    records = await read(
+        f"""
+        MATCH (me:User {{username: $username}})-[mine:IN_CONVERSATION]->(c:Conversation)
+        {where}
+        WITH me, mine, c
+        ORDER BY c.last_timestamp DESC, c.key DESC
+        LIMIT $limit
+        MATCH (c)<-[:IN_CONVERSATION]-(other:User) WHERE other <> me
+        RETURN c.key AS key, other.username AS username, other.profile_picture AS profile_picture,
+               c.last_preview AS last_message, c.last_timestamp AS last_timestamp,
+               CASE c.last_sender_id WHEN me.uid THEN me.username ELSE other.username END AS last_sender,
+               coalesce(mine.unread, 0) AS unread
+        ORDER BY last_timestamp DESC, key DESC
+        """,
+        **params,
+    )
+    rows = [dict(r) for r in records]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["last_timestamp"], rows[-1]["key"])
+    return rows, next_cursor
+
+
+async def mark_read(username: str, other: str) -> bool:
+    """Reset `username`'s unread count for the conversation with `other`."""
+    records = await write(
+        f"""
+        MATCH (me:User {{username: $username}}), (other:User {{username: $other}})
+        MATCH (me)-[mine:IN_CONVERSATION]->(c:Conversation {{key: {conversation_key("me", "other")}}})
+        SET mine.unread = 0, mine.last_read = c.last_timestamp
+        RETURN count(c) AS found
+        """,
+        username=username,
+        other=other,
+    )
+    return bool(records and records[0]["found"])
+
+
+async def history(
+    user1: str,
+    user2: str,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+):
+    """One keyset page of the DMs between two users.
+
+    Rows are newest-first on (timestamp, id), like `messages.channel_page`,
+    and `next_cursor` is None once there is nothing further. Unknown users
+    or users who never talked give an empty page.
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either 'before' or 'after', not both")
+
+    params = {"user1": user1, "user2": user2, "limit": limit + 1}
+    where, order = "", "DESC"
+    if before or after:
+        params["ts"], params["id"] = decode_cursor(before or after, 2)
+        op = "<" if before else ">"
+        where = (
+            f"WHERE dm.timestamp {op} $ts "
+            f"OR (dm.timestamp = $ts AND coalesce(dm.uid, elementId(dm)) {op} $id)"
+        )
+        order = "DESC" if before else "ASC"
+
+    records = await read(
+        f"""
+        MATCH (a:User {{username: $user1}}), (b:User {{username: $user2}})
+        MATCH (c:Conversation {{key: {conversation_key("a", "b")}}})-[:HAS_DM]->(dm:DirectMessage)
+        {where}
+        WITH dm, coalesce(dm.uid, elementId(dm)) AS mid
+        ORDER BY dm.timestamp {order}, mid {order}
+        LIMIT $limit
+        MATCH (sender:User)-[:SENT_DM]->(dm)
+        RETURN mid AS id, sender.username AS sender, dm.content AS content,
+               dm.timestamp AS timestamp, sender.profile_picture AS sender_profile_picture
+        ORDER BY dm.timestamp {order}, mid {order}
+        """,
+        **params,
+    )
+    rows = [dict(r) for r in records]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+    if after:
+        rows.reverse()
+    return rows, next_cursor
+
+
+ASSIGN_UIDS = """
+MATCH (u:User) WHERE u.uid IS NULL
+WITH u LIMIT $batch_size
+SET u.uid = %s
+RETURN count(u) AS assigned
+""" % NEW_UID
+
+
+# Conversations keyed on elementIds (which contain ':') get their uid key.
+# One that doesn't have exactly two members (a user was deleted, or a reused
+# elementId pulled a third user in), or whose pair already has a uid-keyed
+# conversation, is dropped instead; its DMs are relinked by BACKFILL_BATCH.
+REKEY_BATCH = """
+MATCH (c:Conversation) WHERE c.key CONTAINS ':'
+WITH c LIMIT $batch_size
+OPTIONAL MATCH (u:User)-[:IN_CONVERSATION]->(c)
+WITH c, collect(u) AS members
+WITH c, members[0] AS a, members[1] AS b, size(members) = 2 AS pair
+WITH c, a, b, pair AND NOT EXISTS { (:Conversation {key: %s}) } AS keep
+CALL {
+    WITH c, a, b, keep
+    WITH c, a, b WHERE keep
+    SET c.last_sender_id = CASE c.last_sender_id WHEN elementId(a) THEN a.uid WHEN elementId(b) THEN b.uid END,
+        c.key = %s
+    RETURN count(c) AS rekeyed
+}
+CALL {
+    WITH c, keep
+    WITH c WHERE NOT keep
+    DETACH DELETE c
+    RETURN count(*) AS dropped
+}
+RETURN count(*) AS processed
+""" % (conversation_key("a", "b"), conversation_key("a", "b"))
+
+
+DELETE_ORPHAN_DMS = """
+MATCH (dm:DirectMessage)
+WHERE NOT EXISTS { (:User)-[:SENT_DM]->(dm) } OR NOT EXISTS { (:User)-[:RECEIVED_DM]->(dm) }
+WITH dm LIMIT $batch_size
+DETACH DELETE dm
+RETURN count(*) AS deleted
+"""
+
+BACKFILL_BATCH = """
+MATCH (s:User)-[:SENT_DM]->(dm:DirectMessage)<-[:RECEIVED_DM]-(r:User)
+WHERE NOT EXISTS { (dm)<-[:HAS_DM]-(:Conversation) }
+WITH s, r, dm LIMIT $batch_size
+SET s.uid = coalesce(s.uid, %s), r.uid = coalesce(r.uid, %s)
+WITH s, r, dm
+MERGE (c:Conversation {key: %s})
+MERGE (s)-[:IN_CONVERSATION]->(c)
+MERGE (r)-[:IN_CONVERSATION]->(c)
+CREATE (c)-[:HAS_DM]->(dm)
+RETURN count(dm) AS migrated
+""" % (NEW_UID, NEW_UID, conversation_key("s", "r"))
+
+
+BACKFILL_SUMMARIES = """
+MATCH (c:Conversation) WHERE c.last_timestamp IS NULL
+WITH c LIMIT $batch_size
+CALL {
+    WITH c
+    MATCH (c)-[:HAS_DM]->(dm:DirectMessage)<-[:SENT_DM]-(s:User)
+    RETURN dm, s ORDER BY dm.timestamp DESC LIMIT 1
+}
+SET c.last_preview = left(dm.content, $preview_length),
+    c.last_timestamp = dm.timestamp,
+    c.last_sender_id = s.uid
+WITH c
+MATCH (:User)-[member:IN_CONVERSATION]->(c)
+SET member.unread = coalesce(member.unread, 0), member.last_read = coalesce(member.last_read, c.last_timestamp)
+RETURN count(DISTINCT c) AS summarized
+"""
+
+
+async def assign_user_uids(batch_size: int) -> int:
+    """Give up to `batch_size` users created before User.uid their uid; returns how many."""
+    records = await write(ASSIGN_UIDS, batch_size=batch_size)
+    return records[0]["assigned"]
+
+
+async def rekey_conversations(batch_size: int) -> int:
+    """Move up to `batch_size` elementId-keyed conversations to uid keys; returns how many."""
+    records = await write(REKEY_BATCH, batch_size=batch_size)
+    return records[0]["processed"]
+
+
+async def delete_orphan_dms(batch_size: int) -> int:
+    """Delete up to `batch_size` DMs whose sender or receiver no longer exists."""
+    records = await write(DELETE_ORPHAN_DMS, batch_size=batch_size)
+    return records[0]["deleted"]
+
+
+async def backfill_conversations(batch_size: int) -> int:
+    """Attach up to `batch_size` DMs that predate conversations; returns how many."""
+    records = await write(BACKFILL_BATCH, batch_size=batch_size)
+    return records[0]["migrated"]
+
+
+async def backfill_summaries(batch_size: int) -> int:
+    """Fill in inbox summaries for up to `batch_size` conversations missing one.
+
+    Messages sent before unread tracking existed count as read.
+    """
+    records = await write(BACKFILL_SUMMARIES, batch_size=batch_size, preview_length=PREVIEW_LENGTH)
+    return records[0]["summarized"]
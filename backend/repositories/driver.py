@@ -0,0 +1,73 @@
+"""
+Async Neo4j driver shared by the repository modules.
+
+Hot routes and Socket.IO handlers query through here instead of neomodel, so
+they await the database on the event loop rather than occupying a worker
+thread each. The connection comes from the same settings as neomodel
+(config.py), and the pool size is set with NEO4J_POOL_SIZE.
+"""
+import os
+from urllib.parse import urlparse
+
+from neo4j import AsyncGraphDatabase, RoutingControl
+from neomodel import config as neomodel_config
+
+POOL_SIZE = int(os.getenv("NEO4J_POOL_SIZE", 100))
+ACQUIRE_TIMEOUT = float(os.getenv("NEO4J_ACQUIRE_TIMEOUT", 30))
+
+_driver = None
+_in_flight = 0  # queries started and not finished, including those waiting for a connection
+
+
+def _connection_settings(url: str):
+    """Split a neomodel DATABASE_URL into a driver URI and auth tuple."""
+    parsed = urlparse(url)
+    netloc = parsed.hostname or ""
+    if parsed.port:
+        netloc = f"{netloc}:{parsed.port}"
+    auth = (parsed.username, parsed.password) if parsed.username else None
+    return f"{parsed.scheme}://{netloc}", auth
+
+
+def get_driver():
+    global _driver
+    if _driver is None:
+        uri, auth = _connection_settings(os.getenv("NEO4J_URI") or neomodel_config.DATABASE_URL)
+        _driver = AsyncGraphDatabase.driver(
+            uri,
+            auth=auth,
+            max_connection_pool_size=POOL_SIZE,
+            connection_acquisition_timeout=ACQUIRE_TIMEOUT,
+        )
+    return _driver
+
+
+async def close_driver():
+    global _driver
+    if _driver is not None:
+        await _driver.close()
+        _driver = None
+
+
+def in_flight() -> int:
+    return _in_flight
+
+
+async def _execute(query: str, params: dict, routing):
+    global _in_flight
+    _in_flight += 1
+    try:
+        result = await get_driver().execute_query(query, params, routing_=routing)
+    finally:
+        _in_flight -= 1
+    return result.records
+
+
+async def read(query: str, **params):
+    """Run a read query in a managed (retried) transaction; returns records."""
+    return await _execute(query, params, RoutingControl.READ)
+
+
+async def write(query: str, **params):
+    """Run a write query in a managed (retried) transaction; returns records."""
+    return await _execute(query, params, RoutingControl.WRITE)
@@ -0,0 +1,266 @@
+"""
+Friendship and friend request queries.
+"""
+from repositories.driver import read, write
+
+
+# Outcomes returned by the request operations below
+NOT_FOUND = "not_found"
+ALREADY_FRIENDS = "already_friends"
+REQUEST_EXISTS = "request_exists"
+NO_REQUEST = "no_request"
+DONE = "done"
+
+BULK_MAX = 500
+
+
+async def send_request(sender: str, receiver: str) -> str:
+    """Create sender -> receiver unless they are friends or a request exists either way."""
+    records = await write(
+        """
+        OPTIONAL MATCH (s:User {username: $sender})
+        OPTIONAL MATCH (r:User {username: $receiver})
+        CALL {
+            WITH s, r
+            WITH s, r
+            WHERE s IS NOT NULL AND r IS NOT NULL
+              AND NOT EXISTS { (s)-[:FRIEND_WITH]-(r) }
+              AND NOT EXISTS { (s)-[:SENT_REQUEST]-(r) }
+            MERGE (s)-[:SENT_REQUEST]->(r)
+            RETURN count(*) AS created
+        }
+        RETURN CASE
+            WHEN s IS NULL OR r IS NULL THEN $not_found
+            WHEN created > 0 THEN $done
+            WHEN EXISTS { (s)-[:FRIEND_WITH]-(r) } THEN $already_friends
+            ELSE $request_exists
+        END AS outcome
+        """,
+        sender=sender,
+        receiver=receiver,
+        not_found=NOT_FOUND,
+        done=DONE,
+        already_friends=ALREADY_FRIENDS,
+        request_exists=REQUEST_EXISTS,
+    )
+    return records[0]["outcome"]
+
+
+async def accept_request(sender: str, receiver: str) -> str:
+    """Turn sender's pending request into a single undirected friendship."""
+    records = await write(
+        """
+        OPTIONAL MATCH (s:User {username: $sender})
+        OPTIONAL MATCH (r:User {username: $receiver})
+        CALL {
+            WITH s, r
+            MATCH (s)-[req:SENT_REQUEST]->(r)
+            OPTIONAL MATCH (r)-[back:SENT_REQUEST]->(s)
+            DELETE req, back
+            MERGE (s)-[:FRIEND_WITH]-(r)
+            RETURN count(*) AS accepted
+        }
+        RETURN CASE
+            WHEN s IS NULL OR r IS NULL THEN $not_found
+            WHEN accepted > 0 THEN $done
+            ELSE $no_request
+        END AS outcome
+        """,
+        sender=sender,
+        receiver=receiver,
+        not_found=NOT_FOUND,
+        done=DONE,
+        no_request=NO_REQUEST,
+    )
+    return records[0]["outcome"]
+
+
+async def delete_request(sender: str, receiver: str) -> str:
+    records = await write(
+        """
+        OPTIONAL MATCH (s:User {username: $sender})
+        OPTIONAL MATCH (r:User {username: $receiver})
+        CALL {
+            WITH s, r
+            MATCH (s)-[req:SENT_REQUEST]->(r)
+            DELETE req
+            RETURN count(*) AS deleted
+        }
+        RETURN CASE
+            WHEN s IS NULL OR r IS NULL THEN $not_found
+            WHEN deleted > 0 THEN $done
+            ELSE $no_request
+        END AS outcome
+        """,
+        sender=sender,
+        receiver=receiver,
+        not_found=NOT_FOUND,
+        done=DONE,
+        no_request=NO_REQUEST,
+    )
+    return records[0]["outcome"]
+
+
+async def accept_requests(receiver: str, senders: list):
+    """
+    Accept the pending requests from `senders` in one transaction.
+
+    Returns the senders whose requests were accepted (others had none
+    pending), or None if no such receiver.
+    """
+    records = await write(
+        """
+        OPTIONAL MATCH (r:User {username: $receiver})
+        CALL {
+            WITH r
+            UNWIND $senders AS sender
+            MATCH (s:User {username: sender})-[req:SENT_REQUEST]->(r)
+            OPTIONAL MATCH (r)-[back:SENT_REQUEST]->(s)
+            DELETE req, back
+            MERGE (s)-[:FRIEND_WITH]-(r)
+            RETURN collect(DISTINCT s.username) AS accepted
+        }
+        RETURN r IS NOT NULL AS found, accepted
+        """,
+        receiver=receiver,
+        senders=senders,
+    )
+    record = records[0]
+    return record["accepted"] if record["found"] else None
+
+
+async def reject_requests(receiver: str, senders: list):
+    """Delete the pending requests from `senders`; same return as accept_requests."""
+    records = await write(
+        """
+        OPTIONAL MATCH (r:User {username: $receiver})
+        CALL {
+            WITH r
+            UNWIND $senders AS sender
+            MATCH (s:User {username: sender})-[req:SENT_REQUEST]->(r)
+            DELETE req
+            RETURN collect(DISTINCT s.username) AS rejected
+        }
+        RETURN r IS NOT NULL AS found, rejected
+        """,
+        receiver=receiver,
+        senders=senders,
+    )
+    record = records[0]
+    return record["rejected"] if record["found"] else None
+
+
+async def pending(username: str):
+    """Users with a pending request to `username`, or None if no such user."""
+    records = await read(
+        """
+        MATCH (u:User {username: $username})
+        RETURN [(s:User)-[:SENT_REQUEST]->(u) | s {.username, .profile_picture}] AS pending
+        """,
+        username=username,
+    )
+    return records[0]["pending"] if records else None
+
+
+async def friends(username: str):
+    """Friends of `username`, or None if no such user."""
+    records = await read(
+        """
+        MATCH (u:User {username: $username})
+        CALL {
+            WITH u
+            OPTIONAL MATCH (u)-[:FRIEND_WITH]-(f:User)
+            WITH DISTINCT f
+            RETURN collect(f {.username, .profile_picture, .bio}) AS friends
+        }
+        RETURN friends
+        """,
+        username=username,
+    )
+    return records[0]["friends"] if records else None
+
+
+async def remove_friend(a: str, b: str) -> int:
+    """Delete the friendship between `a` and `b` (both directions); returns edges removed."""
+    records = await write(
+        """
+        MATCH (:User {username: $a})-[f:FRIEND_WITH]-(:User {username: $b})
+        DELETE f
+        RETURN count(f) AS removed
+        """,
+        a=a,
+        b=b,
+    )
+    return records[0]["removed"] if records else 0
+
+
+async def suggestions(username: str, candidates: int, limit: int):
+    """
+    Non-friends of `username` ranked by mutual friends, then shared servers.
+
+    Candidates come from two bounded expansions, friends of friends ranked
+    by mutual friends and co-members of the user's servers ranked by shared
+    servers, each capped at `candidates` rows so a user in a huge server
+    doesn't scan all of it. Existing friends and users with a pending
+    request either way are dropped before the caps, so they can't crowd
+    out real suggestions. None if no such user.
+    """
+    records = await read(
+        """
+        MATCH (me:User {username: $username})
+        CALL {
+            WITH me
+            CALL {
+                WITH me
+                MATCH (me)-[:FRIEND_WITH]-(f:User)-[:FRIEND_WITH]-(c:User)
+                WHERE c <> me
+                  AND NOT EXISTS { (me)-[:FRIEND_WITH]-(c) }
+                  AND NOT EXISTS { (me)-[:SENT_REQUEST]-(c) }
+                WITH c, count(DISTINCT f) AS mutual
+                ORDER BY mutual DESC LIMIT $candidates
+                RETURN c, mutual
+                UNION
+                WITH me
+                MATCH (me)-[:MEMBER_OF]->(s:Server)<-[:MEMBER_OF]-(c:User)
+                WHERE c <> me
+                  AND NOT EXISTS { (me)-[:FRIEND_WITH]-(c) }
+                  AND NOT EXISTS { (me)-[:SENT_REQUEST]-(c) }
+                WITH c, count(DISTINCT s) AS shared
+                ORDER BY shared DESC LIMIT $candidates
+                RETURN c, 0 AS mutual
+            }
+            WITH me, c, max(mutual) AS mutual
+            WITH c, mutual, COUNT { (me)-[:MEMBER_OF]->(:Server)<-[:MEMBER_OF]-(c) } AS shared
+            ORDER BY mutual DESC, shared DESC, c.username
+            LIMIT $limit
+            RETURN collect(c {.username, .profile_picture, .bio, mutual_friends: mutual, shared_servers: shared}) AS users
+        }
+        RETURN users
+        """,
+        username=username,
+        candidates=candidates,
+        limit=limit,
+    )
+    return records[0]["users"] if records else None
+
+
+DEDUPE_BATCH = 1000
+
+
+async def dedupe_friendships(batch_size: int = DEDUPE_BATCH) -> int:
+    """
+    Delete up to `batch_size` redundant FRIEND_WITH edges, keeping one per
+    pair. Accepting used to create one edge in each direction. Returns how
+    many were removed; 0 once every pair has a single edge.
+    """
+    records = await write(
+        """
+        MATCH (a:User)-[keep:FRIEND_WITH]-(b:User)-[extra:FRIEND_WITH]-(a)
+        WHERE elementId(keep) < elementId(extra)
+        WITH DISTINCT extra LIMIT $batch_size
+        DELETE extra
+        RETURN count(*) AS removed
+        """,
+        batch_size=batch_size,
+    )
+    return records[0]["removed"] if records else 0
@@ -0,0 +1,17 @@
+"""
+Helpers for building Lucene queries against the full-text indexes in
+repositories/schema.py.
+
+Only word characters are kept from user input, so no Lucene syntax
+(quotes, wildcards, boolean operators) can be injected, and terms are
+lowercased to match what the standard analyzer indexed; wildcard and
+fuzzy terms bypass the analyzer.
+"""
+import re
+
+MAX_TERMS = 5
+FUZZY_MIN_LENGTH = 4  # shorter terms match too much at edit distance 1
+
+
+def search_terms(text: str, max_terms: int = MAX_TERMS) -> list:
+    return [t.lower() for t in re.findall(r"\w+", text)][:max_terms]
@@ -0,0 +1,175 @@
+"""
+Game catalog queries.
+
+Pages are keyset-paged on the sort key plus external_id (see SORTS), with
+the source / playable filters applied in the same query. Each sort key has
+a range index (repositories/schema.py) that the page query walks in order,
+so a page reads about `limit` games however large the catalog is; games
+without a sort key value are not listed. Search goes through the
+`game_search` full-text index (repositories/schema.py).
+"""
+from typing import Optional
+
+from repositories.driver import read, write
+from repositories.fulltext import search_terms, FUZZY_MIN_LENGTH
+
+GAME_FIELDS = "g {.external_id, .title, .description, .cover_url, .play_url, .source}"
+
+# sort name -> (sort key, direction); external_id breaks ties in the same direction
+SORTS = {
+    "newest": ("created_at", "DESC"),
+    "oldest": ("created_at", "ASC"),
+    "title": ("title", "ASC"),
+}
+DEFAULT_SORT = "newest"
+
+_FILTERS = """
+    ($source IS NULL OR g.source = $source)
+    AND ($playable IS NULL OR (coalesce(g.play_url, '') <> '') = $playable)
+"""
+
+
+async def page(
+    sort: str,
+    after: Optional[list],
+    limit: int,
+    source: Optional[str] = None,
+    playable: Optional[bool] = None,
+):
+    """
+    Up to `limit` games in `sort` order after the `[sort_value, external_id]`
+    key `after`. Each row also carries its `sort_value` for the next cursor.
+    """
+    key, direction = SORTS[sort]
+    op, tied = ("<", ">=") if direction == "DESC" else (">", "<=")
+    # A bound on g.{key} alone lets the planner seek (or scan) the sort key's
+    # index in order, so only the external_id tie-break is sorted on top of it
+    bound = f"g.{key} IS NOT NULL"
+    params = {"limit": limit, "source": source, "playable": playable}
+    if after:
+        params["after_value"], params["after_id"] = after
+        bound = (
+            f"g.{key} {op}= $after_value"
+            f" AND NOT (g.{key} = $after_value AND g.external_id {tied} $after_id)"
+        )
+    records = await read(
+        f"""
+        MATCH (g:Game)
+        USING INDEX g:Game({key})
+        WHERE {bound} AND {_FILTERS}
+        RETURN {GAME_FIELDS} AS game, g.{key} AS sort_value
+        ORDER BY g.{key} {direction}, g.external_id {direction}
+        LIMIT $limit
+        """,
+        **params,
+    )
+    return [(r["game"], r["sort_value"]) for r in records]
+
+
+def search_query(text: str) -> Optional[str]:
+    """
+    Lucene query for `text`. Every term matches title words exactly (boosted)
+    or with one typo, and description words; the last term, which may
+    still be being typed, also matches as a title prefix. Several terms
+    also boost titles containing them as a phrase. None if `text` has no
+    searchable terms.
+    """
+    terms = search_terms(text)
+    clauses = []
+    for term in terms:
+        clauses += [f"title:{term}^3", f"description:{term}"]
+        if len(term) >= FUZZY_MIN_LENGTH:
+            clauses.append(f"title:{term}~1")
+    if terms:
+        clauses.append(f"title:{terms[-1]}*^2")
+    if len(terms) > 1:
+        clauses.append(f'title:"{" ".join(terms)}"^4')
+    return " OR ".join(clauses) or None
+
+
+async def search(text: str, skip: int, limit: int):
+    """Games matching `text` by relevance (Lucene BM25 score), `limit` from `skip`."""
+    query = search_query(text)
+    if query is None:
+        return []
+    records = await read(
+        f"""
+        CALL db.index.fulltext.queryNodes('game_search', $query, {{skip: $skip, limit: $limit}})
+        YIELD node AS g, score
+        RETURN {GAME_FIELDS} AS game, score
+        """,
+        query=query,
+        skip=skip,
+        limit=limit,
+    )
+    return [{**r["game"], "score": r["score"]} for r in records]
+
+
+async def count(source: Optional[str] = None, playable: Optional[bool] = None) -> int:
+    records = await read(
+        f"MATCH (g:Game) WHERE {_FILTERS} RETURN count(g) AS total",
+        source=source,
+        playable=playable,
+    )
+    return records[0]["total"]
+
+
+async def get(external_id: str):
+    records = await read(
+        f"MATCH (g:Game {{external_id: $external_id}}) RETURN {GAME_FIELDS} AS game",
+        external_id=external_id,
+    )
+    return records[0]["game"] if records else None
+
+
+async def generation() -> int:
+    """Catalog generation; bumped every time the catalog is seeded."""
+    records = await read(
+        "OPTIONAL MATCH (s:CatalogState {name: 'games'}) RETURN coalesce(s.generation, 0) AS generation"
+    )
+    return records[0]["generation"]
+
+
+async def bump_generation() -> int:
+    records = await write(
+        """
+        MERGE (s:CatalogState {name: 'games'})
+        ON CREATE SET s.generation = 0
+        SET s.generation = s.generation + 1
+        RETURN s.generation AS generation
+        """
+    )
+    return records[0]["generation"]
+
+
+async def upsert_batch(rows: list, now: float) -> dict:
+    """
+    MERGE a chunk of normalized games (see utils.game_row) in one transaction.
+
+    A game whose stored content_hash equals the row's is left untouched;
+    empty incoming fields keep the stored value, as the per-game upsert
+    did. Returns counts of created, updated and unchanged games.
+    """
+    records = await write(
+        """
+        UNWIND $rows AS r
+        OPTIONAL MATCH (old:Game {external_id: r.external_id})
+        WITH r, old IS NULL AS created, coalesce(old.content_hash = r.content_hash, false) AS unchanged
+        MERGE (g:Game {external_id: r.external_id})
+        ON CREATE SET g.created_at = $now
+        FOREACH (_ IN CASE WHEN unchanged THEN [] ELSE [1] END |
+            SET g.title = r.title,
+                g.description = CASE WHEN r.description <> '' THEN r.description ELSE g.description END,
+                g.cover_url = coalesce(r.cover_url, g.cover_url),
+                g.play_url = coalesce(r.play_url, g.play_url),
+                g.source = coalesce(g.source, r.source),
+                g.content_hash = r.content_hash
+        )
+        RETURN sum(CASE WHEN created THEN 1 ELSE 0 END) AS created,
+               sum(CASE WHEN NOT created AND NOT unchanged THEN 1 ELSE 0 END) AS updated,
+               sum(CASE WHEN unchanged THEN 1 ELSE 0 END) AS unchanged
+        """,
+        rows=rows,
+        now=now,
+    )
+    return dict(records[0])
@@ -0,0 +1,100 @@
+"""
+Channel message queries.
+"""
+from typing import Optional
+
+from fastapi import HTTPException
+
+from pagination import encode_cursor, decode_cursor, DEFAULT_PAGE_SIZE
+from repositories.driver import read, write
+
+INSERT_MESSAGES = """
+UNWIND $rows AS r
+MATCH (c:Channel) WHERE elementId(c) = r.channel_id
+MATCH (u:User {username: r.sender})
+CREATE (m:Message {uid: r.uid, content: r.content, type: r.type, timestamp: r.timestamp})
+MERGE (c)-[:HAS_MESSAGE]->(m)
+MERGE (u)-[:SENT]->(m)
+"""
+
+
+async def insert_messages(rows: list):
+    """Write message rows and their relationships in one transaction."""
+    await write(INSERT_MESSAGES, rows=rows)
+
+
+async def channel_page(
+    channel_name: str,
+    server_name: Optional[str] = None,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+):
+    """Fetch one keyset page of a channel's messages in a single query.
+
+    Rows are ordered newest-first on (timestamp, id). Returns None when the
+    channel does not exist, otherwise `(rows, next_cursor)`; `next_cursor`
+    is None once there is nothing more in the requested direction. Without
+    `server_name` the first channel with that name is used, so callers must
+    make sure the name is unambiguous (controllers/chat.py resolve_server).
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either 'before' or 'after', not both")
+
+    params = {"channel": channel_name, "server": server_name, "limit": limit + 1}
+    if server_name is not None:
+        match = "MATCH (s:Server {name: $server})-[:HAS_CHANNEL]->(c:Channel {name: $channel})"
+    else:
+        match = "MATCH (c:Channel {name: $channel}) OPTIONAL MATCH (s:Server)-[:HAS_CHANNEL]->(c)"
+
+    where, order = "", "DESC"
+    if before or after:
+        params["ts"], params["id"] = decode_cursor(before or after, 2)
+        op = "<" if before else ">"
+        where = (
+            f"WHERE m.timestamp {op} $ts "
+            f"OR (m.timestamp = $ts AND coalesce(m.uid, elementId(m)) {op} $id)"
+        )
+        order = "DESC" if before else "ASC"
+
+    records = await read(
+        f"""
+        {match}
+        WITH s, c LIMIT 1
+        OPTIONAL MATCH (c)-[:HAS_MESSAGE]->(m:Message)
+        {where}
+        WITH s, c, m, coalesce(m.uid, elementId(m)) AS mid
+        ORDER BY m.timestamp {order}, mid {order}
+        LIMIT $limit
+        RETURN s.name AS server, c.name AS channel, mid, m.content AS content,
+               m.type AS type, m.timestamp AS timestamp,
+               head([(u:User)-[:SENT]->(m) | u {{.username, .profile_picture}}]) AS sender
+        """,
+        **params,
+    )
+    if not records:
+        return None
+
+    rows = []
+    for r in records:
+        if r["mid"] is None:
+            continue
+        sender = r["sender"]
+        rows.append({
+            "id": r["mid"],
+            "content": r["content"],
+            "type": r["type"] or "text",
+            "timestamp": r["timestamp"],
+            "sender": sender["username"] if sender else None,
+            "profile_picture": sender["profile_picture"] if sender else None,
+            "channel": r["channel"],
+            "server": r["server"],
+        })
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+    if after:
+        rows.reverse()
+    return rows, next_cursor
@@ -0,0 +1,41 @@
+"""
+Constraints and indexes the Cypher repositories rely on.
+
+neomodel's install_labels is never run against the Aura database, so the
+statements here are applied at startup (main.py) and by the migration
+scripts. Every statement is idempotent.
+"""
+from repositories.driver import write
+
+SCHEMA = [
+    # every User / Server lookup and the username-ordered listings (repositories/users.py)
+    "CREATE CONSTRAINT user_username IF NOT EXISTS FOR (u:User) REQUIRE u.username IS UNIQUE",
+    "CREATE CONSTRAINT server_name IF NOT EXISTS FOR (s:Server) REQUIRE s.name IS UNIQUE",
+    # message lookups by the server-assigned id (controllers/chat.py delete_message)
+    "CREATE CONSTRAINT message_uid IF NOT EXISTS FOR (m:Message) REQUIRE m.uid IS UNIQUE",
+    "CREATE CONSTRAINT conversation_key IF NOT EXISTS FOR (c:Conversation) REQUIRE c.key IS UNIQUE",
+    # conversation keys are built from it (repositories/direct_messages.py)
+    "CREATE CONSTRAINT user_uid IF NOT EXISTS FOR (u:User) REQUIRE u.uid IS UNIQUE",
+    # repositories.users.search; Neo4j keeps it current on every User write
+    "CREATE FULLTEXT INDEX user_search IF NOT EXISTS FOR (u:User) ON EACH [u.username, u.bio]",
+    # repositories.games.upsert_batch MERGEs on it
+    "CREATE CONSTRAINT game_external_id IF NOT EXISTS FOR (g:Game) REQUIRE g.external_id IS UNIQUE",
+    # repositories.games page orders
+    "CREATE INDEX game_created_at IF NOT EXISTS FOR (g:Game) ON (g.created_at)",
+    "CREATE INDEX game_title IF NOT EXISTS FOR (g:Game) ON (g.title)",
+    # repositories.games.search
+    "CREATE FULLTEXT INDEX game_search IF NOT EXISTS FOR (g:Game) ON EACH [g.title, g.description]",
+]
+
+
+async def ensure_schema():
+    """Apply every statement; one failing (e.g. a constraint existing data
+    violates) doesn't keep the others from being applied."""
+    errors = []
+    for statement in SCHEMA:
+        try:
+            await write(statement)
+        except Exception as e:
+            errors.append(f"{statement}: {e}")
+    if errors:
+        raise RuntimeError("; ".join(errors))
@@ -0,0 +1,237 @@
+"""
+Server, membership and channel queries.
+"""
+from typing import Optional
+
+from repositories.driver import read, write
+
+
+async def summaries(name: Optional[str] = None, members_limit: int = 0):
+    """Summaries of every server (or just `name`) from one aggregated query.
+
+    Each summary carries the member count and channel list; `members_limit`
+    > 0 also includes the first page of member usernames.
+    """
+    where = "WHERE s.name = $name" if name is not None else ""
+    records = await read(
+        f"""
+        MATCH (s:Server)
+        {where}
+        CALL {{
+            WITH s
+            MATCH (s)-[:HAS_CHANNEL]->(c:Channel)
+            RETURN collect({{name: c.name, type: coalesce(c.type, 'text')}}) AS channels
+        }}
+        CALL {{
+            WITH s
+            OPTIONAL MATCH (u:User)-[:MEMBER_OF]->(s)
+            WITH u ORDER BY u.username LIMIT $members_limit
+            RETURN collect(u.username) AS members
+        }}
+        RETURN s.name AS name, s.description AS description,
+               COUNT {{ (:User)-[:MEMBER_OF]->(s) }} AS member_count, channels, members
+        ORDER BY s.name
+        """,
+        name=name,
+        members_limit=members_limit,
+    )
+    result = []
+    for r in records:
+        summary = {
+            "name": r["name"],
+            "description": r["description"],
+            "member_count": r["member_count"],
+            "channels": r["channels"],
+        }
+        if members_limit:
+            summary["members"] = r["members"]
+        result.append(summary)
+    return result
+
+
+async def members_page(name: str, after: Optional[str], limit: int):
+    """Up to `limit` members after username `after`, or None if no server."""
+    records = await read(
+        """
+        MATCH (s:Server {name: $name})
+        CALL {
+            WITH s
+            OPTIONAL MATCH (u:User)-[:MEMBER_OF]->(s)
+            WHERE $after IS NULL OR u.username > $after
+            WITH u ORDER BY u.username LIMIT $limit
+            RETURN collect(u {.username, .profile_picture}) AS members
+        }
+        RETURN members
+        """,
+        name=name,
+        after=after,
+        limit=limit,
+    )
+    return records[0]["members"] if records else None
+
+
+async def exists(name: str) -> bool:
+    records = await read("RETURN EXISTS { MATCH (:Server {name: $name}) } AS found", name=name)
+    return records[0]["found"]
+
+
+async def create(name: str, description: str) -> bool:
+    """Create a server; False if the name is already taken."""
+    records = await write(
+        """
+        OPTIONAL MATCH (existing:Server {name: $name})
+        WITH existing
+        CALL {
+            WITH existing
+            WITH existing WHERE existing IS NULL
+            CREATE (:Server {name: $name, description: $description})
+        }
+        RETURN existing IS NULL AS created
+        """,
+        name=name,
+        description=description,
+    )
+    return records[0]["created"]
+
+
+async def update_description(name: str, description: str) -> bool:
+    records = await write(
+        "MATCH (s:Server {name: $name}) SET s.description = $description RETURN count(s) AS n",
+        name=name,
+        description=description,
+    )
+    return records[0]["n"] > 0
+
+
+async def delete(name: str) -> bool:
+    """Delete a server; its channels and messages stay, as with neomodel's delete()."""
+    records = await write(
+        """
+        MATCH (s:Server {name: $name})
+        DETACH DELETE s
+        RETURN count(*) AS n
+        """,
+        name=name,
+    )
+    return records[0]["n"] > 0
+
+
+async def is_member(server_name: str, username: str) -> bool:
+    records = await read(
+        "RETURN EXISTS { MATCH (:User {username: $username})-[:MEMBER_OF]->(:Server {name: $server}) } AS member",
+        server=server_name,
+        username=username,
+    )
+    return records[0]["member"]
+
+
+async def join(server_name: str, username: str):
+    """Add a membership. Returns (server_found, user_found, already_member)."""
+    records = await write(
+        """
+        OPTIONAL MATCH (s:Server {name: $server})
+        OPTIONAL MATCH (u:User {username: $username})
+        WITH s, u,
+             CASE WHEN s IS NULL OR u IS NULL THEN false
+                  ELSE EXISTS { (u)-[:MEMBER_OF]->(s) } END AS already
+        FOREACH (_ IN CASE WHEN s IS NOT NULL AND u IS NOT NULL AND NOT already THEN [1] ELSE [] END |
+            MERGE (u)-[:MEMBER_OF]->(s))
+        RETURN s IS NOT NULL AS server_found, u IS NOT NULL AS user_found, already
+        """,
+        server=server_name,
+        username=username,
+    )
+    r = records[0]
+    return r["server_found"], r["user_found"], r["already"]
+
+
+async def leave(server_name: str, username: str):
+    """Remove a membership. Returns (server_found, user_found, was_member)."""
+    records = await write(
+        """
+        OPTIONAL MATCH (s:Server {name: $server})
+        OPTIONAL MATCH (u:User {username: $username})
+        OPTIONAL MATCH (u)-[r:MEMBER_OF]->(s)
+        WITH s, u, collect(r) AS rels
+        FOREACH (r IN rels | DELETE r)
+        RETURN s IS NOT NULL AS server_found, u IS NOT NULL AS user_found, size(rels) > 0 AS was_member
+        """,
+        server=server_name,
+        username=username,
+    )
+    r = records[0]
+    return r["server_found"], r["user_found"], r["was_member"]
+
+
+async def channels(server_name: str):
+    """Channel list of a server, or None if the server does not exist."""
+    records = await read(
+        """
+        MATCH (s:Server {name: $server})
+        CALL {
+            WITH s
+            MATCH (s)-[:HAS_CHANNEL]->(c:Channel)
+            RETURN collect({name: c.name, type: coalesce(c.type, 'text')}) AS channels
+        }
+        RETURN channels
+        """,
+        server=server_name,
+    )
+    return records[0]["channels"] if records else None
+
+
+async def message_context(server_name: str, channel_name: str, username: str):
+    """Resolve what posting a message needs in one query.
+
+    Returns None if the server does not exist, otherwise a dict with the
+    channel's element id and the sender's username/avatar (None if missing).
+    """
+    records = await read(
+        """
+        MATCH (s:Server {name: $server})
+        OPTIONAL MATCH (s)-[:HAS_CHANNEL]->(c:Channel {name: $channel})
+        OPTIONAL MATCH (u:User {username: $username})
+        RETURN elementId(c) AS channel_id, u.username AS username, u.profile_picture AS profile_picture
+        LIMIT 1
+        """,
+        server=server_name,
+        channel=channel_name,
+        username=username,
+    )
+    return dict(records[0]) if records else None
+
+
+async def channel_servers(channel_name: str) -> list:
+    """Names of the servers with a channel called `channel_name` (None for a server-less channel)."""
+    records = await read(
+        """
+        MATCH (c:Channel {name: $channel})
+        OPTIONAL MATCH (s:Server)-[:HAS_CHANNEL]->(c)
+        RETURN s.name AS server
+        """,
+        channel=channel_name,
+    )
+    return [r["server"] for r in records]
+
+
+async def channel_context(channel_name: str, username: str, server_name: Optional[str] = None):
+    """Like `message_context`, for callers that may name a channel without its server.
+
+    Returns a dict with the channel's element id and server name (None if
+    there is no such channel in a server) and the sender's username/avatar.
+    Without `server_name` the channel name must be unambiguous (`channel_servers`).
+    """
+    records = await read(
+        """
+        OPTIONAL MATCH (s:Server)-[:HAS_CHANNEL]->(c:Channel {name: $channel})
+        WHERE $server IS NULL OR s.name = $server
+        OPTIONAL MATCH (u:User {username: $username})
+        RETURN elementId(c) AS channel_id, s.name AS server,
+               u.username AS username, u.profile_picture AS profile_picture
+        LIMIT 1
+        """,
+        channel=channel_name,
+        server=server_name,
+        username=username,
+    )
+    return dict(records[0])
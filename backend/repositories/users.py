@@ -0,0 +1,165 @@
+"""
+User listing and search queries.
+
+Both listings page alphabetically by username (the unique index on
+User.username serves the ORDER BY and the STARTS WITH filter), so a page
+costs the same no matter how many users exist. Search goes through the
+`user_search` full-text index (repositories/schema.py).
+
+Deleting a user also deletes their DMs and conversations
+(repositories/direct_messages.py), so no one is left with a one-sided thread.
+"""
+from typing import Optional
+
+from repositories.driver import read, write
+from repositories.fulltext import search_terms, FUZZY_MIN_LENGTH
+
+SEARCH_OVERFETCH = 4  # index hits re-ranked per result, so prefix matches surface
+
+
+async def directory_page(viewer: str, prefix: Optional[str], after: Optional[str], limit: int):
+    """
+    Up to `limit` users (other than `viewer`) after username `after`, each
+    with the viewer's relationship status, or None if no viewer.
+    """
+    records = await read(
+        """
+        MATCH (me:User {username: $viewer})
+        CALL {
+            WITH me
+            MATCH (u:User)
+            WHERE u <> me
+              AND ($prefix IS NULL OR u.username STARTS WITH $prefix)
+              AND ($after IS NULL OR u.username > $after)
+            WITH me, u ORDER BY u.username LIMIT $limit
+            OPTIONAL MATCH (me)-[f:FRIEND_WITH]-(u)
+            OPTIONAL MATCH (me)-[s:SENT_REQUEST]->(u)
+            OPTIONAL MATCH (me)<-[r:SENT_REQUEST]-(u)
+            WITH u, count(f) > 0 AS friends, count(s) > 0 AS sent, count(r) > 0 AS received
+            ORDER BY u.username
+            RETURN collect(u {
+                .username, .profile_picture, .bio,
+                status: CASE
+                    WHEN friends THEN 'friends'
+                    WHEN sent THEN 'pending_sent'
+                    WHEN received THEN 'pending_received'
+                    ELSE 'none'
+                END
+            }) AS users
+        }
+        RETURN users
+        """,
+        viewer=viewer,
+        prefix=prefix or None,
+        after=after,
+        limit=limit,
+    )
+    return records[0]["users"] if records else None
+
+
+async def list_page(prefix: Optional[str], after: Optional[str], limit: int):
+    """Up to `limit` users after username `after`, with their server names."""
+    records = await read(
+        """
+        MATCH (u:User)
+        WHERE ($prefix IS NULL OR u.username STARTS WITH $prefix)
+          AND ($after IS NULL OR u.username > $after)
+        WITH u ORDER BY u.username LIMIT $limit
+        RETURN u.username AS username, u.email AS email,
+               u.profile_picture AS profile_picture, u.bio AS bio,
+               u.created_at AS created_at,
+               [(u)-[:MEMBER_OF]->(s:Server) | s.name] AS servers
+        """,
+        prefix=prefix or None,
+        after=after,
+        limit=limit,
+    )
+    return [dict(r) for r in records]
+
+
+def search_query(text: str) -> Optional[str]:
+    """
+    Lucene query for `text`: per term an exact username match, a username
+    prefix, a one-edit fuzzy username match and a bio match, weighted in
+    that order. None if `text` has no searchable terms.
+    """
+    clauses = []
+    for term in search_terms(text):
+        clauses += [f"username:{term}^4", f"username:{term}*^2", f"bio:{term}^0.5"]
+        if len(term) >= FUZZY_MIN_LENGTH:
+            clauses.append(f"username:{term}~1")
+    return " OR ".join(clauses) or None
+
+
+async def search(text: str, viewer: str, limit: int):
+    """
+    Best `limit` users matching `text` (other than `viewer`), each with its
+    score and the viewer's relationship status.
+    """
+    query = search_query(text)
+    if query is None:
+        return []
+    records = await read(
+        """
+        CALL db.index.fulltext.queryNodes('user_search', $query, {limit: $candidates})
+        YIELD node AS u, score
+        WHERE u.username <> $viewer
+        WITH u, score,
+             CASE
+                 WHEN toLower(u.username) = $text THEN 2
+                 WHEN toLower(u.username) STARTS WITH $text THEN 1
+                 ELSE 0
+             END AS tier
+        ORDER BY tier DESC, score DESC, u.username
+        LIMIT $limit
+        OPTIONAL MATCH (me:User {username: $viewer})
+        OPTIONAL MATCH (me)-[f:FRIEND_WITH]-(u)
+        OPTIONAL MATCH (me)-[s:SENT_REQUEST]->(u)
+        OPTIONAL MATCH (me)<-[r:SENT_REQUEST]-(u)
+        WITH u, score, tier, count(f) > 0 AS friends, count(s) > 0 AS sent, count(r) > 0 AS received
+        ORDER BY tier DESC, score DESC, u.username
+        RETURN u.username AS username, u.profile_picture AS profile_picture, u.bio AS bio, score,
+               CASE
+                   WHEN friends THEN 'friends'
+                   WHEN sent THEN 'pending_sent'
+                   WHEN received THEN 'pending_received'
+                   ELSE 'none'
+               END AS status
+        """,
+        query=query,
+        text=text.strip().lower(),
+        viewer=viewer,
+        candidates=limit * SEARCH_OVERFETCH + 1,
+        limit=limit,
+    )
+    return [dict(r) for r in records]
+
+
+async def delete(username: str) -> Optional[dict]:
+    """
+    Delete a user with their DMs and conversations. Returns how many of
+    each went with them, or None if there's no such user.
+    """
+    records = await write(
+        """
+        MATCH (u:User {username: $username})
+        CALL {
+            WITH u
+            OPTIONAL MATCH (u)-[:SENT_DM|RECEIVED_DM]->(dm:DirectMessage)
+            WITH collect(dm) AS dms
+            FOREACH (dm IN dms | DETACH DELETE dm)
+            RETURN size(dms) AS dms
+        }
+        CALL {
+            WITH u
+            OPTIONAL MATCH (u)-[:IN_CONVERSATION]->(c:Conversation)
+            WITH collect(c) AS conversations
+            FOREACH (c IN conversations | DETACH DELETE c)
+            RETURN size(conversations) AS conversations
+        }
+        DETACH DELETE u
+        RETURN dms, conversations
+        """,
+        username=username,
+    )
+    return dict(records[0]) if records else None
@@ -0,0 +1,107 @@
+"""
+Indexed registry of Socket.IO room memberships.
+
+Keeps a forward index (room -> sockets) and a reverse index (socket ->
+rooms) so join, leave and disconnect each touch only the rooms involved
+instead of scanning every room. A socket can sit in any number of chat
+channels and video rooms at once. Records use __slots__ to keep per-room
+and per-socket overhead small; `python -m scripts.bench_room_registry`
+measures it.
+"""
+from typing import Dict, List
+
+
+class _RoomRecord:
+    __slots__ = ("members",)
+
+    def __init__(self):
+        self.members = set()
+
+
+class _SocketRecord:
+    __slots__ = ("rooms",)
+
+    def __init__(self):
+        self.rooms = set()
+
+
+class RoomRegistry:
+    def __init__(self):
+        self._rooms: Dict[str, _RoomRecord] = {}
+        self._sockets: Dict[str, _SocketRecord] = {}
+        self.joins = 0
+        self.leaves = 0
+        self.disconnects = 0
+        self.peak_sockets = 0
+
+    def add(self, room: str, sid: str) -> int:
+        """Put `sid` in `room`; returns the room's new size."""
+        record = self._rooms.get(room)
+        if record is None:
+            record = self._rooms[room] = _RoomRecord()
+        socket = self._sockets.get(sid)
+        if socket is None:
+            socket = self._sockets[sid] = _SocketRecord()
+            self.peak_sockets = max(self.peak_sockets, len(self._sockets))
+        if sid not in record.members:
+            record.members.add(sid)
+            socket.rooms.add(room)
+            self.joins += 1
+        return len(record.members)
+
+    def remove(self, room: str, sid: str) -> int:
+        """Take `sid` out of `room`; returns the room's remaining size."""
+        record = self._rooms.get(room)
+        if record is None or sid not in record.members:
+            return len(record.members) if record else 0
+        record.members.discard(sid)
+        self.leaves += 1
+        socket = self._sockets.get(sid)
+        if socket is not None:
+            socket.rooms.discard(room)
+            if not socket.rooms:
+                del self._sockets[sid]
+        if not record.members:
+            del self._rooms[room]
+            return 0
+        return len(record.members)
+
+    def count(self, room: str) -> int:
+        record = self._rooms.get(room)
+        return len(record.members) if record else 0
+
+    def members(self, room: str) -> List[str]:
+        record = self._rooms.get(room)
+        return list(record.members) if record else []
+
+    def rooms_of(self, sid: str) -> List[str]:
+        socket = self._sockets.get(sid)
+        return list(socket.rooms) if socket else []
+
+    def discard_sid(self, sid: str) -> List[str]:
+        """Drop a socket from every room it is in; returns those rooms."""
+        socket = self._sockets.pop(sid, None)
+        if socket is None:
+            return []
+        self.disconnects += 1
+        for room in socket.rooms:
+            record = self._rooms.get(room)
+            if record is None:
+                continue
+            record.members.discard(sid)
+            if not record.members:
+                del self._rooms[room]
+        return list(socket.rooms)
+
+    def stats(self) -> dict:
+        sizes = [len(record.members) for record in self._rooms.values()]
+        return {
+            "rooms": len(self._rooms),
+            "sockets": len(self._sockets),
+            "memberships": sum(sizes),
+            "largest_room": max(sizes, default=0),
+            "peak_sockets": self.peak_sockets,
+            "joins": self.joins,
+            "leaves": self.leaves,
+            "disconnects": self.disconnects,
+        }
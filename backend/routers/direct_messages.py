@@ -1,25 +1,50 @@
 from fastapi import APIRouter, Query, Body
 from controllers.direct_message import (
     send_direct_message_logic,
-    get_direct_messages_logic
+    get_direct_messages_logic,
+    get_inbox_logic,
+    mark_read_logic,
 )
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from rate_limit import enforce
+from typing import Optional
 
 router = APIRouter(prefix="/direct-messages", tags=["Direct Messages"])
 
 # Send a direct message
 @router.post("/send")
-def send_direct_message(
+async def send_direct_message(
     sender_username: str = Query(...),
     receiver_username: str = Query(...),
     data: dict = Body(...)
 ):
+    enforce("rest.direct_message", sender_username)
     content = data.get("content", "")
-    return send_direct_message_logic(sender_username, receiver_username, content)
+    return await send_direct_message_logic(sender_username, receiver_username, content)
 
 # Get messages between two users
 @router.get("/")
-def get_direct_messages(
+async def get_direct_messages(
     user1: str = Query(...),
-    user2: str = Query(...)
+    user2: str = Query(...),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
 ):
-    return get_direct_messages_logic(user1, user2)
+    """Newest-first page of a DM thread. Pass `next_cursor` back as
+    `before` to load older messages."""
+    return await get_direct_messages_logic(user1, user2, before, after, limit)
+
+# Inbox: last message and unread count per conversation
+@router.get("/inbox")
+async def get_inbox(
+    username: str = Query(...),
+    before: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    return await get_inbox_logic(username, before, limit)
+
+# Mark the conversation with a friend as read
+@router.post("/read")
+async def mark_read(username: str = Query(...), friend_username: str = Query(...)):
+    return await mark_read_logic(username, friend_username)
@@ -1,55 +1,100 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Body
+from typing import List, Optional
+from logging_setup import get_logger
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from rate_limit import enforce
 from controllers.friendrequest import (
     send_friend_request_logic,
     accept_friend_request_logic,
     reject_friend_request_logic,
+    accept_friend_requests_logic,
+    reject_friend_requests_logic,
+    unfriend_logic,
     get_pending_requests_logic,
     get_friends_logic,
+    get_suggestions_logic,
     get_all_users_logic
 )
 
 router = APIRouter(prefix="/friends", tags=["Friends"])
+log = get_logger(__name__)
 
 # ✅ Send Request
 @router.post("/request/{receiver_username}")
-def send_friend_request(receiver_username: str, sender_username: str = Query(...)):
-    return send_friend_request_logic(sender_username, receiver_username)
+async def send_friend_request(receiver_username: str, sender_username: str = Query(...)):
+    enforce("rest.friend", sender_username)
+    return await send_friend_request_logic(sender_username, receiver_username)
 
 # ✅ Accept Request
 @router.post("/accept/{sender_username}")
-def accept_friend_request(sender_username: str, receiver_username: str = Query(...)):
-    return accept_friend_request_logic(receiver_username, sender_username)
+async def accept_friend_request(sender_username: str, receiver_username: str = Query(...)):
+    enforce("rest.friend", receiver_username)
+    return await accept_friend_request_logic(receiver_username, sender_username)
 
 # ✅ Reject Request
 @router.post("/reject/{sender_username}")
-def reject_friend_request(sender_username: str, receiver_username: str = Query(...)):
-    return reject_friend_request_logic(receiver_username, sender_username)
+async def reject_friend_request(sender_username: str, receiver_username: str = Query(...)):
+    enforce("rest.friend", receiver_username)
+    return await reject_friend_request_logic(receiver_username, sender_username)
+
+# ✅ Accept many requests (body: {"senders": [...]})
+@router.post("/accept")
+async def accept_friend_requests(receiver_username: str = Query(...), senders: List[str] = Body(..., embed=True)):
+    enforce("rest.friend", receiver_username)
+    return await accept_friend_requests_logic(receiver_username, senders)
+
+# ✅ Reject many requests (body: {"senders": [...]})
+@router.post("/reject")
+async def reject_friend_requests(receiver_username: str = Query(...), senders: List[str] = Body(..., embed=True)):
+    enforce("rest.friend", receiver_username)
+    return await reject_friend_requests_logic(receiver_username, senders)
+
+# ✅ Unfriend
+@router.post("/unfriend/{friend_username}")
+async def unfriend(friend_username: str, username: str = Query(...)):
+    enforce("rest.friend", username)
+    return await unfriend_logic(username, friend_username)
 
 # ✅ Get Pending Requests
 @router.get("/requests")
-def get_pending_requests(username: str = Query(...)):
+async def get_pending_requests(username: str = Query(...)):
     try:
-        return get_pending_requests_logic(username)
-    except Exception as e:
-        print(f"❌ Error in get_pending_requests: {str(e)}")
+        return await get_pending_requests_logic(username)
+    except Exception:
+        log.error("friend.pending_failed", "Error in get_pending_requests", user=username, exc_info=True)
         raise
 
 # ✅ Get Friends List
 @router.get("/")
-def get_friends(username: str = Query(...)):
+async def get_friends(username: str = Query(...)):
+    try:
+        return await get_friends_logic(username)
+    except Exception:
+        log.error("friend.list_failed", "Error in get_friends", user=username, exc_info=True)
+        raise
+
+# ✅ Get Friend Suggestions
+@router.get("/suggestions")
+async def get_suggestions(username: str = Query(...), limit: int = Query(10, ge=1, le=50)):
+    """Non-friends ranked by mutual friends, then shared servers."""
     try:
-        return get_friends_logic(username)
-    except Exception as e:
-        print(f"❌ Error in get_friends: {str(e)}")
+        return await get_suggestions_logic(username, limit)
+    except Exception:
+        log.error("friend.suggestions_failed", "Error in get_suggestions", user=username, exc_info=True)
         raise
 
 # ✅ Get All Users (for friend requests)
 @router.get("/users")
-def get_all_users(username: str = Query(...)):
+async def get_all_users(
+    username: str = Query(...),
+    prefix: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Users alphabetically, optionally only those whose username starts with
+    `prefix`; pass the returned `next_cursor` as `after` for the next page."""
     try:
-        return get_all_users_logic(username)
-    except Exception as e:
-        print(f"❌ Error in get_all_users: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        return await get_all_users_logic(username, prefix, after, limit)
+    except Exception:
+        log.error("friend.directory_failed", "Error in get_all_users", user=username, exc_info=True)
         raise
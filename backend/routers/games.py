@@ -1,61 +1,116 @@
-from fastapi import APIRouter, HTTPException
-from models import Game
-from utils import fetch_gamepix_games, upsert_gamepix
+from fastapi import APIRouter, HTTPException, Query, Request
+from typing import Optional
+import catalog_cache
+import gamepix_ingest
+from pagination import encode_cursor, decode_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from repositories import games as games_repo
+from repositories.fulltext import search_terms
+from logging_setup import get_logger
 
 router = APIRouter()
+log = get_logger(__name__)
 
-# Helper to turn Game nodes into dicts
-def game_to_dict(g: Game):
+# Helper to add derived fields to a projected game row
+def game_to_dict(g: dict):
     return {
-        "external_id": g.external_id,
-        "title": g.title,
-        "description": g.description,
-        "cover_url": g.cover_url,
-        "play_url": g.play_url,
-        "source": g.source,
-        "playable": bool(g.play_url),  # <-- this will be True if play_url exists
+        **g,
+        "playable": bool(g["play_url"]),  # <-- this will be True if play_url exists
     }
 
 
-@router.post("/seed_gamepix")
-async def seed_gamepix(limit: int = 1000, offset: int = 0):
-    try:
-        data = await fetch_gamepix_games(offset=offset, limit=limit)
-    except Exception as e:
-        raise HTTPException(status_code=502, detail=f"Failed to fetch from GamePix: {e}")
-
-    if not data:
-        raise HTTPException(status_code=500, detail="Empty response from GamePix API")
+@router.post("/seed_gamepix", status_code=202)
+async def seed_gamepix(limit: Optional[int] = Query(None, ge=1), offset: int = Query(0, ge=0), resume: bool = True):
+    """Start ingesting the GamePix catalog in the background (all of it unless
+    `limit` is given). An unfinished earlier run with the same `offset` and
+    `limit` is resumed from its checkpoint unless `resume=false`; otherwise
+    the checkpoint is discarded. Poll GET /games/seed/status for progress."""
+    if not gamepix_ingest.ingest_job.start(offset=offset, limit=limit, resume=resume):
+        raise HTTPException(status_code=409, detail="Ingestion already running")
+    return gamepix_ingest.ingest_job.status()
 
-    upsert_gamepix(data)
 
-    games_list = data["data"] if "data" in data else []
+@router.get("/seed/status")
+async def seed_status():
+    return gamepix_ingest.ingest_job.status()
 
-    return {"seeded": True, "count": len(games_list)}
 
+@router.get("/")
+async def list_games(
+    request: Request,
+    sort: str = games_repo.DEFAULT_SORT,
+    source: Optional[str] = None,
+    playable: Optional[bool] = None,
+    after: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """One page of the catalog; `sort` is newest, oldest or title. Pass the
+    returned `next_cursor` as `after` (with the same sort and filters) for
+    the next page. `total` counts every game matching the filters.
+    Served from catalog_cache, with ETag / If-None-Match support."""
+    if sort not in games_repo.SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(games_repo.SORTS)}")
+    after_key = decode_cursor(after, 2) if after else None
 
+    async def load():
+        rows = await games_repo.page(sort, after_key, limit + 1, source, playable)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            game, sort_value = rows[-1]
+            next_cursor = encode_cursor(sort_value, game["external_id"])
+        total = await catalog_cache.total(source, playable)
+        return {"games": [game_to_dict(g) for g, _ in rows], "next_cursor": next_cursor, "total": total}
 
-@router.get("/")
-def list_games(limit: int = 50, offset: int = 0):
     try:
-        # fetch all games safely, slice by offset/limit
-        games = list(Game.nodes.all())
-        sliced = games[offset:offset + limit]
-        return [game_to_dict(g) for g in sliced]
+        entry = await catalog_cache.lookup(("page", sort, source, playable, after, limit), load)
     except Exception as e:
-        print("[ERROR] list_games crashed:", e)
+        log.error("game.list_failed", "list_games crashed", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Could not fetch games: {e}")
+    return catalog_cache.respond(request, entry)
+
+@router.get("/search")
+async def search_games(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100),
+    after: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Games ranked by relevance to `q` (title matches first, last word as a
+    prefix, one-typo tolerance). Pass `next_cursor` back as `after` for
+    the next page. Declared before /{external_id}; cached like the catalog."""
+    skip = decode_cursor(after, 1)[0] if after else 0
+    if not isinstance(skip, int) or skip < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    async def load():
+        rows = await games_repo.search(q, skip, limit + 1)
+        next_cursor = encode_cursor(skip + limit) if len(rows) > limit else None
+        return {"games": [game_to_dict(g) for g in rows[:limit]], "next_cursor": next_cursor}
+
+    try:
+        entry = await catalog_cache.lookup(("search", " ".join(search_terms(q)), skip, limit), load)
+    except Exception as e:
+        log.error("game.search_failed", "search_games crashed", query=q, exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Could not search games: {e}")
+    return catalog_cache.respond(request, entry)
 
 @router.get("/{external_id}")
-def get_game(external_id: str):
+async def get_game(external_id: str, request: Request):
+    async def load():
+        g = await games_repo.get(external_id)
+        return game_to_dict(g) if g else None
+
     try:
-        g = Game.nodes.get_or_none(external_id=external_id)
-        if not g:
-            print(f"[INFO] Game click attempted but not found: {external_id}")
+        entry = await catalog_cache.lookup(("game", external_id), load)
+        if entry is None:
+            log.info("game.not_found", "Game click attempted but not found", game=external_id)
             raise HTTPException(status_code=404, detail="Game not found")
-        
-        print(f"[INFO] Game clicked: {g.title} ({external_id}) → Play URL: {g.play_url}")
-        return game_to_dict(g)
+
+        g = entry.value
+        log.info("game.click", "Game clicked", game=external_id, title=g["title"], play_url=g["play_url"])
+        return catalog_cache.respond(request, entry)
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"[ERROR] get_game crashed for {external_id}: {e}")
+        log.error("game.get_failed", "get_game crashed", game=external_id, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Could not fetch game: {e}")
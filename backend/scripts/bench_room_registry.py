@@ -0,0 +1,75 @@
+"""
+Memory and speed benchmark for room_registry.RoomRegistry.
+
+Run from backend/:
+
+    python -m scripts.bench_room_registry --sockets 20000 --channels 3
+
+Each simulated socket joins `--channels` chat rooms (picked from
+`--rooms` channels) and, for every fifth socket, a video room. Reports
+the heap the registry holds, per-socket overhead, and the time per
+join/disconnect.
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from room_registry import RoomRegistry
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sockets", type=int, default=10000)
+    parser.add_argument("--channels", type=int, default=3, help="chat channels per socket")
+    parser.add_argument("--rooms", type=int, default=500, help="distinct chat channels")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sids = [f"{i:020x}" for i in range(args.sockets)]
+    channels = [f"chat:server{i % 50}:channel{i}" for i in range(args.rooms)]
+    plan = [
+        (sid, rng.sample(channels, min(args.channels, len(channels))), f"video:call{i // 5 % 200}" if i % 5 == 0 else None)
+        for i, sid in enumerate(sids)
+    ]
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    registry = RoomRegistry()
+    joins = 0
+    started = time.perf_counter()
+    for sid, rooms, video in plan:
+        for room in rooms:
+            registry.add(room, sid)
+            joins += 1
+        if video:
+            registry.add(video, sid)
+            joins += 1
+    join_seconds = time.perf_counter() - started
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    held = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    stats = registry.stats()
+
+    order = list(sids)
+    rng.shuffle(order)
+    started = time.perf_counter()
+    for sid in order:
+        registry.discard_sid(sid)
+    disconnect_seconds = time.perf_counter() - started
+
+    print(f"sockets            {stats['sockets']}")
+    print(f"rooms              {stats['rooms']}")
+    print(f"memberships        {stats['memberships']}")
+    print(f"registry heap      {held / 1024 / 1024:.2f} MiB")
+    print(f"per socket         {held / args.sockets:.0f} B")
+    print(f"per membership     {held / stats['memberships']:.0f} B")
+    print(f"join               {join_seconds / joins * 1e6:.2f} us")
+    print(f"disconnect         {disconnect_seconds / args.sockets * 1e6:.2f} us")
+    print(f"left over          {registry.stats()['rooms']} rooms, {registry.stats()['sockets']} sockets")
+
+
+if __name__ == "__main__":
+    main()
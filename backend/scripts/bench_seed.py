@@ -0,0 +1,85 @@
+"""
+Seeding benchmark for the bulk game upsert.
+
+Run from backend/ (with the usual NEO4J_* environment):
+
+    python -m scripts.bench_seed --games 10000 --chunk-sizes 100 500 2000
+
+Generates --games fake GamePix games (external ids prefixed "bench-") and,
+for each chunk size, seeds them three times through utils.upsert_games:
+into an empty catalog (all created), again unchanged (all skipped by the
+content hash), and with --changed of them edited (updated). Reports the
+time and games/s of each pass. The bench games are deleted before every
+chunk size and at the end, so real catalog rows are never touched.
+"""
+import argparse
+import asyncio
+import time
+
+import config  # noqa: F401  sets the neomodel DATABASE_URL the driver reads
+from repositories.driver import close_driver, write
+from repositories.schema import ensure_schema
+from utils import game_row, upsert_games
+
+BENCH_PREFIX = "bench-"
+
+
+def fake_games(count: int, edited: int = 0) -> list:
+    return [
+        {
+            "id": f"{BENCH_PREFIX}{i}",
+            "title": f"Bench Game {i}" + (" (v2)" if i < edited else ""),
+            "description": f"Benchmark game number {i}. " * 8,
+            "thumbnailUrl": f"https://img.example.com/{i}.png",
+            "url": f"https://play.example.com/{i}",
+        }
+        for i in range(count)
+    ]
+
+
+async def cleanup():
+    while True:
+        records = await write(
+            """
+            MATCH (g:Game) WHERE g.external_id STARTS WITH $prefix
+            WITH g LIMIT 5000
+            DETACH DELETE g
+            RETURN count(*) AS deleted
+            """,
+            prefix=BENCH_PREFIX,
+        )
+        if not records[0]["deleted"]:
+            return
+
+
+async def timed(rows: list, chunk_size: int):
+    started = time.perf_counter()
+    counts = await upsert_games(rows, chunk_size)
+    return time.perf_counter() - started, counts
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--changed", type=int, default=1000, help="games edited before the update pass")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[100, 500, 2000])
+    args = parser.parse_args()
+
+    original = [game_row(g, source="Bench") for g in fake_games(args.games)]
+    edited = [game_row(g, source="Bench") for g in fake_games(args.games, args.changed)]
+
+    await ensure_schema()
+    print(f"{'chunk':>6} {'pass':>10} {'seconds':>8} {'games/s':>9}  counts")
+    try:
+        for chunk_size in args.chunk_sizes:
+            await cleanup()
+            for name, rows in (("create", original), ("unchanged", original), ("update", edited)):
+                elapsed, counts = await timed(rows, chunk_size)
+                print(f"{chunk_size:>6} {name:>10} {elapsed:>8.2f} {len(rows) / elapsed:>9.0f}  {counts}")
+        await cleanup()
+    finally:
+        await close_driver()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
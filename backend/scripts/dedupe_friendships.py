@@ -0,0 +1,44 @@
+"""
+Collapse duplicate FRIEND_WITH edges left by the old accept logic.
+
+Run from backend/ (with the usual NEO4J_* environment):
+
+    python -m scripts.dedupe_friendships --batch-size 1000
+
+Accepting a friend request used to create one FRIEND_WITH edge in each
+direction; friendships are now a single undirected edge. This deletes the
+extra edges in batches of --batch-size, one transaction per batch, until
+every pair has one. All friend queries match FRIEND_WITH without a
+direction, so it is safe to run while the app is serving traffic, and to
+re-run.
+"""
+import argparse
+import asyncio
+import time
+
+import config  # noqa: F401  sets the neomodel DATABASE_URL the driver reads
+from repositories import friends as friends_repo
+from repositories.driver import close_driver
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=friends_repo.DEDUPE_BATCH)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    total = 0
+    try:
+        while True:
+            removed = await friends_repo.dedupe_friendships(args.batch_size)
+            if not removed:
+                break
+            total += removed
+            print(f"removed {total} duplicate friendship edges so far")
+    finally:
+        await close_driver()
+    print(f"done: {total} duplicate friendship edges removed in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+Local stand-in for the GamePix games API, for exercising ingestion.
+
+Run from backend/:
+
+    python -m scripts.fake_gamepix --games 5000 --port 8090 --fail-rate 0.1
+
+then point the backend at it and start a seed:
+
+    GAMEPIX_API_URL=http://127.0.0.1:8090/games uvicorn main:app
+    curl -X POST localhost:8000/games/seed_gamepix
+    curl localhost:8000/games/seed/status
+
+Serves GET /games?offset=&limit= from --games generated games in the
+GamePix response shape ({"data": [...]}). --latency-ms delays every
+response, --fail-rate answers that share of requests with a 503 (to see
+retries), and --die-after stops the server after that many pages (to see
+a job fail and resume from its checkpoint once the server is back).
+"""
+import argparse
+import asyncio
+import random
+
+from aiohttp import web
+
+
+def fake_game(i: int) -> dict:
+    return {
+        "id": f"fake-{i}",
+        "title": f"Fake Game {i}",
+        "description": f"Generated game {i} from the fake GamePix server.",
+        "thumbnailUrl": f"https://img.example.com/fake-{i}.png",
+        "url": f"https://play.example.com/fake-{i}",
+    }
+
+
+def make_app(args) -> web.Application:
+    served = {"pages": 0, "failed": 0}
+    rng = random.Random(args.seed)
+
+    async def games(request: web.Request):
+        offset = int(request.query.get("offset", 0))
+        limit = int(request.query.get("limit", 100))
+        if args.latency_ms:
+            await asyncio.sleep(args.latency_ms / 1000)
+        if rng.random() < args.fail_rate:
+            served["failed"] += 1
+            return web.json_response({"error": "try again"}, status=503)
+        served["pages"] += 1
+        if args.die_after and served["pages"] > args.die_after:
+            print(f"served {args.die_after} pages, exiting")
+            raise web.GracefulExit()
+        end = min(offset + limit, args.games)
+        return web.json_response({"data": [fake_game(i) for i in range(offset, end)]})
+
+    async def stats(request: web.Request):
+        return web.json_response(served)
+
+    app = web.Application()
+    app.router.add_get("/games", games)
+    app.router.add_get("/stats", stats)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--die-after", type=int, default=0, help="exit after serving this many pages")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    web.run_app(make_app(args), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Backfill Conversation nodes for direct messages sent before they existed.
+
+Run from backend/ (with the usual NEO4J_* environment):
+
+    python -m scripts.migrate_conversations --batch-size 1000
+
+Applies the schema constraints, gives users created before User.uid a
+uid, moves conversations keyed on elementIds to uid keys (dropping broken
+ones, see repositories/direct_messages.py), deletes DMs whose sender or
+receiver is gone, links the remaining unlinked DirectMessage nodes to their
+user pair's Conversation, then fills in the inbox summary (last message and
+unread counts) of conversations that lack one. Every phase runs in batches
+of --batch-size, one transaction per batch, until nothing is left.
+Safe to re-run and to run while the app is serving traffic; new DMs are
+already written into conversations with their summary.
+"""
+import argparse
+import asyncio
+import time
+
+import config  # noqa: F401  sets the neomodel DATABASE_URL the driver reads
+from repositories import direct_messages as dm_repo
+from repositories.driver import close_driver
+from repositories.schema import ensure_schema
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    await ensure_schema()
+    started = time.perf_counter()
+    total = summarized = 0
+    try:
+        for action, phase, noun in (
+            ("gave a uid to", dm_repo.assign_user_uids, "users"),
+            ("rekeyed or dropped", dm_repo.rekey_conversations, "elementId-keyed conversations"),
+            ("deleted", dm_repo.delete_orphan_dms, "orphaned direct messages"),
+        ):
+            done = 0
+            while batch := await phase(args.batch_size):
+                done += batch
+            print(f"{action} {done} {noun}")
+        while True:
+            migrated = await dm_repo.backfill_conversations(args.batch_size)
+            if not migrated:
+                break
+            total += migrated
+            print(f"linked {total} direct messages so far")
+        while True:
+            batch = await dm_repo.backfill_summaries(args.batch_size)
+            if not batch:
+                break
+            summarized += batch
+            print(f"summarized {summarized} conversations so far")
+    finally:
+        await close_driver()
+    print(f"done: {total} direct messages linked, {summarized} conversations summarized in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
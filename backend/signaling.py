@@ -0,0 +1,95 @@
+"""
+Batching of relayed WebRTC ICE candidates.
+
+During call setup every peer trickles a burst of candidates to every other
+peer, and the relay used to forward each one as its own `ice-candidate`
+emit. With SOCKETIO_ICE_BATCH_MS above zero, candidates from one socket to
+another are held for that window (or until SOCKETIO_ICE_BATCH_MAX of them
+are waiting) and forwarded together as one `ice-candidates` event:
+
+    {"from": sid, "candidates": [candidate, ...]}
+
+Only sockets that announced the "ice-candidates" feature in their connect
+auth (`{"features": ["ice-candidates"]}`) get batches; everyone else keeps
+receiving single `ice-candidate` events. Features are known per process,
+so with a multi-worker backplane a destination on another worker is sent
+single events.
+"""
+import asyncio
+import os
+
+ICE_BATCH_MS = float(os.getenv("SOCKETIO_ICE_BATCH_MS", 0))
+ICE_BATCH_MAX = int(os.getenv("SOCKETIO_ICE_BATCH_MAX", 32))
+FEATURE_ICE_BATCH = "ice-candidates"
+
+
+class IceCandidateBatcher:
+    def __init__(self, emit, window_ms=ICE_BATCH_MS, max_size=ICE_BATCH_MAX):
+        self.emit = emit  # sio.emit
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self._features = {}  # sid -> frozenset of announced features
+        self._pending = {}  # (from_sid, to_sid) -> [candidate, ...]
+
+        self.candidates = 0
+        self.single_emits = 0
+        self.batches = 0
+        self.batched_candidates = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def register(self, sid: str, auth):
+        features = auth.get("features") if isinstance(auth, dict) else None
+        if isinstance(features, list):
+            self._features[sid] = frozenset(f for f in features if isinstance(f, str))
+
+    def forget(self, sid: str):
+        self._features.pop(sid, None)
+        for key in [key for key in self._pending if sid in key]:
+            del self._pending[key]
+
+    def supports(self, sid: str, feature: str) -> bool:
+        return feature in self._features.get(sid, ())
+
+    async def relay(self, from_sid: str, to_sid: str, candidate):
+        self.candidates += 1
+        if not self.enabled or not self.supports(to_sid, FEATURE_ICE_BATCH):
+            self.single_emits += 1
+            await self.emit("ice-candidate", {"from": from_sid, "candidate": candidate}, to=to_sid)
+            return
+
+        key = (from_sid, to_sid)
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = []
+            asyncio.create_task(self._flush_later(key, batch))
+        batch.append(candidate)
+        if len(batch) >= self.max_size:
+            await self._flush(key, batch)
+
+    async def _flush_later(self, key, batch):
+        await asyncio.sleep(self.window)
+        await self._flush(key, batch)
+
+    async def _flush(self, key, batch):
+        if self._pending.get(key) is not batch:
+            return
+        del self._pending[key]
+        self.batches += 1
+        self.batched_candidates += len(batch)
+        from_sid, to_sid = key
+        await self.emit("ice-candidates", {"from": from_sid, "candidates": batch}, to=to_sid)
+
+    def stats(self) -> dict:
+        return {
+            "ice_batch_ms": self.window * 1000,
+            "candidates": self.candidates,
+            "single_emits": self.single_emits,
+            "batches": self.batches,
+            "batched_candidates": self.batched_candidates,
+            "avg_batch_size": round(self.batched_candidates / self.batches, 2) if self.batches else 0,
+            "emits_saved": self.batched_candidates - self.batches,
+            "pending": len(self._pending),
+        }
@@ -2,25 +2,80 @@
 Socket.IO server for real-time chat + video calls
 Integrates with FastAPI using python-socketio
 """
+from typing import Optional
+
 import socketio
-from typing import Dict, Set
+from jose import JWTError, jwt
+
+import membership_cache
+from controllers.users import SECRET_KEY, ALGORITHM
+from logging_setup import get_logger, library_logger
+from backplane import client_manager, room_state
+from broadcast_coalescer import BroadcastCoalescer, BATCH_ENABLED
+from load_shed import overload_reason, RETRY_AFTER
+from rate_limit import rate_limiter
+from signaling import IceCandidateBatcher
+from user_events import user_events, user_room
+from repositories import servers as servers_repo
 
 # Create Socket.IO server with ASGI support
 sio = socketio.AsyncServer(
     async_mode='asgi',
     cors_allowed_origins="*",
-    logger=True,
-    engineio_logger=True,
+    logger=library_logger("SOCKETIO_LOGGER", "socketio.server"),
+    engineio_logger=library_logger("ENGINEIO_LOGGER", "engineio.server"),
     cors_credentials=True,
     ping_timeout=60,
     ping_interval=25,
     async_handlers=True,
+    client_manager=client_manager,
 )
 
+log = get_logger(__name__)
+
 # ======== ROOM TRACKERS ========
-active_connections: Dict[str, dict] = {}  # socket_id → server/channel info
-channel_rooms: Dict[str, Set[str]] = {}   # "server:channel" → socket IDs
-video_call_rooms: Dict[str, Set[str]] = {}  # roomId → socket IDs
+# Membership lives in the backplane's room state so every worker sees the
+# same counts. Rooms a client picks are namespaced, both there and in
+# Socket.IO, so a video room id or a "server:channel" chat room can never
+# name another client's "user:<username>" room (user_events.user_room),
+# which only the authenticated connect enters.
+VIDEO_PREFIX = "video:"
+CHAT_PREFIX = "chat:"
+
+# Optional coalescing of chat broadcasts into `message-batch` events
+message_broadcaster = BroadcastCoalescer(sio.emit) if BATCH_ENABLED else None
+
+# ICE candidates are relayed one by one, or batched for clients that support it
+ice_batcher = IceCandidateBatcher(sio.emit)
+
+# DM / friend-request pushes go to per-user rooms
+user_events.bind(sio.emit)
+
+
+# ======== ADMISSION ========
+async def session_username(sid) -> Optional[str]:
+    """The username `connect` authenticated for this socket, or None."""
+    return (await sio.get_session(sid)).get("username")
+
+
+async def admit(sid, event, new_work=False) -> bool:
+    """Apply load shedding and rate limits to an incoming event; tells the client when it is refused.
+
+    Limits are per socket, plus per user for sockets that authenticated at
+    connect; usernames claimed in event payloads are never trusted for this.
+    """
+    if new_work:
+        reason = overload_reason()
+        if reason:
+            await sio.emit("overloaded", {"event": event, "reason": reason, "retry_after": RETRY_AFTER}, to=sid)
+            return False
+    username = await session_username(sid)
+    wait = rate_limiter.check(event, f"sid:{sid}", f"user:{username}" if username else None)
+    if wait:
+        log.info("socket.rate_limited", "Event over rate limit", sid=sid, user=username, kind=event)
+        await sio.emit("rate-limited", {"event": event, "retry_after": round(wait, 2)}, to=sid)
+        return False
+    return True
 
 
 # ======== VIDEO CALL EVENTS ========
@@ -32,39 +87,40 @@ async def join_room(sid, data):
         user_id = data.get("userId")
 
         if not room_id or not user_id:
-            print(f"❌ Invalid join_room data from {sid}: {data}")
+            log.warning("video.invalid", "Invalid join_room data", sid=sid, data=data)
+            return
+        if not await admit(sid, "join_room", new_work=True):
             return
 
+        room = VIDEO_PREFIX + room_id
+
         # Check room capacity (max 20 participants)
-        current_members = video_call_rooms.get(room_id, set())
-        if len(current_members) >= 20:
-            print(f"❌ Room {room_id} is full (max 20 participants)")
+        if await room_state.count(room) >= 20:
+            log.info("video.room_full", "Room is full (max 20 participants)", room=room_id, sid=sid)
             await sio.emit("room-full", { "roomId": room_id }, to=sid)
             return
 
         # Leave previous rooms (if any)
-        for room, members in list(video_call_rooms.items()):
-            if sid in members:
-                await sio.leave_room(sid, room)
-                members.discard(sid)
-                if not members:
-                    del video_call_rooms[room]
+        for previous in await room_state.rooms_of(sid):
+            if previous.startswith(VIDEO_PREFIX):
+                await sio.leave_room(sid, previous)
+                await room_state.remove(previous, sid)
 
         # Join new room
-        await sio.enter_room(sid, room_id)
-        video_call_rooms.setdefault(room_id, set()).add(sid)
-        print(f"📹 {user_id} ({sid}) joined video room {room_id}")
+        await sio.enter_room(sid, room)
+        await room_state.add(room, sid)
+        log.info("video.join", "Joined video room", user=user_id, sid=sid, room=room_id)
 
         # Notify others
         await sio.emit(
             "user-joined",
             {"userId": user_id, "socketId": sid},
-            room=room_id,
+            room=room,
             skip_sid=sid,
         )
 
-    except Exception as e:
-        print(f"❌ Error in join_room: {e}")
+    except Exception:
+        log.error("video.join_failed", "Error in join_room", sid=sid, exc_info=True)
 
 
 @sio.event
@@ -75,14 +131,16 @@ async def offer(sid, data):
         offer = data.get("offer")
 
         if not to_socket or not offer:
-            print(f"❌ Invalid offer data from {sid}: {data}")
+            log.warning("signal.invalid", "Invalid offer data", sid=sid, kind="offer")
+            return
+        if not await admit(sid, "offer"):
             return
 
-        print(f"📤 Forwarding offer from {sid} to {to_socket}")
+        log.info("signal.offer", "Forwarding offer", sid=sid, to=to_socket)
         await sio.emit("offer", {"from": sid, "offer": offer}, to=to_socket)
 
-    except Exception as e:
-        print(f"❌ Error in offer: {e}")
+    except Exception:
+        log.error("signal.failed", "Error in offer", sid=sid, kind="offer", exc_info=True)
 
 
 @sio.event
@@ -93,14 +151,16 @@ async def answer(sid, data):
         answer = data.get("answer")
 
         if not to_socket or not answer:
-            print(f"❌ Invalid answer data from {sid}: {data}")
+            log.warning("signal.invalid", "Invalid answer data", sid=sid, kind="answer")
+            return
+        if not await admit(sid, "answer"):
             return
 
-        print(f"📤 Forwarding answer from {sid} to {to_socket}")
+        log.info("signal.answer", "Forwarding answer", sid=sid, to=to_socket)
         await sio.emit("answer", {"from": sid, "answer": answer}, to=to_socket)
 
-    except Exception as e:
-        print(f"❌ Error in answer: {e}")
+    except Exception:
+        log.error("signal.failed", "Error in answer", sid=sid, kind="answer", exc_info=True)
 
 
 @sio.event
@@ -111,14 +171,16 @@ async def ice_candidate(sid, data):
         candidate = data.get("candidate")
 
         if not to_socket or not candidate:
-            print(f"❌ Invalid ice-candidate data from {sid}: {data}")
+            log.warning("signal.invalid", "Invalid ice-candidate data", sid=sid, kind="ice")
+            return
+        if not await admit(sid, "ice_candidate"):
             return
 
-        print(f"🧊 Forwarding ICE candidate from {sid} to {to_socket}")
-        await sio.emit("ice-candidate", {"from": sid, "candidate": candidate}, to=to_socket)
+        log.info("signal.ice", "Forwarding ICE candidate", sid=sid, to=to_socket)
+        await ice_batcher.relay(sid, to_socket, candidate)
 
-    except Exception as e:
-        print(f"❌ Error in ice_candidate: {e}")
+    except Exception:
+        log.error("signal.failed", "Error in ice_candidate", sid=sid, kind="ice", exc_info=True)
 
 
 @sio.event
@@ -129,18 +191,15 @@ async def leave_room(sid, data):
         if not room_id:
             return
 
-        await sio.leave_room(sid, room_id)
-
-        if room_id in video_call_rooms:
-            video_call_rooms[room_id].discard(sid)
-            if not video_call_rooms[room_id]:
-                del video_call_rooms[room_id]
+        room = VIDEO_PREFIX + room_id
+        await sio.leave_room(sid, room)
+        await room_state.remove(room, sid)
 
-        print(f"👋 {sid} left video room {room_id}")
-        await sio.emit("user-left", {"socketId": sid}, room=room_id)
+        log.info("video.leave", "Left video room", sid=sid, room=room_id)
+        await sio.emit("user-left", {"socketId": sid}, room=room)
 
-    except Exception as e:
-        print(f"❌ Error in leave_room: {e}")
+    except Exception:
+        log.error("video.leave_failed", "Error in leave_room", sid=sid, exc_info=True)
 
 
 # ======== CHAT EVENTS ========
@@ -150,35 +209,33 @@ async def join_channel(sid, data):
     try:
         server_name = data.get("serverName")
         channel_name = data.get("channelName")
-        if not server_name or not channel_name:
+        if not server_name or not channel_name or ":" in server_name or ":" in channel_name:
+            return
+        if not await admit(sid, "join_channel", new_work=True):
             return
 
         # Validate that user is a member of the server
-        from models import Server, User
         try:
-            server = Server.nodes.get_or_none(name=server_name)
-            if not server:
-                print(f"❌ Server '{server_name}' not found")
+            if not await servers_repo.exists(server_name):
+                log.info("chat.join_rejected", "Server not found", server=server_name, sid=sid)
                 return
 
             # For now, we'll allow joining if server exists
             # In the future, you might want to validate the specific user
             # by getting user info from the connection or token
 
-        except Exception as e:
-            print(f"❌ Error validating server membership: {e}")
+        except Exception:
+            log.error("chat.join_failed", "Error validating server membership", sid=sid, exc_info=True)
             return
 
         room_key = f"{server_name}:{channel_name}"
-        await sio.enter_room(sid, room_key)
-
-        active_connections[sid] = {"serverName": server_name, "channelName": channel_name}
-        channel_rooms.setdefault(room_key, set()).add(sid)
+        await sio.enter_room(sid, CHAT_PREFIX + room_key)
+        count = await room_state.add(CHAT_PREFIX + room_key, sid)
 
-        print(f"✅ {sid} joined {room_key} ({len(channel_rooms[room_key])} users)")
+        log.info("chat.join", "Joined channel", sid=sid, room=room_key, users=count)
 
-    except Exception as e:
-        print(f"❌ Error in join_channel: {e}")
+    except Exception:
+        log.error("chat.join_failed", "Error in join_channel", sid=sid, exc_info=True)
 
 
 @sio.event
@@ -191,18 +248,12 @@ async def leave_channel(sid, data):
             return
 
         room_key = f"{server_name}:{channel_name}"
-        await sio.leave_room(sid, room_key)
-
-        if room_key in channel_rooms:
-            channel_rooms[room_key].discard(sid)
-            if not channel_rooms[room_key]:
-                del channel_rooms[room_key]
+        await sio.leave_room(sid, CHAT_PREFIX + room_key)
+        await room_state.remove(CHAT_PREFIX + room_key, sid)
+        log.info("chat.leave", "Left channel", sid=sid, room=room_key)
 
-        active_connections.pop(sid, None)
-        print(f"👋 {sid} left {room_key}")
-
-    except Exception as e:
-        print(f"❌ Error in leave_channel: {e}")
+    except Exception:
+        log.error("chat.leave_failed", "Error in leave_channel", sid=sid, exc_info=True)
 
 
 @sio.event
@@ -214,61 +265,95 @@ async def new_message(sid, data):
         message = data.get("message")
 
         if not (server_name and channel_name and message):
-            print(f"❌ Invalid new_message data from {sid}: {data}")
+            log.warning("chat.invalid", "Invalid new_message data", sid=sid)
+            return
+        if not await admit(sid, "new_message", new_work=True):
             return
 
-        # Validate that user is a member of the server before broadcasting
-        from models import Server, User
+        # Validate that user is a member of the server (which implies it
+        # exists) before broadcasting; anonymous messages need the server to exist
         try:
-            server = Server.nodes.get_or_none(name=server_name)
-            if not server:
-                print(f"❌ Server '{server_name}' not found")
-                return
-
             sender_username = message.get("user")
             if sender_username:
-                sender = User.nodes.get_or_none(username=sender_username)
-                if not sender or sender not in server.members:
-                    print(f"❌ User '{sender_username}' is not a member of server '{server_name}'")
+                if not await membership_cache.is_member(server_name, sender_username):
+                    log.info("chat.not_member", "Sender is not a member of the server", user=sender_username, server=server_name)
                     return
-        except Exception as e:
-            print(f"❌ Error validating message sender: {e}")
+            elif not await servers_repo.exists(server_name):
+                log.info("chat.no_server", "Server not found", server=server_name)
+                return
+        except Exception:
+            log.error("chat.broadcast_failed", "Error validating message sender", sid=sid, exc_info=True)
             return
 
         room_key = f"{server_name}:{channel_name}"
-        print(f"📨 Broadcasting message to room {room_key}: {message.get('user')} - {message.get('content', '')[:50]}...")
-        await sio.emit("message-received", message, room=room_key)
+        log.info("chat.broadcast", "Broadcasting message", room=room_key, user=message.get("user"))
+        if message_broadcaster:
+            await message_broadcaster.publish(CHAT_PREFIX + room_key, message)
+        else:
+            await sio.emit("message-received", message, room=CHAT_PREFIX + room_key)
+
+    except Exception:
+        log.error("chat.broadcast_failed", "Error in new_message", sid=sid, exc_info=True)
 
-    except Exception as e:
-        print(f"❌ Error in new_message: {e}")
+
+# ======== USER EVENTS ========
+@sio.event
+async def resume_events(sid, data):
+    """Replay the user events a reconnecting client missed since its resume token."""
+    username = await session_username(sid)
+    if not username:
+        await sio.emit("unauthorized", {"event": "resume_events"}, to=sid)
+        return
+    if not await admit(sid, "resume_events"):
+        return
+
+    resume_token = (data or {}).get("resume_token")
+    events = user_events.missed(username, resume_token) if resume_token else []
+    if events is None:
+        log.info("user_event.resync", "Resume token too old, client must refetch", user=username, sid=sid)
+        await sio.emit("resync-required", {"resume_token": user_events.latest_token()}, to=sid)
+        return
+    for event, message in events:
+        await sio.emit(event, message, to=sid)
+    await sio.emit("resume-complete", {"replayed": len(events), "resume_token": user_events.latest_token()}, to=sid)
 
 
 # ======== CONNECTION EVENTS ========
+def token_username(token: str) -> Optional[str]:
+    """Username from a login JWT, or None if the token is invalid or expired."""
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub") or None
+    except JWTError:
+        return None
+
+
 @sio.event
-async def connect(sid, environ):
-    print(f"🔌 Client connected: {sid}")
+async def connect(sid, environ, auth=None):
+    # Validate before registering anything, so nothing is left behind if
+    # the connection doesn't go through
+    token = auth.get("token") if isinstance(auth, dict) else None
+    username = token_username(token) if token else None
+    ice_batcher.register(sid, auth)
+    if username:
+        # Authenticated sockets get their own room for DM / friend pushes
+        await sio.save_session(sid, {"username": username})
+        await sio.enter_room(sid, user_room(username))
+        log.info("socket.connect", "Client connected", sid=sid, user=username)
+    else:
+        # A bad token only costs the user room; channels and calls still work,
+        # and resume_events answers "unauthorized"
+        log.info("socket.connect", "Client connected", sid=sid, invalid_token=bool(token))
 
 
 @sio.event
 async def disconnect(sid):
-    print(f"🔌 Client disconnected: {sid}")
-
-    # Remove from chat channels
-    if sid in active_connections:
-        info = active_connections.pop(sid)
-        room_key = f"{info['serverName']}:{info['channelName']}"
-        if room_key in channel_rooms:
-            channel_rooms[room_key].discard(sid)
-            if not channel_rooms[room_key]:
-                del channel_rooms[room_key]
-
-    # Remove from video rooms
-    for room_id, members in list(video_call_rooms.items()):
-        if sid in members:
-            members.discard(sid)
-            await sio.emit("user-left", {"socketId": sid}, room=room_id)
-            if not members:
-                del video_call_rooms[room_id]
+    log.info("socket.disconnect", "Client disconnected", sid=sid)
+    ice_batcher.forget(sid)
+
+    # Remove from chat channels and video rooms; tell video peers
+    for room in await room_state.discard_sid(sid):
+        if room.startswith(VIDEO_PREFIX):
+            await sio.emit("user-left", {"socketId": sid}, room=room)
 
 
 # ======== COMBINE WITH FASTAPI ========
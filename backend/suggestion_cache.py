@@ -0,0 +1,42 @@
+"""
+Cache of username -> ranked friend suggestions.
+
+The suggestion query expands two hops of the friend graph plus server
+co-members, which is the most expensive read a page load does. Each
+user's top SUGGESTION_CACHE_DEPTH suggestions are kept for
+SUGGESTION_CACHE_TTL seconds and any page size up to that is served from
+the same entry. Sending, accepting or rejecting a request and unfriending
+drop the entries of both users involved; changes further out in the graph
+(a friend's new friend, a server join) show up when the TTL runs out.
+"""
+import os
+
+from repositories import friends as friends_repo
+from ttl_cache import TTLCache
+
+SUGGESTION_TTL = float(os.getenv("SUGGESTION_CACHE_TTL", 300))
+SUGGESTION_MAX = int(os.getenv("SUGGESTION_CACHE_SIZE", 10000))
+SUGGESTION_DEPTH = int(os.getenv("SUGGESTION_CACHE_DEPTH", 50))
+SUGGESTION_CANDIDATES = int(os.getenv("SUGGESTION_CANDIDATES", 500))
+
+_cache = TTLCache(maxsize=SUGGESTION_MAX, ttl=SUGGESTION_TTL)
+
+
+async def suggestions(username: str, limit: int):
+    """Up to `limit` suggestions for `username`, or None if no such user."""
+    cached = _cache.get(username)
+    if cached is None:
+        cached = await friends_repo.suggestions(username, SUGGESTION_CANDIDATES, SUGGESTION_DEPTH)
+        if cached is None:
+            return None
+        _cache.set(username, cached)
+    return cached[:limit]
+
+
+def invalidate(*usernames: str):
+    for username in usernames:
+        _cache.pop(username)
+
+
+def stats() -> dict:
+    return _cache.stats()
@@ -0,0 +1,40 @@
+import asyncio
+
+import write_behind
+from message_cache import message_cache, channel_key
+from write_behind import MessageWriteBehind, new_message_row
+
+
+def cache_row(row):
+    return {"id": row["uid"], "content": row["content"], "timestamp": row["timestamp"]}
+
+
+def test_dropped_batch_invalidates_cached_channels(monkeypatch):
+    async def failing_insert(rows):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(write_behind, "insert_messages", failing_insert)
+    monkeypatch.setattr(write_behind, "FLUSH_RETRIES", 1)
+
+    key = channel_key("server", "general")
+    other = channel_key("server", "random")
+    message_cache.fill(key, [], True, message_cache.version())
+    message_cache.fill(other, [], True, message_cache.version())
+
+    async def run():
+        writer = MessageWriteBehind(flush_interval_ms=1)
+        await writer.start()
+        row = new_message_row("channel-id", "alice", "hello", cache_key=key)
+        await writer.submit(row)
+        message_cache.append(key, cache_row(row))
+        assert message_cache.get_page(key, 10)[0][0]["id"] == row["uid"]
+        await writer.stop()
+        return writer
+
+    writer = asyncio.run(run())
+
+    assert writer.failed == 1
+    assert message_cache.get_page(key, 10) is None
+    assert message_cache.get_page(other, 10) is not None
+
+    message_cache.invalidate(other)
@@ -0,0 +1,129 @@
+"""
+Per-user push events with resumable delivery.
+
+Sockets that connect with a valid JWT (`auth: {token}`) join the room
+`user:<username>`. The REST handlers publish DMs and friend-request
+changes there, so clients are told about them instead of polling.
+
+Every published event gets a resume token and is kept in a small
+per-user ring (USER_EVENT_RING_SIZE events, for USER_EVENT_TTL seconds).
+After (re)connecting, a client emits `resume_events` with the last
+`resume_token` it saw and gets the events it missed replayed in order,
+followed by `resume-complete`; if the ring no longer reaches back that
+far (or this process restarted) it gets `resync-required` and should
+refetch over REST once.
+
+Rings live in the process that published the event, so with a
+multi-worker backplane a replay only covers events published by the
+worker the client reconnects to; the live pushes themselves reach every
+worker through the backplane.
+"""
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Optional
+
+from logging_setup import get_logger
+
+RING_SIZE = int(os.getenv("USER_EVENT_RING_SIZE", 100))
+RING_TTL = float(os.getenv("USER_EVENT_TTL", 600))
+MAX_USERS = int(os.getenv("USER_EVENT_MAX_USERS", 50000))
+USER_ROOM_PREFIX = "user:"
+
+log = get_logger(__name__)
+
+
+def user_room(username: str) -> str:
+    return USER_ROOM_PREFIX + username
+
+
+class _Ring:
+    __slots__ = ("events", "dropped_seq")
+
+    def __init__(self):
+        self.events = deque(maxlen=RING_SIZE)  # (seq, created, event, payload)
+        self.dropped_seq = 0  # highest seq no longer in the ring
+
+
+class UserEventStream:
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]  # tokens from another process lifetime can't resume
+        self._seq = 0
+        self._rings = OrderedDict()  # username -> _Ring, least recently published first
+        self._evicted_through = 0  # newest seq in any ring dropped for MAX_USERS
+        self._emit = None
+        self.published = 0
+        self.replayed = 0
+        self.resyncs = 0
+
+    def bind(self, emit):
+        """Attach the Socket.IO emitter (sio.emit); publishing before that only records."""
+        self._emit = emit
+
+    def _token(self, seq: int) -> str:
+        return f"{self.epoch}.{seq}"
+
+    def _parse(self, token: str) -> Optional[int]:
+        epoch, _, seq = (token or "").partition(".")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    async def publish(self, username: str, event: str, payload: dict):
+        self._seq += 1
+        seq = self._seq
+        ring = self._rings.get(username)
+        if ring is None:
+            ring = self._rings[username] = _Ring()
+            if len(self._rings) > MAX_USERS:
+                _, evicted = self._rings.popitem(last=False)
+                if evicted.events:
+                    self._evicted_through = max(self._evicted_through, evicted.events[-1][0])
+        else:
+            self._rings.move_to_end(username)
+        if len(ring.events) == ring.events.maxlen:
+            ring.dropped_seq = ring.events[0][0]
+        message = {**payload, "resume_token": self._token(seq)}
+        ring.events.append((seq, time.monotonic(), event, message))
+        self.published += 1
+        if self._emit:
+            try:
+                await self._emit(event, message, room=user_room(username))
+            except Exception:
+                log.error("user_event.emit_failed", "Could not push user event", user=username, kind=event, exc_info=True)
+
+    def missed(self, username: str, resume_token: str):
+        """Events after `resume_token`, or None when they can't all be replayed."""
+        seq = self._parse(resume_token)
+        if seq is None:
+            self.resyncs += 1
+            return None
+        ring = self._rings.get(username)
+        if ring is None:
+            if seq < self._evicted_through:
+                self.resyncs += 1
+                return None  # this user's ring may have been evicted
+            return []
+        cutoff = time.monotonic() - RING_TTL
+        expired = [e for e in ring.events if e[1] < cutoff]
+        if seq < ring.dropped_seq or (expired and seq < expired[-1][0]):
+            self.resyncs += 1
+            return None
+        events = [(event, message) for s, created, event, message in ring.events if s > seq and created >= cutoff]
+        self.replayed += len(events)
+        return events
+
+    def latest_token(self) -> str:
+        return self._token(self._seq)
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._rings),
+            "published": self.published,
+            "replayed": self.replayed,
+            "resyncs": self.resyncs,
+        }
+
+
+user_events = UserEventStream()
@@ -1,66 +1,53 @@
-import aiohttp
-from models import Game
+import hashlib
+import json
+import os
+import time
 
-GAMEPIX_API = "https://games.gamepix.com/games"
+from repositories import games as games_repo
+from logging_setup import get_logger
 
-async def fetch_gamepix_games(offset: int = 0, limit: int = 1000):
-    params = {
-        "sid": "",  # might need a valid sid, API doc sometimes uses empty
-        "limit": limit,
-        "offset": offset
-    }
-    async with aiohttp.ClientSession() as session:
-        async with session.get(GAMEPIX_API, params=params) as resp:
-            resp.raise_for_status()  # will raise HTTP errors automatically
-            data = await resp.json()
-            print("[DEBUG] GamePix raw JSON type:", type(data))
-            print("[DEBUG] GamePix raw JSON preview:", str(data)[:500])
-            return data
-
-def upsert_gamepix(data):
-    # Extract games list correctly
-    if isinstance(data, dict) and "data" in data:
-        games_list = data["data"]
-    elif isinstance(data, list):
-        games_list = data
-    else:
-        print("[ERROR] Unexpected data type from GamePix:", type(data))
-        games_list = []
+log = get_logger(__name__)
 
-    print(f"[DEBUG] Found {len(games_list)} games in response from GamePix")
+UPSERT_CHUNK = int(os.getenv("GAME_UPSERT_CHUNK", 500))
 
-    for g in games_list:
-        ext_id = str(g.get("id"))
-        title = g.get("title") or "Untitled Game"
-        desc = g.get("description") or ""
-        cover = g.get("thumbnailUrl") or g.get("cover") or g.get("cover_url") or g.get("icon")
-        play_url = g.get("url") or g.get("play") or g.get("embed_url")
 
-        try:
-            existing = Game.nodes.get_or_none(external_id=ext_id)
-            if existing:
-                existing.title = title or existing.title
-                existing.description = desc or existing.description
-                existing.cover_url = cover or existing.cover_url
-                existing.play_url = play_url or existing.play_url
-                existing.save()
-                print(f"[UPDATE] Game updated: {title} ({ext_id})")
-            else:
-                Game(
-                    external_id=ext_id,
-                    title=title,
-                    description=desc,
-                    cover_url=cover,
-                    play_url=play_url,
-                    source="GamePix"
-                ).save()
-                print(f"[NEW] Game created: {title} ({ext_id})")
-
-            if play_url:
-                print(f" → Play URL available: {play_url}")
-            else:
-                print(" → No play URL found for this game")
+def gamepix_games(data) -> list:
+    """The list of games in a GamePix response."""
+    if isinstance(data, dict) and "data" in data:
+        return data["data"]
+    if isinstance(data, list):
+        return data
+    log.error("game.fetch_invalid", "Unexpected data type from GamePix", type=type(data).__name__)
+    return []
+
+
+def game_row(g: dict, source: str = "GamePix") -> dict:
+    """Normalize one GamePix game into the row repositories.games.upsert_batch writes."""
+    row = {
+        "external_id": str(g.get("id")),
+        "title": g.get("title") or "Untitled Game",
+        "description": g.get("description") or "",
+        "cover_url": g.get("thumbnailUrl") or g.get("cover") or g.get("cover_url") or g.get("icon"),
+        "play_url": g.get("url") or g.get("play") or g.get("embed_url"),
+        "source": source,
+    }
+    content = json.dumps([row[k] for k in ("title", "description", "cover_url", "play_url")])
+    row["content_hash"] = hashlib.sha1(content.encode()).hexdigest()
+    return row
+
+
+async def upsert_games(rows: list, chunk_size: int = UPSERT_CHUNK) -> dict:
+    """Write normalized game rows in chunks, one transaction each; returns summed counts."""
+    # the last occurrence of an id in one response wins
+    rows = list({row["external_id"]: row for row in rows}.values())
+    counts = {"created": 0, "updated": 0, "unchanged": 0}
+    now = time.time()
+    started = time.perf_counter()
+    for start in range(0, len(rows), chunk_size):
+        result = await games_repo.upsert_batch(rows[start:start + chunk_size], now)
+        log.debug("game.upsert.chunk", "Upserted a chunk of games", offset=start, **result)
+        for key in counts:
+            counts[key] += result[key]
+    log.info("game.upsert", "Upserted games", games=len(rows), elapsed_ms=round((time.perf_counter() - started) * 1000), **counts)
+    return counts
 
-        except Exception as e:
-            print(f"[WARNING] Could not upsert game {ext_id}: {e}")
-            continue
@@ -0,0 +1,170 @@
+"""
+Write-behind persistence for channel messages.
+
+When MESSAGE_WRITE_BEHIND is on, `create_message` acknowledges a message as
+soon as it is queued (with a provisional uid assigned here) and a background
+task flushes the queue to Neo4j in batches, one UNWIND transaction per batch.
+With it off, messages are still written with the same single statement
+(repositories.messages.insert_messages), just inline.
+
+Accepted messages are already in the recent-message cache, so a batch that
+still fails after FLUSH_RETRIES invalidates its channels' cache entries:
+history then comes from Neo4j again instead of showing messages that were
+never stored.
+"""
+import asyncio
+import os
+import time
+import uuid
+
+from logging_setup import get_logger
+from message_cache import message_cache
+from repositories.messages import insert_messages
+
+WRITE_BEHIND_ENABLED = os.getenv("MESSAGE_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+BATCH_SIZE = int(os.getenv("MESSAGE_BATCH_SIZE", 100))
+FLUSH_INTERVAL_MS = int(os.getenv("MESSAGE_FLUSH_MS", 50))
+QUEUE_MAX = int(os.getenv("MESSAGE_QUEUE_MAX", 10000))
+ENQUEUE_TIMEOUT = float(os.getenv("MESSAGE_ENQUEUE_TIMEOUT", 2.0))
+FLUSH_RETRIES = 3
+
+_STOP = object()
+log = get_logger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when the queue stayed full for longer than the enqueue timeout."""
+
+
+def new_message_row(channel_id: str, sender: str, content: str, type: str = "text", cache_key: str = None) -> dict:
+    """Build a message row with its server-assigned uid and timestamp.
+
+    `cache_key` is the channel's message_cache key, if the row is cached.
+    """
+    return {
+        "uid": uuid.uuid4().hex,
+        "channel_id": channel_id,
+        "cache_key": cache_key,
+        "sender": sender,
+        "content": content,
+        "type": type,
+        "timestamp": time.time(),
+    }
+
+
+class MessageWriteBehind:
+    def __init__(self, batch_size=BATCH_SIZE, flush_interval_ms=FLUSH_INTERVAL_MS, max_queue=QUEUE_MAX):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_queue = max_queue
+        self._queue = None
+        self._loop = None
+        self._task = None
+        self._closed = True
+
+        self.batches = 0
+        self.flushed = 0
+        self.failed = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._closed = False
+        self._task = asyncio.create_task(self._run())
+        log.info("write_behind.start", "Message write-behind started", batch_size=self.batch_size, flush_ms=self.flush_interval * 1000)
+
+    async def stop(self):
+        """Stop accepting messages and flush whatever is still queued."""
+        if self._closed:
+            return
+        self._closed = True
+        await self._queue.put(_STOP)
+        await self._task
+        log.info("write_behind.stop", "Message write-behind stopped", flushed=self.flushed)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def submit(self, row: dict):
+        """Queue a row, waiting up to ENQUEUE_TIMEOUT while the queue is full."""
+        if self._closed:
+            raise QueueFull("Message queue is not accepting writes")
+        try:
+            await asyncio.wait_for(self._queue.put(row), ENQUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise QueueFull(f"Message queue full ({self.max_queue} pending)")
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            row = await self._queue.get()
+            if row is _STOP:
+                break
+            batch = [row]
+            deadline = self._loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                batch.append(row)
+            await self._flush(batch)
+
+        # Drain anything that slipped in before the stop marker was read
+        leftover = []
+        while not self._queue.empty():
+            row = self._queue.get_nowait()
+            if row is not _STOP:
+                leftover.append(row)
+        for i in range(0, len(leftover), self.batch_size):
+            await self._flush(leftover[i:i + self.batch_size])
+
+    async def _flush(self, batch: list):
+        started = time.perf_counter()
+        for attempt in range(1, FLUSH_RETRIES + 1):
+            try:
+                await insert_messages(batch)
+                break
+            except Exception as e:
+                log.warning("write_behind.flush_failed", "Message flush failed", attempt=attempt, attempts=FLUSH_RETRIES, error=str(e))
+                if attempt == FLUSH_RETRIES:
+                    self.failed += len(batch)
+                    log.error("write_behind.dropped", "Dropped messages after retries", count=len(batch), attempts=FLUSH_RETRIES)
+                    for key in {row["cache_key"] for row in batch if row.get("cache_key")}:
+                        message_cache.invalidate(key)
+                    return
+                await asyncio.sleep(0.1 * 2 ** attempt)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.batches += 1
+        self.flushed += len(batch)
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
+
+    def stats(self) -> dict:
+        return {
+            "enabled": True,
+            "queue_depth": self.queue_depth,
+            "queue_max": self.max_queue,
+            "batches": self.batches,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "avg_batch_size": round(self.flushed / self.batches, 2) if self.batches else 0,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(self._total_flush_ms / self.batches, 2) if self.batches else 0,
+            "max_flush_ms": round(self.max_flush_ms, 2),
+        }
+
+
+message_writer = MessageWriteBehind() if WRITE_BEHIND_ENABLED else None
@@ -12,10 +12,12 @@ export const ROUTES = {
   UPLOAD_PROFILE_PICTURE: `${API_BASE_URL}/api/users/me/profile-picture`,
   DELETE_PROFILE_PICTURE: `${API_BASE_URL}/api/users/me/profile-picture`,
   CHANGE_PASSWORD: `${API_BASE_URL}/api/users/me/change-password`,
+  SEARCH_USERS: (query) => `${API_BASE_URL}/api/users/search?q=${encodeURIComponent(query)}`,
 
   // games
   GAMES_LIST: `${API_BASE_URL}/games/`,
   GAME_DETAIL: (id) => `${API_BASE_URL}/games/${id}`,
+  GAMES_SEARCH: `${API_BASE_URL}/games/search`,
   SEED_GAMEPIX: `${API_BASE_URL}/games/seed_gamepix`,
 
   // servers
@@ -39,7 +41,8 @@ export const ROUTES = {
     `${API_BASE_URL}/servers/${serverName}/channels/${channelName}/voice`,
 
   // friends
-  GET_ALL_USERS: (username) => `${API_BASE_URL}/api/friends/users?username=${username}`,
+  GET_ALL_USERS: (username, prefix = "") =>
+    `${API_BASE_URL}/api/friends/users?username=${username}${prefix ? `&prefix=${encodeURIComponent(prefix)}` : ""}`,
   GET_FRIENDS: (username) => `${API_BASE_URL}/api/friends/?username=${username}`,
   GET_PENDING_REQUESTS: (username) => `${API_BASE_URL}/api/friends/requests?username=${username}`,
   SEND_FRIEND_REQUEST: (receiverUsername, senderUsername) => 
@@ -48,10 +51,21 @@ export const ROUTES = {
     `${API_BASE_URL}/api/friends/accept/${senderUsername}?receiver_username=${receiverUsername}`,
   REJECT_FRIEND_REQUEST: (senderUsername, receiverUsername) => 
     `${API_BASE_URL}/api/friends/reject/${senderUsername}?receiver_username=${receiverUsername}`,
+  ACCEPT_FRIEND_REQUESTS: (receiverUsername) =>
+    `${API_BASE_URL}/api/friends/accept?receiver_username=${receiverUsername}`,
+  REJECT_FRIEND_REQUESTS: (receiverUsername) =>
+    `${API_BASE_URL}/api/friends/reject?receiver_username=${receiverUsername}`,
+  UNFRIEND: (friendUsername, username) =>
+    `${API_BASE_URL}/api/friends/unfriend/${friendUsername}?username=${username}`,
+  GET_FRIEND_SUGGESTIONS: (username) => `${API_BASE_URL}/api/friends/suggestions?username=${username}`,
 
   // direct messages
   SEND_DIRECT_MESSAGE: (sender, receiver) => 
     `${API_BASE_URL}/api/direct-messages/send?sender_username=${sender}&receiver_username=${receiver}`,
   GET_DIRECT_MESSAGES: (user1, user2) => 
     `${API_BASE_URL}/api/direct-messages/?user1=${user1}&user2=${user2}`,
+  GET_DM_INBOX: (username) =>
+    `${API_BASE_URL}/api/direct-messages/inbox?username=${username}`,
+  MARK_DM_READ: (username, friendUsername) =>
+    `${API_BASE_URL}/api/direct-messages/read?username=${username}&friend_username=${friendUsername}`,
 };
@@ -6,14 +6,16 @@ import CloseIcon from "@mui/icons-material/Close";
 import EmojiEmotionsIcon from "@mui/icons-material/EmojiEmotions";
 import InsertPhotoIcon from "@mui/icons-material/InsertPhoto";
 import axios from "axios";
-import { API_BASE_URL, ROUTES } from "../api/routes";
+import { API_BASE_URL, ROUTES, SOCKET_SERVER_URL } from "../api/routes";
 import Picker from "emoji-picker-react";
+import { io } from "socket.io-client";
 import { getProfilePictureUrl } from "../utils/imageUtils";
 
 export default function ChatComponent({ currentUser }) {
   const [users, setUsers] = useState([]);
   const [friends, setFriends] = useState([]);
   const [pendingRequests, setPendingRequests] = useState([]);
+  const [unreadCounts, setUnreadCounts] = useState({});
   const [selectedFriend, setSelectedFriend] = useState(null);
   const [loadingMessages, setLoadingMessages] = useState(false);
   const [input, setInput] = useState("");
@@ -24,30 +26,105 @@ export default function ChatComponent({ currentUser }) {
   const [gifs, setGifs] = useState([]);
   const [loadingGifs, setLoadingGifs] = useState(false);
   const messagesEndRef = useRef(null);
+  const selectedFriendRef = useRef(null);
 
   // Fetch users, friends, and pending requests
+  const fetchData = async () => {
+    try {
+      // Get all users
+      const usersRes = await axios.get(ROUTES.GET_ALL_USERS(currentUser.username));
+      setUsers(usersRes.data.users);
+
+      // Get friends
+      const friendsRes = await axios.get(ROUTES.GET_FRIENDS(currentUser.username));
+      setFriends(friendsRes.data);
+
+      // Get pending requests
+      const requestsRes = await axios.get(ROUTES.GET_PENDING_REQUESTS(currentUser.username));
+      setPendingRequests(requestsRes.data);
+
+      // Get unread counts per conversation
+      const inboxRes = await axios.get(ROUTES.GET_DM_INBOX(currentUser.username));
+      setUnreadCounts(
+        Object.fromEntries(inboxRes.data.conversations.map((c) => [c.username, c.unread]))
+      );
+    } catch (err) {
+      console.error("Failed to fetch data:", err);
+    }
+  };
+
   useEffect(() => {
     if (!currentUser?.username) return;
+    fetchData();
+  }, [currentUser]);
 
-    const fetchData = async () => {
-      try {
-        // Get all users
-        const usersRes = await axios.get(ROUTES.GET_ALL_USERS(currentUser.username));
-        setUsers(usersRes.data);
-
-        // Get friends
-        const friendsRes = await axios.get(ROUTES.GET_FRIENDS(currentUser.username));
-        setFriends(friendsRes.data);
-
-        // Get pending requests
-        const requestsRes = await axios.get(ROUTES.GET_PENDING_REQUESTS(currentUser.username));
-        setPendingRequests(requestsRes.data);
-      } catch (err) {
-        console.error("Failed to fetch data:", err);
-      }
+  useEffect(() => {
+    selectedFriendRef.current = selectedFriend;
+  }, [selectedFriend]);
+
+  const appendMessage = (message) => {
+    setMessages((prev) => (prev.some((m) => m.id === message.id) ? prev : [...prev, message]));
+  };
+
+  // Live DMs and friend requests pushed to this user's socket room
+  useEffect(() => {
+    const token = localStorage.getItem("token");
+    if (!currentUser?.username || !token) return;
+
+    let resumeToken = null;
+    const track = (data) => {
+      if (data?.resume_token) resumeToken = data.resume_token;
     };
+    const socket = io(SOCKET_SERVER_URL, {
+      transports: ["websocket", "polling"],
+      auth: { token },
+    });
 
-    fetchData();
+    // Ask for anything pushed while we were disconnected
+    socket.on("connect", () => socket.emit("resume_events", { resume_token: resumeToken }));
+    socket.on("resume-complete", track);
+    socket.on("resync-required", (data) => {
+      track(data);
+      fetchData();
+    });
+
+    socket.on("direct-message", (message) => {
+      track(message);
+      const incoming = message.sender !== currentUser.username;
+      const other = incoming ? message.sender : message.receiver;
+      if (selectedFriendRef.current?.username === other) {
+        appendMessage(message);
+        if (incoming) {
+          axios.post(ROUTES.MARK_DM_READ(currentUser.username, other)).catch(() => {});
+        }
+      } else if (incoming) {
+        setUnreadCounts((prev) => ({ ...prev, [other]: (prev[other] || 0) + 1 }));
+      }
+    });
+
+    socket.on("friend-request", async (data) => {
+      track(data);
+      const requestsRes = await axios.get(ROUTES.GET_PENDING_REQUESTS(currentUser.username));
+      setPendingRequests(requestsRes.data);
+    });
+
+    socket.on("friend-request-accepted", async (data) => {
+      track(data);
+      const friendsRes = await axios.get(ROUTES.GET_FRIENDS(currentUser.username));
+      setFriends(friendsRes.data);
+      const usersRes = await axios.get(ROUTES.GET_ALL_USERS(currentUser.username));
+      setUsers(usersRes.data.users);
+    });
+
+    socket.on("friend-removed", async (data) => {
+      track(data);
+      const friendsRes = await axios.get(ROUTES.GET_FRIENDS(currentUser.username));
+      setFriends(friendsRes.data);
+      const usersRes = await axios.get(ROUTES.GET_ALL_USERS(currentUser.username));
+      setUsers(usersRes.data.users);
+    });
+
+    return () => socket.disconnect();
   }, [currentUser]);
 
   const handleSendRequest = async (receiverUsername) => {
@@ -56,7 +133,7 @@ export default function ChatComponent({ currentUser }) {
       alert("Friend request sent!");
       // Refresh users list
       const res = await axios.get(ROUTES.GET_ALL_USERS(currentUser.username));
-      setUsers(res.data);
+      setUsers(res.data.users);
     } catch (err) {
       alert(err.response?.data?.detail || "Failed to send request");
     }
@@ -72,12 +149,40 @@ export default function ChatComponent({ currentUser }) {
       const requestsRes = await axios.get(ROUTES.GET_PENDING_REQUESTS(currentUser.username));
       setPendingRequests(requestsRes.data);
       const usersRes = await axios.get(ROUTES.GET_ALL_USERS(currentUser.username));
-      setUsers(usersRes.data);
+      setUsers(usersRes.data.users);
     } catch (err) {
       alert(err.response?.data?.detail || "Failed to accept request");
     }
   };
 
+  const handleAcceptAll = async () => {
+    try {
+      const senders = pendingRequests.map((req) => req.username);
+      await axios.post(ROUTES.ACCEPT_FRIEND_REQUESTS(currentUser.username), { senders });
+      const friendsRes = await axios.get(ROUTES.GET_FRIENDS(currentUser.username));
+      setFriends(friendsRes.data);
+      const requestsRes = await axios.get(ROUTES.GET_PENDING_REQUESTS(currentUser.username));
+      setPendingRequests(requestsRes.data);
+      const usersRes = await axios.get(ROUTES.GET_ALL_USERS(currentUser.username));
+      setUsers(usersRes.data.users);
+    } catch (err) {
+      alert(err.response?.data?.detail || "Failed to accept requests");
+    }
+  };
+
+  const handleRejectAll = async () => {
+    try {
+      const senders = pendingRequests.map((req) => req.username);
+      await axios.post(ROUTES.REJECT_FRIEND_REQUESTS(currentUser.username), { senders });
+      const requestsRes = await axios.get(ROUTES.GET_PENDING_REQUESTS(currentUser.username));
+      setPendingRequests(requestsRes.data);
+      const usersRes = await axios.get(ROUTES.GET_ALL_USERS(currentUser.username));
+      setUsers(usersRes.data.users);
+    } catch (err) {
+      alert(err.response?.data?.detail || "Failed to reject requests");
+    }
+  };
+
   const handleRejectRequest = async (senderUsername) => {
     try {
       await axios.post(ROUTES.REJECT_FRIEND_REQUEST(senderUsername, currentUser.username));
@@ -85,7 +190,7 @@ export default function ChatComponent({ currentUser }) {
       const requestsRes = await axios.get(ROUTES.GET_PENDING_REQUESTS(currentUser.username));
       setPendingRequests(requestsRes.data);
       const usersRes = await axios.get(ROUTES.GET_ALL_USERS(currentUser.username));
-      setUsers(usersRes.data);
+      setUsers(usersRes.data.users);
     } catch (err) {
       alert(err.response?.data?.detail || "Failed to reject request");
     }
@@ -138,7 +243,13 @@ export default function ChatComponent({ currentUser }) {
       const res = await axios.get(
         ROUTES.GET_DIRECT_MESSAGES(currentUser.username, friend.username)
       );
-      setMessages(res.data);
+      // newest-first page; the thread renders oldest at the top
+      setMessages([...res.data.messages].reverse());
+
+      if (unreadCounts[friend.username]) {
+        await axios.post(ROUTES.MARK_DM_READ(currentUser.username, friend.username));
+        setUnreadCounts((prev) => ({ ...prev, [friend.username]: 0 }));
+      }
     } catch (err) {
       console.error("Failed to load messages:", err);
       setMessages([]);
@@ -163,7 +274,7 @@ export default function ChatComponent({ currentUser }) {
         timestamp: res.data.timestamp,
       };
       
-      setMessages((prev) => [...prev, newMessage]);
+      appendMessage(newMessage);
       setInput("");
     } catch (err) {
       alert(err.response?.data?.detail || "Failed to send message");
@@ -211,9 +322,21 @@ export default function ChatComponent({ currentUser }) {
       {/* Pending Requests */}
       {pendingRequests.length > 0 && (
         <Box mb={3}>
-          <Typography variant="subtitle2" color="#aaa" mb={1}>
-            Pending Requests ({pendingRequests.length})
-          </Typography>
+          <Box display="flex" alignItems="center" mb={1}>
+            <Typography variant="subtitle2" color="#aaa" flex={1}>
+              Pending Requests ({pendingRequests.length})
+            </Typography>
+            {pendingRequests.length > 1 && (
+              <>
+                <Button size="small" onClick={handleAcceptAll} sx={{ color: "#4caf50" }}>
+                  Accept all
+                </Button>
+                <Button size="small" onClick={handleRejectAll} sx={{ color: "#f44336" }}>
+                  Reject all
+                </Button>
+              </>
+            )}
+          </Box>
           {pendingRequests.map((req) => (
             <Box
               key={req.username}
@@ -300,6 +423,13 @@ export default function ChatComponent({ currentUser }) {
                   </Typography>
                 )}
               </Box>
+              {unreadCounts[friend.username] > 0 && (
+                <Chip
+                  label={unreadCounts[friend.username]}
+                  size="small"
+                  sx={{ bgcolor: "#f23f43", color: "white", fontWeight: "bold" }}
+                />
+              )}
             </Box>
           ))}
         </>
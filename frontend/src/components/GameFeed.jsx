@@ -12,12 +12,19 @@ import {
   DialogTitle,
   DialogContent,
   DialogActions,
+  TextField,
 } from "@mui/material";
 import axios from "axios";
 import { ROUTES } from "../api/routes";
 
 export default function GameFeed() {
   const [games, setGames] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [total, setTotal] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [query, setQuery] = useState("");
+  const [searchResults, setSearchResults] = useState(null); // null = not searching
+  const [searchCursor, setSearchCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState("");
   const [selectedGame, setSelectedGame] = useState(null);
@@ -50,9 +57,11 @@ export default function GameFeed() {
           ]);
         } else {
           const res = await axios.get(ROUTES.GAMES_LIST, {
-            params: { limit: 50, offset: 0 },
+            params: { limit: 48 },
           });
-          setGames(res.data);
+          setGames(res.data.games);
+          setNextCursor(res.data.next_cursor);
+          setTotal(res.data.total);
         }
       } catch (err) {
         console.error(err);
@@ -65,6 +74,54 @@ export default function GameFeed() {
     fetchGames();
   }, []);
 
+  // Debounced search; clearing the box goes back to the feed
+  useEffect(() => {
+    const q = query.trim();
+    if (!q) {
+      setSearchResults(null);
+      setSearchCursor(null);
+      return;
+    }
+    const timer = setTimeout(async () => {
+      try {
+        const res = await axios.get(ROUTES.GAMES_SEARCH, { params: { q, limit: 48 } });
+        setSearchResults(res.data.games);
+        setSearchCursor(res.data.next_cursor);
+      } catch (err) {
+        console.error(err);
+      }
+    }, 250);
+    return () => clearTimeout(timer);
+  }, [query]);
+
+  const searching = searchResults !== null;
+  const shownGames = searching ? searchResults : games;
+  const moreCursor = searching ? searchCursor : nextCursor;
+
+  const loadMore = async () => {
+    if (!moreCursor) return;
+    setLoadingMore(true);
+    try {
+      if (searching) {
+        const res = await axios.get(ROUTES.GAMES_SEARCH, {
+          params: { q: query.trim(), limit: 48, after: searchCursor },
+        });
+        setSearchResults((prev) => [...prev, ...res.data.games]);
+        setSearchCursor(res.data.next_cursor);
+        return;
+      }
+      const res = await axios.get(ROUTES.GAMES_LIST, {
+        params: { limit: 48, after: nextCursor },
+      });
+      setGames((prev) => [...prev, ...res.data.games]);
+      setNextCursor(res.data.next_cursor);
+    } catch (err) {
+      console.error(err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handlePlayGame = (game) => {
     if (game.play_url) {
       window.open(game.play_url, "_blank"); // opens the game in a new tab
@@ -115,8 +172,29 @@ export default function GameFeed() {
         sx={{ color: "#e3e5e8", mb: 2, fontWeight: "bold" }}
       >
         Game Feed 🎮
+        {total !== null && (
+          <Typography component="span" sx={{ color: "#888", ml: 1 }}>
+            ({total} games)
+          </Typography>
+        )}
       </Typography>
 
+      <TextField
+        fullWidth
+        size="small"
+        placeholder="Search games..."
+        value={query}
+        onChange={(e) => setQuery(e.target.value)}
+        sx={{
+          mb: 2,
+          "& .MuiOutlinedInput-root": {
+            color: "white",
+            "& fieldset": { borderColor: "#2b2d31" },
+            "&:hover fieldset": { borderColor: "#404249" },
+          },
+        }}
+      />
+
       <Box
         display="grid"
         gridTemplateColumns={{
@@ -126,7 +204,7 @@ export default function GameFeed() {
         }}
         gap={2}
       >
-        {games.map((game) => (
+        {shownGames.map((game) => (
           <Card
             key={game.external_id}
             sx={{
@@ -233,6 +311,14 @@ export default function GameFeed() {
         ))}
       </Box>
 
+      {moreCursor && (
+        <Box display="flex" justifyContent="center" mt={3}>
+          <Button onClick={loadMore} disabled={loadingMore} sx={{ color: "#e3e5e8" }}>
+            {loadingMore ? <CircularProgress size={20} /> : "Load more"}
+          </Button>
+        </Box>
+      )}
+
       {/* Description Dialog */}
       <Dialog 
         open={dialogOpen} 
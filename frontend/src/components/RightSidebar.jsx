@@ -126,11 +126,11 @@ export default function RightSidebar() {
 
     setSearching(true);
     try {
-      const res = await axios.get(ROUTES.GET_ALL_USERS(user.username));
-      const filtered = res.data.filter(u => 
-        u.username.toLowerCase().includes(query.toLowerCase())
-      );
-      setSearchResults(filtered);
+      const token = localStorage.getItem("token");
+      const res = await axios.get(ROUTES.SEARCH_USERS(query.trim()), {
+        headers: { "Authorization": `Bearer ${token}` }
+      });
+      setSearchResults(res.data.users);
     } catch (err) {
       console.error("Search failed:", err);
       setSearchResults([]);
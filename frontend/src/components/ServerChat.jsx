@@ -47,7 +47,8 @@ export default function ServerChat({ serverName, channelName = "general", curren
     const fetchMessages = async () => {
       try {
         const res = await axios.get(ROUTES.SERVER_MESSAGES(serverName, channelName));
-        const mapped = res.data.map((m) => ({
+        // API pages newest-first; the chat view renders oldest-first
+        const mapped = [...res.data.messages].reverse().map((m) => ({
           ...m,
           user: m.sender,
           profile_picture: m.profile_picture,
@@ -95,25 +96,35 @@ export default function ServerChat({ serverName, channelName = "general", curren
     // Join the channel room
     socket.emit("join_channel", { serverName, channelName });
 
-    // Listen for new messages
-    socket.on("message_received", (message) => {
-      console.log("📩 New message received:", message);
+    // Listen for new messages (single events, or batches from busy rooms)
+    const addMessages = (incoming) => {
       setMessages((prev) => {
-        // Avoid duplicates by checking if message already exists
-        const exists = prev.some((m) =>
-          m.id === message.id ||
-          (m.timestamp === message.timestamp && m.user === message.user)
-        );
-        if (exists) return prev;
-
-        return [
-          ...prev,
-          {
+        const next = [...prev];
+        for (const message of incoming) {
+          // Avoid duplicates by checking if message already exists
+          const exists = next.some((m) =>
+            m.id === message.id ||
+            (m.timestamp === message.timestamp && m.user === message.user)
+          );
+          if (exists) continue;
+
+          next.push({
             ...message,
             content: message.type === "voice" ? `${API_BASE_URL}${message.content}` : message.content,
-          },
-        ];
+          });
+        }
+        return next.length === prev.length ? prev : next;
       });
+    };
+
+    socket.on("message_received", (message) => {
+      console.log("📩 New message received:", message);
+      addMessages([message]);
+    });
+
+    socket.on("message-batch", ({ messages: batch }) => {
+      console.log(`📩 ${batch.length} new messages received`);
+      addMessages(batch);
     });
 
     socketRef.current = socket;
@@ -165,6 +176,10 @@ export default function ServerChat({ serverName, channelName = "general", curren
       console.error("Failed to send message:", err);
       if (err.response?.status === 403) {
         alert("You must join this server to send messages!");
+      } else if (err.response?.status === 429) {
+        alert("You're sending messages too fast. Please wait a moment and try again.");
+      } else if (err.response?.status === 503) {
+        alert("The server is busy right now. Please try again in a moment.");
       } else {
         alert("Failed to send message. Please try again.");
       }
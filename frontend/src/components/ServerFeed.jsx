@@ -150,7 +150,7 @@ export default function ServerFeed() {
                 {server.description}
               </Typography>
               <Typography variant="caption" sx={{ color: "#888", mt: 1 }}>
-                {server.members?.length || 0} members
+                {server.member_count ?? server.members?.length ?? 0} members
               </Typography>
             </CardContent>
 
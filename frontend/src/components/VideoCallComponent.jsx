@@ -79,6 +79,8 @@ export default function VideoCallComponent({ serverName, channelName, currentUse
         // connect to signaling server
         socketRef.current = io(SOCKET_SERVER_URL, {
           transports: ["websocket"],
+          // lets the server batch ICE candidates into "ice-candidates" events
+          auth: { features: ["ice-candidates"] },
         });
 
         // Emit join_room (server expects join_room)
@@ -167,21 +169,27 @@ export default function VideoCallComponent({ serverName, channelName, currentUse
           }
         });
 
-        // Server forwards ICE as event name "ice-candidate" (hyphen) — we listen for that
-        socketRef.current.on("ice-candidate", async ({ from, candidate }) => {
+        // Server forwards ICE as "ice-candidate" (one) or "ice-candidates" (a batch)
+        const addCandidates = async (from, candidates) => {
           // sanity
-          if (!candidate || !from) return;
+          if (!from) return;
           const pc = peerConnectionsRef.current[from];
           if (!pc) {
             console.warn("No PC when receiving candidate from", from);
             return;
           }
-          try {
-            await pc.addIceCandidate(candidate);
-          } catch (err) {
-            console.error("Error adding ICE candidate:", err);
+          for (const candidate of candidates) {
+            if (!candidate) continue;
+            try {
+              await pc.addIceCandidate(candidate);
+            } catch (err) {
+              console.error("Error adding ICE candidate:", err);
+            }
           }
-        });
+        };
+
+        socketRef.current.on("ice-candidate", ({ from, candidate }) => addCandidates(from, [candidate]));
+        socketRef.current.on("ice-candidates", ({ from, candidates }) => addCandidates(from, candidates || []));
 
         // When someone leaves
         socketRef.current.on("user-left", ({ socketId }) => {